@@ -1,388 +1,342 @@
 import streamlit as st
-import pandas as pd
 import io
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+import os
 
-st.set_page_config(page_title="Filtrar Anexo GEIH Étnico", layout="wide")
+import pandas as pd
 
-# =============================================================================
-# CONFIGURACIÓN DE HOJAS A FILTRAR
-# =============================================================================
+from geih_etnico.cache import CacheAnexos, clave_anexo
+from geih_etnico.catalogo import cargar_catalogo, catalogo_de_entorno
+from geih_etnico.consistencia import REGLAS, revisar_consistencia
+from geih_etnico.excel import escribir_excel
+from geih_etnico.exportacion import crear_paquete
+from geih_etnico.filtrado import preparar_hojas
+from geih_etnico.incremental import cargar_indice, comparar_publicaciones, guardar_indice, indice_anexo, porcentajes_por_hoja
+from geih_etnico.instrumentacion import etapa, medir, perfil_solicitado
+from geih_etnico.pipeline import hojas_del_catalogo, leer_anexo
+from geih_etnico.trabajos import TRABAJOS_DEFECTO, ColaTrabajos
+from geih_etnico.validacion import cargar_boletin, validar_hojas
 
-HOJAS_TOTAL_NACIONAL = {
-    'Total Nacional_Grupos étnicos': {
-        'nombre_corto': 'TN_Grupos',
-        'fila_periodos': 13,
-        'descripcion': 'Indicadores por grupo étnico'
-    },
-    'TN_Grupos étnicos_sexo': {
-        'nombre_corto': 'TN_Sexo', 
-        'fila_periodos': 13,
-        'descripcion': 'Indicadores por grupo étnico y sexo'
-    },
-    'Ocu TN_Rama': {
-        'nombre_corto': 'TN_Rama',
-        'fila_periodos': 12,
-        'descripcion': 'Ocupados por rama de actividad'
-    },
-    'Ocu TN_Posocu': {
-        'nombre_corto': 'TN_Posocu',
-        'fila_periodos': 12,
-        'descripcion': 'Ocupados por posición ocupacional'
-    }
-}
-
-# Colores - Simple: Verde = bien, Rojo = mal, Amarillo = otras ramas/posiciones
-VERDE = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-ROJO = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-AMARILLO = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
-GRIS = PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid')
-
-# Categorías que van en "Otras ramas"
-OTRAS_RAMAS = [
-    'actividades financieras',
-    'actividades inmobiliarias', 
-    'explotación de minas',
-    'suministro de electricidad',
-    'información y comunicaciones'
-]
-
-# Categorías que van en "Otras posiciones"
-OTRAS_POSICIONES = [
-    'empleado doméstico',
-    'obrero, empleado del gobierno',
-    'jornalero',
-    'trabajador familiar sin remuneración',
-    'patrón',
-    'otro'
-]
-
-borde = Border(
-    left=Side(style='thin'), right=Side(style='thin'),
-    top=Side(style='thin'), bottom=Side(style='thin')
-)
+st.set_page_config(page_title="Filtrar Anexo GEIH Étnico", layout="wide")
 
 # =============================================================================
 # FUNCIONES
 # =============================================================================
 
-def encontrar_ultimo_periodo(df, fila_periodos):
-    """Encuentra el último período de la fila"""
-    ultimo_col = None
-    ultimo_nombre = None
-    
-    for col in range(1, df.shape[1]):
-        val = df.iloc[fila_periodos, col]
-        if pd.notna(val) and str(val).strip():
-            ultimo_col = col
-            ultimo_nombre = str(val).strip()
-    
-    return ultimo_col, ultimo_nombre
+@st.cache_resource
+def obtener_cache():
+    """
+    Caché compartida entre sesiones y reruns.
+    GEIH_CACHE_MB fija el tamaño en memoria; GEIH_CACHE_DIR activa la copia en disco.
+    """
+    max_mb = int(os.environ.get('GEIH_CACHE_MB', '512'))
+    return CacheAnexos(max_bytes=max_mb * 1024 ** 2, directorio=os.environ.get('GEIH_CACHE_DIR'))
+
+
+def id_archivo(archivo):
+    """Identifica un archivo subido (o None) para saber si cambió entre reruns"""
+    return getattr(archivo, 'file_id', archivo.name) if archivo else None
 
-def encontrar_columnas_mismo_patron(df, fila_periodos):
+
+@st.cache_resource
+def obtener_cola():
     """
-    Detecta el patrón del último período (ej: Oct-Sep, Dic-Nov)
-    y encuentra todas las columnas con el mismo patrón
+    Cola de trabajos compartida por todas las sesiones.
+    GEIH_TRABAJOS fija cuántos trabajos corren a la vez, GEIH_TTL_MIN los
+    minutos que se conservan los resultados y GEIH_TEMP_DIR dónde se guardan.
     """
-    import re
-    
-    ultimo_col, ultimo_nombre = encontrar_ultimo_periodo(df, fila_periodos)
-    
-    if not ultimo_nombre:
-        return {}, None, None
-    
-    # Extraer patrón: "Oct 24 - Sep 25" -> mes_inicio="Oct", mes_fin="Sep"
-    match = re.match(r'([A-Za-z]+)\s*\d+.*-\s*([A-Za-z]+)\s*\d+', ultimo_nombre)
-    
-    if not match:
-        return {}, None, None
-    
-    mes_inicio = match.group(1)
-    mes_fin = match.group(2)
-    
-    # Buscar todas las columnas con ese patrón
-    columnas = {}
-    for col in range(1, df.shape[1]):
-        val = df.iloc[fila_periodos, col]
-        if pd.notna(val):
-            texto = str(val).strip()
-            if mes_inicio in texto and mes_fin in texto:
-                columnas[col] = texto
-    
-    return columnas, mes_inicio, mes_fin
+    return ColaTrabajos(
+        max_workers=int(os.environ.get('GEIH_TRABAJOS', TRABAJOS_DEFECTO)),
+        ttl=int(os.environ.get('GEIH_TTL_MIN', '30')) * 60,
+        directorio=os.environ.get('GEIH_TEMP_DIR')
+    )
+
+
+def paso(trabajo, nombre):
+    """Informa la etapa al trabajo (barra de avance) y la mide en el registro"""
+    trabajo.avanzar(nombre)
+    return etapa(nombre)
 
-def filtrar_hoja(df, fila_periodos, num_periodos=4):
+
+def leer_en_segundo_plano(cache, clave, archivo, hojas_anexo, procesos, perfil, trabajo):
     """
-    Filtra una hoja dejando solo:
-    - Columna A (conceptos)
-    - Últimas N columnas del MISMO patrón de período
+    Trabajo de la cola: lee el anexo y lo deja en la caché.
+    `archivo` es el mismo archivo subido; se lee a través de una vista de su
+    buffer (ver geih_etnico.memoria), sin copiarlo.
+    Retorna {'anexo', 'registro'} con los tiempos de la lectura (`perfil`
+    como en instrumentacion.medir).
     """
-    columnas, mes_inicio, mes_fin = encontrar_columnas_mismo_patron(df, fila_periodos)
-    
-    if not columnas:
-        return None, [], None
-    
-    # Tomar las últimas N columnas del mismo patrón
-    cols_ordenadas = sorted(columnas.keys())[-num_periodos:]
-    nombres_periodos = [columnas[c] for c in cols_ordenadas]
-    
-    # Columna A + columnas de períodos
-    cols_a_mantener = [0] + cols_ordenadas
-    
-    # Crear nuevo DataFrame
-    df_filtrado = df.iloc[:, cols_a_mantener].copy()
-    df_filtrado.columns = range(len(cols_a_mantener))
-    
-    patron = f"{mes_inicio}-{mes_fin}" if mes_inicio else None
-    
-    return df_filtrado, nombres_periodos, patron
+    with medir(perfil) as registro:
+        with paso(trabajo, 'leer_anexo'):
+            anexo = cache.obtener_o_calcular(clave, lambda: leer_anexo(archivo, hojas_anexo, procesos))
+    return {'anexo': anexo, 'registro': registro}
+
+
+def etapas_generacion(indice_anterior, boletin, consistencia=False):
+    """Etapas de generar_salida, para la barra de avance"""
+    etapas = ['preparar_hojas']
+    if indice_anterior is not None:
+        etapas.insert(0, 'indice_anexo')
+    if boletin is not None:
+        etapas.append('validar_boletin')
+    if consistencia:
+        etapas.append('revisar_consistencia')
+    etapas.append('escribir_excel')
+    if indice_anterior is not None:
+        etapas.append('comparar_publicaciones')
+    return etapas
+
 
-def calcular_porcentajes_rama_posocu(df_filtrado, num_periodos):
+def generar_salida(hojas_encontradas, salidas, periodos_h1, periodos_h3, indice_anterior, boletin, consistencia,
+                   perfil, almacen, trabajo):
     """
-    Calcula los % de participación para cada rama/posición
-    Busca "Población Ocupada" como total y calcula % para cada categoría
+    Trabajo de la cola: prepara y escribe el anexo filtrado. El Excel queda
+    en el almacén temporal; se retornan los resultados intermedios (hojas
+    preparadas, índice, validación, consistencia, diferencias, tiempos)
+    para la vista previa y las descargas sin recalcular.
+    `perfil` como en instrumentacion.medir (?perfil= en la URL).
     """
-    # Encontrar filas de "Población Ocupada" (son los totales de cada grupo)
-    totales = {}  # {fila_inicio_grupo: {col: valor_total}}
-    
-    grupo_actual_fila = None
-    
-    for i in range(len(df_filtrado)):
-        concepto = df_filtrado.iloc[i, 0]
-        if pd.notna(concepto):
-            texto = str(concepto).strip()
-            
-            # Detectar inicio de grupo
-            if 'Total Nacional' in texto or 'Población étnic' in texto or 'Población no étnic' in texto:
-                grupo_actual_fila = i
-            
-            # Detectar fila de total (Población Ocupada)
-            if 'Población Ocupada' in texto and grupo_actual_fila is not None:
-                totales[grupo_actual_fila] = {}
-                for col in range(1, num_periodos + 1):
-                    val = df_filtrado.iloc[i, col]
-                    if pd.notna(val):
-                        totales[grupo_actual_fila][col] = float(val)
+    with medir(perfil) as registro:
+        resultado = _generar_salida(
+            hojas_encontradas, salidas, periodos_h1, periodos_h3, indice_anterior, boletin, consistencia,
+            almacen, trabajo
+        )
+    resultado['registro'] = registro
+    return resultado
+
+
+def _generar_salida(hojas_encontradas, salidas, periodos_h1, periodos_h3, indice_anterior, boletin, consistencia,
+                    almacen, trabajo):
+    # El índice (% de toda la historia) solo hace falta para comparar con el
+    # anterior; sin él, preparar_hojas calcula los % de los períodos filtrados
+    # y el índice se arma si se pide su descarga (ver indice_de)
+    indice, recalculados, porcentajes_previos = None, {}, None
+    if indice_anterior is not None:
+        with paso(trabajo, 'indice_anexo'):
+            indice, recalculados = indice_anexo(hojas_encontradas, indice_anterior)
+        porcentajes_previos = porcentajes_por_hoja(indice)
     
-    # Calcular porcentajes
-    porcentajes = {}  # {(fila, col): porcentaje}
+    with paso(trabajo, 'preparar_hojas'):
+        hojas_salida = preparar_hojas(
+            hojas_encontradas, 
+            periodos_grafico=periodos_h1,
+            periodos_tabla=periodos_h3,
+            porcentajes_previos=porcentajes_previos,
+            salidas=salidas
+        )
+    hojas_excel = hojas_salida
+    resultado_validacion = None
+    if boletin is not None:
+        trabajo.avanzar('validar_boletin')
+        hojas_excel, resultado_validacion = validar_hojas(hojas_salida, boletin)
+    hallazgos = None
+    if consistencia:
+        # Series completas del patrón (no solo los períodos filtrados)
+        trabajo.avanzar('revisar_consistencia')
+        hoja_consistencia, hallazgos = revisar_consistencia(hojas_encontradas)
+        hojas_excel = hojas_excel + [hoja_consistencia]
+    with paso(trabajo, 'escribir_excel'):
+        excel = f'{trabajo.id}.xlsx'
+        # Directo al archivo del almacén, sin armar el libro en un BytesIO
+        with almacen.abrir(excel) as salida:
+            escribir_excel(hojas_excel, salida=salida)
     
-    grupo_actual_fila = None
-    for i in range(len(df_filtrado)):
-        concepto = df_filtrado.iloc[i, 0]
-        if pd.notna(concepto):
-            texto = str(concepto).strip()
-            
-            # Detectar inicio de grupo
-            if 'Total Nacional' in texto or 'Población étnic' in texto or 'Población no étnic' in texto:
-                grupo_actual_fila = i
-            
-            # Calcular % para categorías (no para el total ni encabezados)
-            if grupo_actual_fila in totales and 'Población Ocupada' not in texto:
-                if not any(x in texto.lower() for x in ['concepto', 'serie', 'gran encuesta', 'nota', 'fuente', 'no informa']):
-                    for col in range(1, num_periodos + 1):
-                        val = df_filtrado.iloc[i, col]
-                        total = totales[grupo_actual_fila].get(col, 0)
-                        if pd.notna(val) and total > 0:
-                            pct = (float(val) / total) * 100
-                            porcentajes[(i, col)] = round(pct, 1)
+    reporte = None
+    if indice_anterior is not None:
+        with paso(trabajo, 'comparar_publicaciones'):
+            reporte = comparar_publicaciones(indice_anterior, indice)
     
-    return porcentajes
+    return {
+        'hojas_salida': hojas_salida,
+        'excel': excel,
+        'hojas': hojas_encontradas,
+        'indice': indice,
+        'recalculados': recalculados,
+        'reporte': reporte,
+        'resultado_validacion': resultado_validacion,
+        'hallazgos': hallazgos
+    }
+
+
+def paquete_de(generado, almacen):
+    """Zip del trabajo: se arma en el almacén la primera vez que se pide"""
+    nombre = generado['excel'].replace('.xlsx', '.zip')
+    if not almacen.existe(nombre):
+        with almacen.abrir(nombre) as salida:
+            crear_paquete(almacen.ruta(generado['excel']), generado['hojas_salida'], salida=salida)
+    return almacen.leer(nombre)
+
+
+def indice_de(generado):
+    """Índice del anexo generado; sin índice anterior se arma la primera vez que se pide"""
+    if generado['indice'] is None:
+        generado['indice'] = indice_anexo(generado['hojas'])[0]
+    return generado['indice']
 
-def crear_excel_filtrado_simple(datos_hojas, periodos_grafico=4, periodos_tabla=2):
+
+def exportar_indice(indice):
+    salida = io.BytesIO()
+    guardar_indice(indice, salida)
+    return salida.getvalue()
+
+
+def mostrar_vista_previa(hoja, filas=30):
     """
-    Crea Excel con las hojas filtradas del anexo
-    Todos los datos en VERDE (luego el usuario marca en rojo los errores)
+    Primeras filas de una hoja preparada. Con on_change='rerun' el expander
+    informa si está abierto y la tabla solo se arma en ese caso.
     """
-    wb = Workbook()
-    primera_hoja = True
+    expander = st.expander(
+        f"📊 {hoja['nombre']} ({len(hoja['periodos'])} períodos)",
+        key=f"vista_{hoja['clave']}",
+        on_change='rerun'
+    )
+    if not expander.open:
+        return
     
-    # Configuración de hojas - todas en verde
-    config = {
-        'TN_Grupos': {
-            'nombre': 'H1_Grafico_4años',
-            'periodos': periodos_grafico,
-            'titulo_color': '375623'  # Verde oscuro
-        },
-        'TN_Grupos_2': {
-            'nombre': 'H3_Tabla_2años',
-            'periodos': periodos_tabla,
-            'titulo_color': '375623'
-        },
-        'TN_Sexo': {
-            'nombre': 'H3_Sexo',
-            'periodos': periodos_tabla,
-            'titulo_color': '375623'
-        },
-        'TN_Rama': {
-            'nombre': 'H4_Rama',
-            'periodos': periodos_tabla,
-            'titulo_color': '375623'
-        },
-        'TN_Posocu': {
-            'nombre': 'H5_Posocu',
-            'periodos': periodos_tabla,
-            'titulo_color': '375623'
-        }
-    }
+    # Solo las primeras filas, leídas directamente de los arreglos de la hoja compacta
+    compacta = hoja['compacta']
+    columnas = {'Concepto': compacta.conceptos.head(filas), 'Tipo': hoja['categorias'].head(filas)}
+    for j, periodo in enumerate(hoja['periodos']):
+        columnas[periodo] = compacta.valores[:filas, j]
+        if hoja['porcentajes'] is not None:
+            columnas[f'% {periodo}'] = hoja['porcentajes'][:filas, j]
     
-    for hoja_key, hoja_config in config.items():
-        # Para TN_Grupos_2, usar los datos de TN_Grupos
-        hoja_datos = 'TN_Grupos' if hoja_key == 'TN_Grupos_2' else hoja_key
-        
-        if hoja_datos not in datos_hojas:
-            continue
-        
-        df_original, fila_periodos = datos_hojas[hoja_datos]
-        resultado = filtrar_hoja(df_original, fila_periodos, hoja_config['periodos'])
-        df_filtrado, periodos = resultado[0], resultado[1]
-        
-        if df_filtrado is None:
-            continue
-        
-        # Crear hoja
-        if primera_hoja:
-            ws = wb.active
-            ws.title = hoja_config['nombre'][:31]
-            primera_hoja = False
-        else:
-            ws = wb.create_sheet(hoja_config['nombre'][:31])
-        
-        # Título
-        es_rama = 'Rama' in hoja_config['nombre']
-        es_posocu = 'Posocu' in hoja_config['nombre']
-        
-        # Para Rama y Posocu, agregar columnas de %
-        if es_rama or es_posocu:
-            num_cols = len(periodos) * 2 + 1  # Concepto + (valor + %) por cada período
-            porcentajes = calcular_porcentajes_rama_posocu(df_filtrado, len(periodos))
-        else:
-            num_cols = len(periodos) + 1
-            porcentajes = {}
-        
-        ws.merge_cells(f'A1:{get_column_letter(num_cols)}1')
-        ws['A1'] = f"📊 {hoja_config['nombre']} - {', '.join(periodos)}"
-        ws['A1'].font = Font(bold=True, size=11, color='FFFFFF')
-        ws['A1'].fill = PatternFill(start_color=hoja_config['titulo_color'], 
-                                     end_color=hoja_config['titulo_color'], fill_type='solid')
-        
-        # Encabezados de período en fila 2
-        ws.cell(row=2, column=1, value='Concepto').font = Font(bold=True)
-        ws.cell(row=2, column=1).fill = GRIS
-        ws.cell(row=2, column=1).border = borde
-        
-        if es_rama or es_posocu:
-            # Encabezados: Valor1, %1, Valor2, %2, etc.
-            col_excel = 2
-            for periodo in periodos:
-                cell = ws.cell(row=2, column=col_excel, value=periodo)
-                cell.font = Font(bold=True)
-                cell.fill = GRIS
-                cell.border = borde
-                cell.alignment = Alignment(horizontal='center')
-                
-                cell_pct = ws.cell(row=2, column=col_excel + 1, value='%')
-                cell_pct.font = Font(bold=True)
-                cell_pct.fill = GRIS
-                cell_pct.border = borde
-                cell_pct.alignment = Alignment(horizontal='center')
-                
-                col_excel += 2
-        else:
-            for i, periodo in enumerate(periodos, 2):
-                cell = ws.cell(row=2, column=i, value=periodo)
-                cell.font = Font(bold=True)
-                cell.fill = GRIS
-                cell.border = borde
-                cell.alignment = Alignment(horizontal='center')
-        
-        # Datos - Colorear según tipo de hoja
-        for row_idx in range(len(df_filtrado)):
-            concepto = df_filtrado.iloc[row_idx, 0]
-            concepto_str = str(concepto).lower() if pd.notna(concepto) else ""
-            
-            # Determinar color de la fila
-            color_fila = None
-            
-            if es_rama:
-                # En Rama: amarillo para "otras ramas", verde para el resto
-                if any(otra in concepto_str for otra in OTRAS_RAMAS):
-                    color_fila = AMARILLO
-                elif concepto_str and 'concepto' not in concepto_str and 'serie' not in concepto_str and 'nota' not in concepto_str and 'fuente' not in concepto_str:
-                    color_fila = VERDE
-            elif es_posocu:
-                # En Posocu: amarillo para "otras posiciones", verde para el resto
-                if any(otra in concepto_str for otra in OTRAS_POSICIONES):
-                    color_fila = AMARILLO
-                elif concepto_str and 'concepto' not in concepto_str and 'serie' not in concepto_str and 'nota' not in concepto_str and 'fuente' not in concepto_str:
-                    color_fila = VERDE
-            else:
-                # En otras hojas: solo colorear tasas
-                if any(x in concepto_str for x in ['tasa', '%', 'porcentaje']):
-                    color_fila = VERDE
-            
-            # Escribir concepto
-            cell_concepto = ws.cell(row=row_idx + 3, column=1, value=concepto if pd.notna(concepto) else '')
-            cell_concepto.border = borde
-            
-            if es_rama or es_posocu:
-                # Escribir valor y % para cada período
-                col_excel = 2
-                for col_idx in range(1, len(periodos) + 1):
-                    valor = df_filtrado.iloc[row_idx, col_idx]
-                    
-                    # Celda de valor
-                    cell = ws.cell(row=row_idx + 3, column=col_excel)
-                    if pd.notna(valor) and isinstance(valor, (int, float)):
-                        cell.value = round(float(valor), 1)
-                        if color_fila:
-                            cell.fill = color_fila
-                    cell.border = borde
-                    cell.alignment = Alignment(horizontal='center')
-                    
-                    # Celda de porcentaje
-                    cell_pct = ws.cell(row=row_idx + 3, column=col_excel + 1)
-                    pct = porcentajes.get((row_idx, col_idx))
-                    if pct is not None:
-                        cell_pct.value = pct
-                        if color_fila:
-                            cell_pct.fill = color_fila
-                    cell_pct.border = borde
-                    cell_pct.alignment = Alignment(horizontal='center')
-                    
-                    col_excel += 2
-            else:
-                # Hojas normales sin %
-                for col_idx in range(1, df_filtrado.shape[1]):
-                    valor = df_filtrado.iloc[row_idx, col_idx]
-                    cell = ws.cell(row=row_idx + 3, column=col_idx + 1)
-                    
-                    if pd.notna(valor):
-                        if isinstance(valor, (int, float)):
-                            cell.value = round(float(valor), 1)
-                            if color_fila:
-                                cell.fill = color_fila
-                            cell.alignment = Alignment(horizontal='center')
-                        else:
-                            cell.value = valor
-                    
-                    cell.border = borde
+    with expander:
+        st.dataframe(pd.DataFrame(columnas), use_container_width=True)
+
+
+def mostrar_tiempos(registro, titulo, prefijo):
+    """Panel plegable con el tiempo (y memoria, si se pidió) de cada etapa de un trabajo"""
+    registro.detener()
+    with st.expander(f"⏱️ {titulo} ({registro.duracion:.2f} s)"):
+        st.caption(
+            "Perfilado opcional: variable GEIH_PERFIL o ?perfil= en la URL "
+            "(cprofile, tracemalloc o ambos separados por coma)"
+        )
+        st.dataframe(registro.resumen(), use_container_width=True)
+        st.dataframe(registro.tabla(), use_container_width=True)
+        if registro.estadisticas:
+            st.code(registro.estadisticas)
         
-        # Ajustar anchos
-        ws.column_dimensions['A'].width = 50
-        if es_rama or es_posocu:
-            for i in range(len(periodos) * 2):
-                ws.column_dimensions[get_column_letter(i + 2)].width = 12
-        else:
-            for i in range(len(periodos)):
-                ws.column_dimensions[get_column_letter(i + 2)].width = 16
+        col_json, col_trace = st.columns(2)
+        col_json.download_button(
+            label="📥 Tiempos (JSON)",
+            data=registro.exportar('json'),
+            file_name=f"tiempos_{prefijo}.json",
+            mime="application/json"
+        )
+        col_trace.download_button(
+            label="📥 Chrome trace (chrome://tracing / Perfetto)",
+            data=registro.exportar('chrome'),
+            file_name=f"tiempos_{prefijo}.trace.json",
+            mime="application/json"
+        )
+
+@st.fragment(run_every=1.0)
+def mostrar_progreso(id_trabajo, titulo):
+    """
+    Avance de un trabajo de la cola; se vuelve a dibujar cada segundo
+    (solo este fragmento) y recarga la página cuando el trabajo termina.
+    """
+    cola = obtener_cola()
+    trabajo = cola.obtener(id_trabajo)
+    if trabajo is None or trabajo.terminado:
+        st.rerun()
+    
+    etapa_actual = trabajo.etapa or 'en cola'
+    st.progress(trabajo.progreso, text=f"⏳ {titulo}: {etapa_actual} ({trabajo.segundos:.0f} s)")
+    if trabajo.completadas:
+        st.caption("✔️ " + " · ".join(trabajo.completadas))
+    pendientes = cola.pendientes()
+    if pendientes > 1:
+        st.caption(f"{pendientes} trabajos en proceso en el servidor")
+
+
+def mostrar_resultado(generado, almacen, registro_carga=None):
+    """
+    Validación, diferencias, vista previa y descargas de un trabajo terminado.
+    `registro_carga` son los tiempos de la lectura del anexo (None si vino de la caché)
+    """
+    if not almacen.existe(generado['excel']):
+        st.warning("⌛ El Excel generado venció; vuelve a generar el anexo filtrado")
+        return
     
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
+    st.success("✅ ¡Excel generado!")
+
+    resultado_validacion = generado['resultado_validacion']
+    if resultado_validacion is not None:
+        st.subheader("🔎 Validación contra el boletín")
+        conteo = resultado_validacion['estado'].value_counts()
+        col_ok, col_mal, col_sin = st.columns(3)
+        col_ok.metric("🟢 Coinciden", int(conteo['coincide']))
+        col_mal.metric("🔴 No coinciden", int(conteo['no_coincide']))
+        col_sin.metric("🟡 Sin dato en el anexo", int(conteo['sin_dato']))
+        diferencias = resultado_validacion[resultado_validacion['estado'] != 'coincide']
+        if not diferencias.empty:
+            st.dataframe(diferencias, use_container_width=True)
+
+    hallazgos = generado['hallazgos']
+    if hallazgos is not None:
+        st.subheader("🧪 Consistencia de las series")
+        conteo = hallazgos['regla'].value_counts()
+        for columna, regla in zip(st.columns(len(REGLAS)), REGLAS):
+            columna.metric(regla.replace('_', ' ').capitalize(), int(conteo[regla]))
+        if not hallazgos.empty:
+            st.dataframe(hallazgos, use_container_width=True)
+
+    reporte = generado['reporte']
+    if reporte is not None:
+        st.subheader("🔁 Cambios frente al anexo anterior")
+        for nombre_corto, periodos_nuevos in generado['recalculados'].items():
+            if periodos_nuevos:
+                st.write(f"  🔄 **{nombre_corto}**: % recalculados para {', '.join(periodos_nuevos)}")
+        st.write(reporte['estado'].value_counts().to_dict())
+        st.dataframe(reporte[reporte['estado'] == 'revisado'], use_container_width=True)
+        st.download_button(
+            label="📥 DESCARGAR REPORTE DE DIFERENCIAS (CSV)",
+            data=lambda: reporte.to_csv(index=False).encode('utf-8'),
+            file_name="diferencias_anexo.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+
+    # Preview: cada hoja se dibuja solo si se abre su expander
+    st.subheader("👀 Vista previa")
+
+    for hoja in generado['hojas_salida']:
+        mostrar_vista_previa(hoja)
+
+    # Botón de descarga: el Excel se lee del almacén solo al hacer clic
+    st.download_button(
+        label="📥 DESCARGAR ANEXO FILTRADO",
+        data=lambda: almacen.leer(generado['excel']),
+        file_name="anexo_filtrado.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        use_container_width=True
+    )
+
+    # Mismas hojas en tabla larga (Parquet / Arrow) para los scripts de validación;
+    # el zip se arma solo al hacer clic
+    st.download_button(
+        label="📦 DESCARGAR PAQUETE (Excel + Parquet + Arrow)",
+        data=lambda: paquete_de(generado, almacen),
+        file_name="anexo_filtrado.zip",
+        mime="application/zip",
+        use_container_width=True
+    )
+
+    # Índice de este anexo para compararlo con el del próximo mes
+    st.download_button(
+        label="🗂️ DESCARGAR ÍNDICE (para el próximo mes)",
+        data=lambda: exportar_indice(indice_de(generado)),
+        file_name="indice_anexo.parquet",
+        mime="application/octet-stream",
+        use_container_width=True
+    )
+
+    if registro_carga is not None:
+        mostrar_tiempos(registro_carga, "Tiempos de la lectura del anexo", 'lectura')
+    mostrar_tiempos(generado['registro'], "Tiempos de la generación", 'generacion')
+
 
 # =============================================================================
 # INTERFAZ
@@ -393,7 +347,7 @@ st.markdown("""
 **¿Qué hace esta app?**
 1. Subes el anexo Excel y te ayuda a filtrar las columnas necesarias para el cruce con el boletín
 2. Detecta automáticamente el último período
-3. Filtra las hojas de Total Nacional
+3. Filtra las hojas de Total Nacional (u otras regiones, con un catálogo de hojas YAML/JSON)
 4. Genera un Excel con solo las columnas que necesitas para validar el boletín
 """)
 
@@ -402,9 +356,51 @@ st.markdown("---")
 # Subir archivo
 uploaded_file = st.file_uploader("📂 Sube el anexo (el nombre debe ser solo 'anexo')", type=['xlsx', 'xls'])
 
+# Catálogo de hojas: sin él (ni GEIH_CATALOGO) se filtra Total Nacional
+catalogo_file = st.file_uploader(
+    "🗺️ Catálogo de hojas (opcional, YAML o JSON; por defecto Total Nacional)",
+    type=['yaml', 'yml', 'json']
+)
+
 if uploaded_file:
+    # Perfilado pedido con ?perfil= (o GEIH_PERFIL): se aplica en los trabajos de la cola
+    perfil = perfil_solicitado(st.query_params.get('perfil'))
     try:
-        xlsx = pd.ExcelFile(uploaded_file)
+        catalogo = cargar_catalogo(catalogo_file) if catalogo_file else catalogo_de_entorno()
+        hojas_anexo, salidas = hojas_del_catalogo(uploaded_file, catalogo)
+        # GEIH_PROCESOS reparte la lectura de muchas hojas entre procesos
+        procesos = int(os.environ.get('GEIH_PROCESOS', '0')) or None
+        
+        # Solo se leen las hojas configuradas y sus columnas de períodos;
+        # en los reruns (cambiar un selectbox, generar) se reutiliza la caché.
+        # Si no está en la caché, la lectura va a la cola (una sola vez por
+        # anexo aunque lo suban varias sesiones) y la página espera su avance
+        cola = obtener_cola()
+        clave = clave_anexo(uploaded_file.getbuffer(), hojas_anexo)
+        anexo = obtener_cache().obtener(clave)
+        if anexo is None:
+            # Un error de lectura se informa una vez; el siguiente rerun (p. ej.
+            # volver a subir el archivo) vuelve a correr la lectura
+            trabajo = cola.obtener(f'carga-{clave}')
+            if trabajo is None or (trabajo.estado == 'error' and st.session_state.get('carga_fallida') is trabajo):
+                trabajo = cola.enviar(
+                    leer_en_segundo_plano, obtener_cache(), clave, uploaded_file, hojas_anexo, procesos, perfil,
+                    id_trabajo=f'carga-{clave}', etapas=['leer_anexo']
+                )
+            if not trabajo.terminado:
+                mostrar_progreso(trabajo.id, "Leyendo el anexo")
+                st.stop()
+            if trabajo.estado == 'error':
+                st.session_state['carga_fallida'] = trabajo
+                raise ValueError(trabajo.error)
+            anexo = trabajo.resultado['anexo']
+        # Los tiempos de la lectura se muestran junto a los de la generación
+        # mientras su trabajo siga en la cola (no hay si el anexo ya estaba en la caché)
+        trabajo_carga = cola.obtener(f'carga-{clave}')
+        registro_carga = None
+        if trabajo_carga is not None and trabajo_carga.estado == 'listo':
+            registro_carga = trabajo_carga.resultado['registro']
+        hojas_leidas = anexo['hojas']
         st.success(f"✅ Archivo cargado: **{uploaded_file.name}**")
         
         # Mostrar hojas encontradas
@@ -412,15 +408,17 @@ if uploaded_file:
         
         hojas_encontradas = {}
         
-        for hoja_nombre, config in HOJAS_TOTAL_NACIONAL.items():
-            if hoja_nombre in xlsx.sheet_names:
-                df = pd.read_excel(xlsx, sheet_name=hoja_nombre, header=None)
-                columnas, mes_ini, mes_fin = encontrar_columnas_mismo_patron(df, config['fila_periodos'])
+        if not hojas_anexo:
+            st.warning("⚠️ Ninguna entrada del catálogo coincide con las hojas del archivo")
+        
+        for hoja_nombre, config in hojas_anexo.items():
+            if hoja_nombre in hojas_leidas:
+                columnas, mes_ini, mes_fin = anexo['periodos'][hoja_nombre]
                 
                 if columnas:
                     ultimo_periodo = list(columnas.values())[-1]
                     patron = f"{mes_ini}-{mes_fin}"
-                    hojas_encontradas[config['nombre_corto']] = (df, config['fila_periodos'])
+                    hojas_encontradas[config['nombre_corto']] = hojas_leidas[hoja_nombre]
                     st.write(f"  ✅ **{hoja_nombre}** → Patrón: **{patron}**, {len(columnas)} períodos, último: **{ultimo_periodo}**")
                 else:
                     st.write(f"  ⚠️ {hoja_nombre} - No se encontraron períodos")
@@ -449,41 +447,55 @@ if uploaded_file:
                     help="Número de períodos a incluir (desde el último)"
                 )
             
+            # Índice del mes anterior: solo se recalculan los % de los períodos
+            # nuevos o revisados y se reportan las diferencias entre publicaciones
+            indice_file = st.file_uploader(
+                "🗂️ Índice del anexo anterior (opcional, .parquet descargado el mes pasado)",
+                type=['parquet']
+            )
+            
+            # Cifras del boletín: las celdas revisadas se marcan en verde/rojo solas
+            boletin_file = st.file_uploader(
+                "📰 Cifras del boletín (opcional, CSV o JSON con concepto, periodo, valor)",
+                type=['csv', 'json']
+            )
+            
+            # Todas las columnas del mismo patrón: rangos, suma de % y saltos anuales
+            consistencia = st.checkbox(
+                "🧪 Revisar la consistencia de las series completas (hoja Consistencia_Series)",
+                value=False
+            )
+            
             st.markdown("---")
             
+            # El id del trabajo queda en la sesión: abrir una vista previa o
+            # descargar (que provocan un rerun) no vuelve a procesar el anexo
+            firma = (clave, id_archivo(catalogo_file), periodos_h1, periodos_h3, id_archivo(indice_file),
+                     id_archivo(boletin_file), consistencia)
+            
             if st.button("🔄 GENERAR ANEXO FILTRADO", type="primary", use_container_width=True):
-                with st.spinner("Procesando..."):
-                    
-                    excel_output = crear_excel_filtrado_simple(
-                        hojas_encontradas, 
-                        periodos_grafico=periodos_h1,
-                        periodos_tabla=periodos_h3
-                    )
-                    
-                    st.success("✅ ¡Excel generado!")
-                    
-                    # Preview
-                    st.subheader("👀 Vista previa")
-                    
-                    for nombre_corto, (df, fila_per) in hojas_encontradas.items():
-                        resultado = filtrar_hoja(df, fila_per, periodos_h3)
-                        df_filtrado, periodos_lista = resultado[0], resultado[1]
-                        if df_filtrado is not None:
-                            with st.expander(f"📊 {nombre_corto} ({len(periodos_lista)} períodos)"):
-                                # Renombrar columnas para mostrar
-                                cols_display = ['Concepto'] + periodos_lista
-                                df_display = df_filtrado.copy()
-                                df_display.columns = cols_display[:df_display.shape[1]]
-                                st.dataframe(df_display.head(30), use_container_width=True)
-                    
-                    # Botón de descarga
-                    st.download_button(
-                        label="📥 DESCARGAR ANEXO FILTRADO",
-                        data=excel_output,
-                        file_name="anexo_filtrado.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
-                    )
+                # El índice y el boletín se leen aquí: un archivo mal formado
+                # se informa enseguida, sin pasar por la cola
+                indice_anterior = cargar_indice(indice_file) if indice_file else None
+                boletin = cargar_boletin(boletin_file) if boletin_file else None
+                trabajo = cola.enviar(
+                    generar_salida, hojas_encontradas, salidas, periodos_h1, periodos_h3,
+                    indice_anterior, boletin, consistencia, perfil, cola.almacen,
+                    etapas=etapas_generacion(indice_anterior, boletin, consistencia)
+                )
+                st.session_state['trabajo'] = {'id': trabajo.id, 'firma': firma}
+            
+            pedido = st.session_state.get('trabajo')
+            if pedido and pedido['firma'] == firma:
+                trabajo = cola.obtener(pedido['id'])
+                if trabajo is None:
+                    st.warning("⌛ El resultado venció; vuelve a generar el anexo filtrado")
+                elif not trabajo.terminado:
+                    mostrar_progreso(trabajo.id, "Generando el anexo filtrado")
+                elif trabajo.estado == 'error':
+                    st.error(f"❌ Error: {trabajo.error}")
+                else:
+                    mostrar_resultado(trabajo.resultado, cola.almacen, registro_carga)
         else:
             st.error("❌ No se encontraron hojas válidas para filtrar")
             
@@ -505,7 +517,9 @@ st.markdown("""
 
 ### 🎨 Colores:
 - 🟢 **Verde** = Dato del anexo (correcto por defecto)
-- 🔴 **Rojo** = Marcar manualmente si no coincide con boletín
+- 🔴 **Rojo** = No coincide con el boletín (automático si subes las cifras del boletín; si no, marcar manualmente)
+- Con boletín se agrega la hoja **Resumen_Validacion** con las diferencias
+- Con la revisión de consistencia se agrega la hoja **Consistencia_Series** (rangos, suma de % y saltos anuales en toda la serie)
 
 ### 📅 El filtro:
 - Detecta automáticamente el último período según la última columna con año móvil
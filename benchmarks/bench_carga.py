@@ -0,0 +1,70 @@
+"""
+Compara la carga actual (pd.ExcelFile + read_excel por hoja) contra la carga
+selectiva en modo streaming de geih_etnico.carga.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_carga ruta/al/anexo.xlsx [--repeticiones 3]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+import pandas as pd
+
+from geih_etnico.carga import cargar_hojas_anexo
+from geih_etnico.config import HOJAS_TOTAL_NACIONAL
+
+
+def carga_actual(ruta):
+    """Camino original de app.py: todas las columnas de cada hoja"""
+    xlsx = pd.ExcelFile(ruta)
+    return {
+        hoja: pd.read_excel(xlsx, sheet_name=hoja, header=None)
+        for hoja in HOJAS_TOTAL_NACIONAL
+        if hoja in xlsx.sheet_names
+    }
+
+
+def carga_selectiva(ruta):
+    return cargar_hojas_anexo(ruta, HOJAS_TOTAL_NACIONAL)
+
+
+def medir(funcion, ruta, repeticiones):
+    """
+    Retorna (mejor tiempo en s, pico de memoria en MB, celdas cargadas).
+    El tiempo se mide sin tracemalloc (lo hace mucho más lento); la memoria
+    en una corrida aparte.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        hojas = funcion(ruta)
+        tiempos.append(time.perf_counter() - inicio)
+    celdas = sum(df.size for df in hojas.values())
+    del hojas
+
+    gc.collect()
+    tracemalloc.start()
+    funcion(ruta)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(tiempos), pico / 1024 ** 2, celdas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('ruta', help='Anexo .xlsx a cargar')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'Camino':<12} {'Tiempo (s)':>11} {'Pico (MB)':>10} {'Celdas':>10}")
+    for nombre, funcion in [('actual', carga_actual), ('selectiva', carga_selectiva)]:
+        tiempo, pico, celdas = medir(funcion, args.ruta, args.repeticiones)
+        print(f"{nombre:<12} {tiempo:>11.3f} {pico:>10.1f} {celdas:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Compara los escritores de geih_etnico.excel sobre hojas preparadas sintéticas.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_excel [--filas 200] [--periodos 4] [--hojas 5] [--repeticiones 3]
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from openpyxl.utils import get_column_letter
+
+from geih_etnico.excel import AMARILLO, ESCRITORES, GRIS, VERDE
+
+
+def hoja_sintetica(nombre, num_filas, num_periodos, semilla=0):
+    """Hoja preparada con la forma de H4_Rama: valor + % por período"""
+    rnd = random.Random(semilla)
+    periodos = [f"Oct {20 + i} - Sep {21 + i}" for i in range(num_periodos)]
+
+    encabezados = [('Concepto', GRIS, False, True)]
+    for periodo in periodos:
+        encabezados += [(periodo, GRIS, True, True), ('%', GRIS, True, True)]
+
+    filas = [encabezados]
+    for i in range(num_filas):
+        color = AMARILLO if i % 7 == 0 else VERDE
+        fila = [(f"Concepto {i}", None, False, False)]
+        for _ in periodos:
+            fila.append((round(rnd.uniform(0, 25000), 1), color, True, False))
+            fila.append((round(rnd.uniform(0, 100), 1), color, True, False))
+        filas.append(fila)
+
+    anchos = {'A': 50}
+    for i in range(num_periodos * 2):
+        anchos[get_column_letter(i + 2)] = 12
+
+    return {
+        'nombre': nombre,
+        'titulo': f"📊 {nombre} - {', '.join(periodos)}",
+        'titulo_color': '375623',
+        'num_cols': num_periodos * 2 + 1,
+        'filas': filas,
+        'anchos': anchos
+    }
+
+
+def medir(escritor, hojas, repeticiones):
+    """
+    Retorna (mejor tiempo en s, pico de memoria en MB, tamaño del archivo en KB).
+    El tiempo se mide sin tracemalloc (lo hace mucho más lento); la memoria
+    en una corrida aparte.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        salida = escritor(hojas)
+        tiempos.append(time.perf_counter() - inicio)
+
+    gc.collect()
+    tracemalloc.start()
+    escritor(hojas)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(tiempos), pico / 1024 ** 2, len(salida.getvalue()) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--filas', type=int, default=200)
+    parser.add_argument('--periodos', type=int, default=4)
+    parser.add_argument('--hojas', type=int, default=5)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    hojas = [hoja_sintetica(f"Hoja_{i}", args.filas, args.periodos, semilla=i) for i in range(args.hojas)]
+
+    print(f"{'Escritor':<12} {'Tiempo (s)':>11} {'Pico (MB)':>10} {'Archivo (KB)':>13}")
+    for nombre, escritor in ESCRITORES.items():
+        tiempo, pico, tamano = medir(escritor, hojas, args.repeticiones)
+        print(f"{nombre:<12} {tiempo:>11.3f} {pico:>10.1f} {tamano:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Prueba de carga de la API HTTP (geih_etnico.servidor): rendimiento
+(pedidos por segundo) y latencias p50/p95 con varios clientes a la vez.
+
+Modos:
+  cache      el mismo anexo con los mismos parámetros (tras un pedido de
+             calentamiento, todas las respuestas salen del almacén)
+  sin_cache  el mismo anexo con parámetros distintos en cada pedido
+             (cada pedido se procesa completo)
+
+Sin --url se levanta un servidor local en un puerto libre con --trabajos
+hilos de procesamiento; con --url se mide un servidor ya iniciado
+(python -m geih_etnico servir).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.carga_http [--anexo anexo.xlsx] [--pedidos 40] [--concurrencia 4]
+                                    [--trabajos 2] [--modos cache sin_cache] [--p95-max 5]
+
+Con --p95-max termina con código 1 si el p95 de algún modo supera ese
+valor (segundos).
+"""
+import argparse
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from benchmarks.sintetico import generar_anexo
+from benchmarks.suite import TAMANOS
+
+MODOS = ['cache', 'sin_cache']
+
+
+def _percentil(valores, p):
+    """Percentil por rango más cercano (valores ya ordenados)"""
+    if not valores:
+        return float('nan')
+    return valores[min(len(valores) - 1, max(0, int(round(p / 100 * len(valores) + 0.5)) - 1))]
+
+
+def _ruta_pedido(modo, i):
+    if modo == 'cache':
+        return '/filtrar'
+    # Parámetros distintos en cada pedido: la clave del resultado cambia
+    return f'/filtrar?periodos_grafico={1 + i % 200}&periodos_tabla={1 + i // 200 % 200}'
+
+
+class Cliente(threading.local):
+    """Una conexión keep-alive por hilo cliente"""
+
+    def __init__(self, host, puerto):
+        self.conexion = http.client.HTTPConnection(host, puerto, timeout=600)
+
+    def enviar(self, ruta, cuerpo):
+        try:
+            self.conexion.request('POST', ruta, body=cuerpo,
+                                  headers={'Content-Type': 'application/octet-stream'})
+            respuesta = self.conexion.getresponse()
+            respuesta.read()
+        except (ConnectionError, http.client.HTTPException):
+            # El servidor cierra la conexión tras un error: se abre otra
+            self.conexion.close()
+            raise
+        if respuesta.getheader('Connection', '').lower() == 'close':
+            self.conexion.close()
+        return respuesta.status
+
+
+def medir(host, puerto, cuerpo, modo, pedidos, concurrencia):
+    """Retorna {'ok', 'errores', 'segundos', 'por_segundo', 'p50', 'p95', 'max'}"""
+    cliente = Cliente(host, puerto)
+    if modo == 'cache':
+        cliente.enviar(_ruta_pedido(modo, 0), cuerpo)
+
+    def pedido(i):
+        inicio = time.perf_counter()
+        try:
+            estado = cliente.enviar(_ruta_pedido(modo, i), cuerpo)
+        except (ConnectionError, http.client.HTTPException):
+            estado = None
+        return estado, time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        resultados = list(executor.map(pedido, range(pedidos)))
+    segundos = time.perf_counter() - inicio
+
+    latencias = sorted(latencia for estado, latencia in resultados if estado == 200)
+    ok = len(latencias)
+    return {
+        'ok': ok,
+        'errores': pedidos - ok,
+        'segundos': segundos,
+        'por_segundo': ok / segundos if segundos else float('nan'),
+        'p50': _percentil(latencias, 50),
+        'p95': _percentil(latencias, 95),
+        'max': latencias[-1] if latencias else float('nan')
+    }
+
+
+def correr(host, puerto, cuerpo, modos, pedidos, concurrencia):
+    print(f"{'modo':<10} {'ok':>5} {'errores':>8} {'ped/s':>8} {'p50 (s)':>9} {'p95 (s)':>9} {'máx (s)':>9}")
+    resultados = {}
+    for modo in modos:
+        r = resultados[modo] = medir(host, puerto, cuerpo, modo, pedidos, concurrencia)
+        print(f"{modo:<10} {r['ok']:>5} {r['errores']:>8} {r['por_segundo']:>8.2f} "
+              f"{r['p50']:>9.3f} {r['p95']:>9.3f} {r['max']:>9.3f}", flush=True)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Servidor ya iniciado (por defecto se levanta uno local)')
+    parser.add_argument('--anexo', help='Anexo a enviar (por defecto, uno sintético del tamaño --tamano)')
+    parser.add_argument('--tamano', choices=list(TAMANOS), default='pequeno')
+    parser.add_argument('--pedidos', type=int, default=40)
+    parser.add_argument('--concurrencia', type=int, default=4, help='Clientes a la vez')
+    parser.add_argument('--trabajos', type=int, default=2, help='Hilos de procesamiento del servidor local')
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=MODOS)
+    parser.add_argument('--p95-max', type=float, help='p95 máximo admitido (segundos)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = args.anexo
+        if not ruta:
+            ruta = os.path.join(directorio, f'anexo_{args.tamano}.xlsx')
+            columnas, filas_por_grupo = TAMANOS[args.tamano]
+            generar_anexo(ruta, columnas, filas_por_grupo)
+        with open(ruta, 'rb') as f:
+            cuerpo = f.read()
+        print(f"📄 {os.path.basename(ruta)} ({len(cuerpo) / 1024 ** 2:.1f} MB), "
+              f"{args.pedidos} pedidos, {args.concurrencia} clientes")
+
+        servidor = None
+        if args.url:
+            partes = urlsplit(args.url)
+            host, puerto = partes.hostname, partes.port or 80
+        else:
+            from geih_etnico.servidor import ServidorAnexos
+            servidor = ServidorAnexos(('127.0.0.1', 0), trabajos=args.trabajos, max_cola=args.pedidos,
+                                      directorio=os.path.join(directorio, 'resultados'), registrar=False)
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+            host, puerto = servidor.server_address
+            print(f"🌐 Servidor local en {host}:{puerto} ({args.trabajos} trabajos)")
+
+        try:
+            resultados = correr(host, puerto, cuerpo, args.modos, args.pedidos, args.concurrencia)
+        finally:
+            if servidor is not None:
+                servidor.shutdown()
+                servidor.server_close()
+
+    if args.p95_max is not None:
+        excedidos = [modo for modo, r in resultados.items() if not r['p95'] <= args.p95_max]
+        if excedidos:
+            print(f"\n❌ p95 por encima de {args.p95_max} s en: {', '.join(excedidos)}")
+            return 1
+        print(f"\n✅ p95 por debajo de {args.p95_max} s en todos los modos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Techo de memoria: pico de RSS del pipeline completo (subida -> lectura ->
+filtrado -> Excel -> paquete zip) sobre anexos sintéticos cada vez más grandes.
+
+Cada medición corre en un proceso nuevo para que el pico no arrastre
+memoria de las anteriores. Se comparan dos modos:
+  copias  el flujo anterior: getvalue()/BytesIO(bytes) para leer y el Excel
+          armado en un BytesIO y copiado con getvalue()
+  vista   lectura a través de una vista del buffer subido y salidas
+          escritas en archivos temporales (geih_etnico.memoria)
+
+El pico crece con el tamaño del anexo: el buffer subido sigue en memoria
+(Streamlit lo guarda así) y openpyxl arma cada hoja mientras la lee. La
+vista del buffer solo se nota en anexos grandes (ahí evita una copia del
+archivo); en los pequeños y medianos ambos modos quedan casi iguales.
+Lo que se controla es que el crecimiento siga acotado: techo_mb() da el
+pico admitido según el tamaño del xlsx (tests/test_memoria.py lo verifica).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.memoria [--tamanos pequeno mediano grande] [--techo-mb 150]
+
+Con --techo-mb termina con código 1 si en modo vista el pico (sobre el
+proceso recién iniciado) supera ese valor en algún tamaño; sin él se usa
+techo_mb() de cada tamaño.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.sintetico import generar_anexo
+from benchmarks.suite import TAMANOS
+
+MODOS = ['copias', 'vista']
+
+# Pico admitido en modo vista: una parte fija (intérprete, pandas, openpyxl)
+# más unas pocas veces el tamaño del xlsx (buffer subido + parseo)
+TECHO_FIJO_MB = 40
+TECHO_POR_MB_XLSX = 3
+
+
+def techo_mb(xlsx_mb):
+    """Pico de RSS admitido (MB sobre la base) para un anexo de `xlsx_mb` MB"""
+    return TECHO_FIJO_MB + TECHO_POR_MB_XLSX * xlsx_mb
+
+
+def _rss_mb():
+    """RSS actual del proceso (MB), de /proc; None si no está disponible"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        return None
+
+
+def _pico_mb():
+    import resource
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / 1024 ** (2 if sys.platform == 'darwin' else 1)
+
+
+def medir(ruta, modo):
+    """Corre el pipeline en este proceso y retorna {'base_mb', 'pico_mb'}"""
+    from geih_etnico.excel import escribir_excel
+    from geih_etnico.exportacion import crear_paquete
+    from geih_etnico.memoria import salida_temporal
+    from geih_etnico.pipeline import hojas_validas, leer_anexo
+    from geih_etnico.filtrado import preparar_hojas
+
+    base = _rss_mb()
+
+    # Como st.file_uploader: el archivo subido ya está en un BytesIO
+    with open(ruta, 'rb') as f:
+        subido = io.BytesIO(f.read())
+
+    if modo == 'copias':
+        anexo = leer_anexo(io.BytesIO(subido.getvalue()))
+        hojas = preparar_hojas(hojas_validas(anexo))
+        excel = escribir_excel(hojas).getvalue()
+        paquete = crear_paquete(excel, hojas).read()
+        del excel, paquete
+    else:
+        anexo = leer_anexo(subido)
+        hojas = preparar_hojas(hojas_validas(anexo))
+        with salida_temporal() as excel:
+            escribir_excel(hojas, salida=excel)
+            crear_paquete(excel, hojas).close()
+
+    return {'base_mb': base, 'pico_mb': _pico_mb()}
+
+
+def _medir_en_proceso(ruta, modo):
+    """medir() en un proceso nuevo (desde la raíz del repositorio)"""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    salida = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.memoria', '--medir', ruta, '--modo', modo],
+        check=True, capture_output=True, text=True, cwd=raiz
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def correr(tamanos, directorio):
+    resultados = {}
+    print(f"{'tamaño':<10} {'xlsx MB':>8} " + ' '.join(f'{modo + " MB":>10}' for modo in MODOS))
+    for tamano in tamanos:
+        columnas, filas_por_grupo = TAMANOS[tamano]
+        ruta = os.path.join(directorio, f'anexo_{tamano}.xlsx')
+        if not os.path.exists(ruta):
+            generar_anexo(ruta, columnas, filas_por_grupo)
+
+        resultados[tamano] = {'xlsx_mb': os.path.getsize(ruta) / 1024 ** 2}
+        for modo in MODOS:
+            medicion = _medir_en_proceso(ruta, modo)
+            resultados[tamano][modo] = medicion['pico_mb'] - medicion['base_mb']
+        print(f"{tamano:<10} {resultados[tamano]['xlsx_mb']:>8.1f} "
+              + ' '.join(f"{resultados[tamano][modo]:>10.1f}" for modo in MODOS))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanos', nargs='+', choices=list(TAMANOS), default=['pequeno', 'mediano', 'grande'])
+    parser.add_argument('--directorio', help='Dónde guardar/reutilizar los anexos sintéticos (por defecto, temporal)')
+    parser.add_argument('--techo-mb', type=float, help='Pico máximo admitido en modo vista (MB sobre la base)')
+    parser.add_argument('--medir', help=argparse.SUPPRESS)
+    parser.add_argument('--modo', choices=MODOS, default='vista', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir, args.modo)))
+        return 0
+
+    if args.directorio:
+        os.makedirs(args.directorio, exist_ok=True)
+        resultados = correr(args.tamanos, args.directorio)
+    else:
+        with tempfile.TemporaryDirectory() as directorio:
+            resultados = correr(args.tamanos, directorio)
+
+    excedidos = [
+        t for t, r in resultados.items()
+        if r['vista'] > (args.techo_mb if args.techo_mb is not None else techo_mb(r['xlsx_mb']))
+    ]
+    if excedidos:
+        print(f"\n❌ Pico por encima del techo en: {', '.join(excedidos)}")
+        return 1
+    print("\n✅ Pico por debajo del techo en todos los tamaños")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Genera anexos sintéticos con la forma de HOJAS_TOTAL_NACIONAL, para medir
+rendimiento sin anexos reales.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.sintetico destino.xlsx [--columnas 121] [--filas-por-grupo 1] [--semilla 0]
+"""
+import argparse
+import random
+
+from openpyxl import Workbook
+
+from geih_etnico.config import HOJAS_TOTAL_NACIONAL
+
+MESES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+
+GRUPOS = ['Total Nacional', 'Población étnica', 'Población no étnica']
+
+INDICADORES = [
+    '% población en edad de trabajar',
+    'Tasa Global de Participación (TGP)',
+    'Tasa de Ocupación (TO)',
+    'Tasa de Desocupación (TD)',
+    'Población total',
+    'Población en edad de trabajar (PET)',
+    'Fuerza de trabajo',
+    'Población ocupada',
+    'Población desocupada',
+    'Población fuera de la fuerza de trabajo'
+]
+
+RAMAS = [
+    'Agricultura, ganadería, caza, silvicultura y pesca',
+    'Explotación de minas y canteras',
+    'Industrias manufactureras',
+    'Suministro de electricidad, gas, agua y gestión de desechos',
+    'Construcción',
+    'Comercio y reparación de vehículos',
+    'Alojamiento y servicios de comida',
+    'Transporte y almacenamiento',
+    'Información y comunicaciones',
+    'Actividades financieras y de seguros',
+    'Actividades inmobiliarias',
+    'Actividades profesionales, científicas, técnicas y servicios administrativos',
+    'Administración pública y defensa, educación y atención de la salud humana',
+    'Actividades artísticas, entretenimiento, recreación y otras actividades de servicios',
+    'No informa'
+]
+
+POSICIONES = [
+    'Obrero, empleado particular',
+    'Obrero, empleado del gobierno',
+    'Empleado doméstico',
+    'Trabajador por cuenta propia',
+    'Patrón o empleador',
+    'Trabajador familiar sin remuneración',
+    'Trabajador sin remuneración en empresas de otros hogares',
+    'Jornalero o peón',
+    'Otro'
+]
+
+# Nombre corto -> conceptos de cada grupo (Rama/Posocu llevan su fila de total)
+CONCEPTOS = {
+    'TN_Grupos': INDICADORES,
+    'TN_Sexo': [f'{indicador} - {sexo}' for sexo in ['Hombres', 'Mujeres'] for indicador in INDICADORES],
+    'TN_Rama': RAMAS,
+    'TN_Posocu': POSICIONES
+}
+# RAMAS y POSICIONES incluyen todas las categorías de OTRAS_RAMAS / OTRAS_POSICIONES
+
+
+def encabezados_periodos(num_periodos, mes_fin=9, anio_fin=2025):
+    """
+    Años móviles mes a mes que terminan en `mes_fin`/`anio_fin`:
+    [..., "Sep 24 - Ago 25", "Oct 24 - Sep 25"] (el último a la derecha)
+    """
+    encabezados = []
+    for atras in range(num_periodos - 1, -1, -1):
+        fin = anio_fin * 12 + (mes_fin - 1) - atras
+        inicio = fin - 11
+        encabezados.append(
+            f"{MESES[inicio % 12]} {inicio // 12 % 100:02d} - {MESES[fin % 12]} {fin // 12 % 100:02d}"
+        )
+    return encabezados
+
+
+def _filas_hoja(nombre_corto, config, periodos, filas_por_grupo, rnd):
+    """Filas de una hoja: títulos, fila de períodos, grupos con sus conceptos y notas"""
+    num_periodos = len(periodos)
+    filas = [
+        ['Gran Encuesta Integrada de Hogares - GEIH'],
+        [config['descripcion']],
+        ['Total Nacional']
+    ]
+    # Relleno hasta la fila de períodos (índice 0 = fila 1 de Excel)
+    filas += [[] for _ in range(config['fila_periodos'] - len(filas))]
+    filas.append(['Concepto'] + periodos)
+
+    es_rama_posocu = nombre_corto in ('TN_Rama', 'TN_Posocu')
+    conceptos = CONCEPTOS[nombre_corto]
+    if filas_por_grupo > 1:
+        conceptos = conceptos + [
+            f'{concepto} (desagregación {k})'
+            for k in range(2, filas_por_grupo + 1) for concepto in conceptos
+        ]
+
+    for grupo in GRUPOS:
+        filas.append([grupo])
+        if es_rama_posocu:
+            total = [rnd.uniform(1000, 25000) for _ in range(num_periodos)]
+            filas.append(['Población Ocupada'] + total)
+            for concepto in conceptos:
+                filas.append([concepto] + [t * rnd.uniform(0.005, 0.2) for t in total])
+        else:
+            for concepto in conceptos:
+                es_tasa = concepto.startswith(('%', 'Tasa'))
+                filas.append([concepto] + [
+                    rnd.uniform(5, 95) if es_tasa else rnd.uniform(1000, 50000)
+                    for _ in range(num_periodos)
+                ])
+
+    filas.append([])
+    filas.append(['Fuente: DANE, GEIH (datos sintéticos)'])
+    filas.append(['Nota: resultados en miles; datos expandidos con proyecciones de población'])
+    return filas
+
+
+def generar_anexo(destino, num_columnas=121, filas_por_grupo=1, semilla=0, hojas=HOJAS_TOTAL_NACIONAL):
+    """
+    Escribe un anexo sintético en `destino` (ruta o archivo).
+    `num_columnas` cuenta la columna A (121 = concepto + 120 años móviles);
+    `filas_por_grupo` multiplica los conceptos de cada grupo.
+    Incluye una hoja extra que no está en la configuración, como el anexo real.
+    """
+    rnd = random.Random(semilla)
+    periodos = encabezados_periodos(num_columnas - 1)
+
+    wb = Workbook(write_only=True)
+    for hoja_nombre, config in hojas.items():
+        ws = wb.create_sheet(hoja_nombre)
+        for fila in _filas_hoja(config['nombre_corto'], config, periodos, filas_por_grupo, rnd):
+            ws.append(fila)
+
+    otra = wb.create_sheet('Índice')
+    otra.append(['Contenido del anexo'])
+    for hoja_nombre in hojas:
+        otra.append([hoja_nombre])
+
+    wb.save(destino)
+    return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('destino', help='Archivo .xlsx a generar')
+    parser.add_argument('--columnas', type=int, default=121, help='Columnas por hoja, incluida la A')
+    parser.add_argument('--filas-por-grupo', type=int, default=1, help='Multiplica los conceptos de cada grupo')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    generar_anexo(args.destino, args.columnas, args.filas_por_grupo, args.semilla)
+    print(f"✅ {args.destino}: {args.columnas} columnas, {args.filas_por_grupo} fila(s) por concepto")
+
+
+if __name__ == '__main__':
+    main()
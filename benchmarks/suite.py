@@ -0,0 +1,176 @@
+"""
+Suite de rendimiento reproducible sobre anexos sintéticos de varios tamaños:
+carga, detección de períodos, compactación, filtrado, cálculo de %,
+revisión de consistencia y escritura del Excel.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.suite [--tamanos pequeno mediano] [--repeticiones 3]
+                               [--guardar base.json] [--comparar base.json --umbral 1.25]
+
+Con --comparar termina con código 1 si alguna etapa es más lenta que la
+línea base por encima del umbral (útil para detectar regresiones).
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.sintetico import generar_anexo
+from geih_etnico.carga import cargar_hojas_anexo
+from geih_etnico.compacto import compactar_hoja
+from geih_etnico.config import HOJAS_TOTAL_NACIONAL
+from geih_etnico.consistencia import revisar_consistencia
+from geih_etnico.excel import escribir_excel
+from geih_etnico.filtrado import calcular_porcentajes_rama_posocu, preparar_hojas
+from geih_etnico.periodos import encontrar_columnas_mismo_patron
+from geih_etnico.pipeline import hojas_validas, leer_anexo
+
+# nombre -> (columnas incluida la A, filas por grupo)
+TAMANOS = {
+    'pequeno': (121, 1),
+    'mediano': (1201, 2),
+    'grande': (3601, 5),
+}
+
+
+def _etapas(ruta):
+    """
+    Etapas a medir sobre un anexo: cada una es una función sin argumentos.
+    Las entradas de cada etapa se calculan una vez antes de medir.
+    """
+    hojas_leidas = cargar_hojas_anexo(ruta, HOJAS_TOTAL_NACIONAL)
+    anexo = leer_anexo(ruta)
+    datos_hojas = hojas_validas(anexo)
+    hojas_salida = preparar_hojas(datos_hojas)
+
+    def carga():
+        cargar_hojas_anexo(ruta, HOJAS_TOTAL_NACIONAL)
+
+    def deteccion():
+        for hoja_nombre, df in hojas_leidas.items():
+            encontrar_columnas_mismo_patron(df, HOJAS_TOTAL_NACIONAL[hoja_nombre]['fila_periodos'])
+
+    def compactacion():
+        for hoja_nombre, df in hojas_leidas.items():
+            compactar_hoja(df, anexo['periodos'][hoja_nombre], HOJAS_TOTAL_NACIONAL[hoja_nombre]['nombre_corto'])
+
+    def filtrado():
+        for hoja in datos_hojas.values():
+            hoja.ultimos(4)
+
+    def porcentajes():
+        # Rama/Posocu con todos sus períodos para que el % escale con las columnas
+        for nombre_corto in ['TN_Rama', 'TN_Posocu']:
+            hoja = datos_hojas[nombre_corto]
+            calcular_porcentajes_rama_posocu(hoja.valores, hoja.categorias)
+
+    def preparacion():
+        preparar_hojas(datos_hojas)
+
+    def consistencia():
+        revisar_consistencia(datos_hojas)
+
+    def escritura():
+        escribir_excel(hojas_salida)
+
+    return {
+        'carga': carga,
+        'deteccion_periodos': deteccion,
+        'compactacion': compactacion,
+        'filtrado': filtrado,
+        'porcentajes': porcentajes,
+        'preparacion': preparacion,
+        'consistencia': consistencia,
+        'escritura': escritura,
+    }
+
+
+def medir(funcion, repeticiones):
+    """Mejor tiempo (s) de `repeticiones` corridas"""
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def correr(tamanos, repeticiones, directorio):
+    """Retorna {tamaño: {etapa: segundos}}"""
+    resultados = {}
+    for tamano in tamanos:
+        columnas, filas_por_grupo = TAMANOS[tamano]
+        ruta = os.path.join(directorio, f'anexo_{tamano}.xlsx')
+        if not os.path.exists(ruta):
+            generar_anexo(ruta, columnas, filas_por_grupo, semilla=0)
+
+        resultados[tamano] = {}
+        for etapa, funcion in _etapas(ruta).items():
+            resultados[tamano][etapa] = medir(funcion, repeticiones)
+            print(f"{tamano:<8} {etapa:<20} {resultados[tamano][etapa]:>9.4f} s", flush=True)
+    return resultados
+
+
+def comparar(resultados, base, umbral):
+    """Imprime la razón actual/base por etapa; retorna las etapas que superan el umbral"""
+    regresiones = []
+    print(f"\n{'Tamaño':<8} {'Etapa':<20} {'Base (s)':>9} {'Actual (s)':>10} {'Razón':>7}")
+    for tamano, etapas in resultados.items():
+        for etapa, segundos in etapas.items():
+            anterior = base.get('resultados', {}).get(tamano, {}).get(etapa)
+            if not anterior:
+                continue
+            razon = segundos / anterior
+            marca = ' ⚠️' if razon > umbral else ''
+            print(f"{tamano:<8} {etapa:<20} {anterior:>9.4f} {segundos:>10.4f} {razon:>7.2f}{marca}")
+            if razon > umbral:
+                regresiones.append((tamano, etapa, razon))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanos', nargs='+', choices=list(TAMANOS), default=['pequeno', 'mediano'])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--directorio', help='Dónde guardar/reutilizar los anexos sintéticos (por defecto, temporal)')
+    parser.add_argument('--guardar', help='Guarda los resultados en JSON (línea base)')
+    parser.add_argument('--comparar', help='Línea base JSON contra la cual comparar')
+    parser.add_argument('--umbral', type=float, default=1.25,
+                        help='Razón actual/base a partir de la cual se reporta regresión (por defecto 1.25)')
+    args = parser.parse_args()
+
+    if args.directorio:
+        os.makedirs(args.directorio, exist_ok=True)
+        resultados = correr(args.tamanos, args.repeticiones, args.directorio)
+    else:
+        with tempfile.TemporaryDirectory() as directorio:
+            resultados = correr(args.tamanos, args.repeticiones, directorio)
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'maquina': platform.platform(),
+                'tamanos': {t: TAMANOS[t] for t in args.tamanos},
+                'resultados': resultados
+            }, f, indent=1)
+        print(f"\n💾 Resultados → {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} etapa(s) más lentas que la base (umbral {args.umbral})")
+            return 1
+        print("\n✅ Sin regresiones")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
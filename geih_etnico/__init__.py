@@ -0,0 +1 @@
+"""Lógica de filtrado del anexo GEIH étnico, independiente de la interfaz Streamlit."""
@@ -0,0 +1,229 @@
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .compacto import compactar_hoja
+
+# =============================================================================
+# CACHÉ DE ANEXOS LEÍDOS
+# =============================================================================
+
+MAX_BYTES_DEFECTO = 512 * 1024 ** 2
+
+# Cambia cuando cambia el formato de las entradas (2: hojas en HojaCompacta),
+# así las entradas en disco de versiones anteriores no se reutilizan
+VERSION_ENTRADA = 2
+
+
+def clave_anexo(contenido, hojas):
+    """
+    Clave del anexo: SHA-256 de los bytes subidos + la configuración de hojas.
+    `contenido` puede ser bytes o memoryview (no se copia).
+    """
+    h = hashlib.sha256()
+    h.update(f'v{VERSION_ENTRADA}'.encode('ascii'))
+    h.update(contenido)
+    h.update(json.dumps(hojas, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
+
+
+def tamano_entrada(entrada):
+    """Memoria aproximada (bytes) de las hojas guardadas en una entrada"""
+    return int(sum(hoja.nbytes for hoja in entrada['hojas'].values()))
+
+
+def _separar_tipos(df):
+    """
+    Parquet no admite columnas que mezclan texto y números:
+    cada columna se guarda como un par <col>_num (float) / <col>_txt (texto)
+    """
+    columnas = {}
+    for col in df.columns:
+        serie = df[col].astype(object)
+        es_num = serie.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool))
+        es_txt = serie.notna() & ~es_num
+        columnas[f'{col}_num'] = pd.to_numeric(serie.where(es_num), errors='coerce').astype('float64')
+        columnas[f'{col}_txt'] = serie.where(es_txt).map(lambda v: str(v) if pd.notna(v) else None).astype(object)
+    return pd.DataFrame(columnas)
+
+
+def _unir_tipos(df_disco, num_columnas):
+    """Inverso de _separar_tipos: reconstruye las columnas de tipo mixto"""
+    columnas = {}
+    for col in range(num_columnas):
+        num = df_disco[f'{col}_num'].astype(object)
+        txt = df_disco[f'{col}_txt'].astype(object)
+        columnas[col] = num.where(num.notna(), txt).where(num.notna() | txt.notna(), np.nan)
+    return pd.DataFrame(columnas, columns=range(num_columnas))
+
+
+class CacheAnexos:
+    """
+    Caché LRU de anexos ya leídos, indexada por clave_anexo().
+
+    Cada entrada es {'hojas': {nombre_hoja: HojaCompacta},
+                     'periodos': {nombre_hoja: (columnas, mes_inicio, mes_fin)},
+                     'filas_periodos': {nombre_hoja: fila}} (ver pipeline.leer_anexo).
+
+    En memoria se conservan entradas hasta `max_bytes`; las menos usadas
+    recientemente se descartan primero. Si se indica `directorio`, cada
+    entrada también se guarda en Parquet (requiere pyarrow) y se recupera
+    de disco entre sesiones y reinicios.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES_DEFECTO, directorio=None):
+        if directorio and importlib.util.find_spec('pyarrow') is None:
+            raise ImportError("La caché en disco requiere pyarrow (pip install pyarrow)")
+
+        self.max_bytes = max_bytes
+        self.directorio = directorio
+        self._entradas = OrderedDict()  # {clave: (entrada, tamaño)}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, clave):
+        return clave in self._entradas
+
+    @property
+    def bytes_en_memoria(self):
+        return self._bytes
+
+    def obtener(self, clave):
+        """Retorna la entrada (memoria o disco) o None si no existe"""
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                return self._entradas[clave][0]
+
+        entrada = self._leer_disco(clave)
+        if entrada is not None:
+            self._guardar_memoria(clave, entrada)
+        return entrada
+
+    def guardar(self, clave, entrada):
+        self._guardar_memoria(clave, entrada)
+        self._escribir_disco(clave, entrada)
+
+    def obtener_o_calcular(self, clave, calcular):
+        """Retorna la entrada de la caché o la calcula con `calcular()` y la guarda"""
+        entrada = self.obtener(clave)
+        if entrada is None:
+            entrada = calcular()
+            self.guardar(clave, entrada)
+        return entrada
+
+    def limpiar(self):
+        """Vacía la caché en memoria (los archivos en disco se conservan)"""
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    # -------------------------------------------------------------------------
+    # Memoria
+    # -------------------------------------------------------------------------
+
+    def _guardar_memoria(self, clave, entrada):
+        tamano = tamano_entrada(entrada)
+        with self._lock:
+            if clave in self._entradas:
+                self._bytes -= self._entradas.pop(clave)[1]
+
+            # Una entrada más grande que el límite no se guarda en memoria
+            if tamano > self.max_bytes:
+                return
+
+            self._entradas[clave] = (entrada, tamano)
+            self._bytes += tamano
+
+            while self._bytes > self.max_bytes:
+                _, (_, tamano_viejo) = self._entradas.popitem(last=False)
+                self._bytes -= tamano_viejo
+
+    # -------------------------------------------------------------------------
+    # Disco
+    # -------------------------------------------------------------------------
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    def _leer_disco(self, clave):
+        if not self.directorio:
+            return None
+
+        ruta = self._ruta(clave)
+        ruta_indice = os.path.join(ruta, 'indice.json')
+        if not os.path.exists(ruta_indice):
+            return None
+
+        with open(ruta_indice, encoding='utf-8') as f:
+            indice = json.load(f)
+
+        hojas = {}
+        periodos = {}
+        filas_periodos = {}
+        for i, hoja in enumerate(indice['hojas']):
+            df_disco = pd.read_parquet(os.path.join(ruta, f'{i}.parquet'))
+            df = _unir_tipos(df_disco, hoja['num_columnas'])
+            if hoja['periodos'] is not None:
+                columnas, mes_inicio, mes_fin = hoja['periodos']
+                periodos[hoja['nombre']] = ({int(c): t for c, t in columnas}, mes_inicio, mes_fin)
+            filas_periodos[hoja['nombre']] = hoja.get('fila_periodos')
+            # En disco la hoja está en el formato de HojaCompacta.a_dataframe()
+            columnas_hoja = {j + 1: periodo for j, periodo in enumerate(hoja['columnas_hoja'])}
+            hojas[hoja['nombre']] = compactar_hoja(
+                df, (columnas_hoja, None, None), hoja['tipo'], filas_periodos[hoja['nombre']]
+            )
+
+        return {'hojas': hojas, 'periodos': periodos, 'filas_periodos': filas_periodos}
+
+    def _escribir_disco(self, clave, entrada):
+        if not self.directorio:
+            return
+
+        ruta = self._ruta(clave)
+        if os.path.exists(ruta):
+            return
+
+        os.makedirs(self.directorio, exist_ok=True)
+        # Se escribe en un directorio temporal y se renombra al final,
+        # así otra sesión nunca lee una entrada a medio escribir
+        ruta_tmp = tempfile.mkdtemp(prefix=f'.{clave[:12]}-', dir=self.directorio)
+        try:
+            indice = {'hojas': []}
+            for i, (nombre, compacta) in enumerate(entrada['hojas'].items()):
+                df = compacta.a_dataframe()
+                _separar_tipos(df).to_parquet(os.path.join(ruta_tmp, f'{i}.parquet'), index=False)
+                periodos = entrada['periodos'].get(nombre)
+                if periodos is not None:
+                    columnas, mes_inicio, mes_fin = periodos
+                    periodos = [list(columnas.items()), mes_inicio, mes_fin]
+                indice['hojas'].append({
+                    'nombre': nombre,
+                    'num_columnas': df.shape[1],
+                    'tipo': compacta.tipo,
+                    'columnas_hoja': list(compacta.periodos),
+                    'periodos': periodos,
+                    'fila_periodos': entrada.get('filas_periodos', {}).get(nombre)
+                })
+
+            with open(os.path.join(ruta_tmp, 'indice.json'), 'w', encoding='utf-8') as f:
+                json.dump(indice, f, ensure_ascii=False)
+
+            os.replace(ruta_tmp, ruta)
+        except OSError:
+            # Otra sesión guardó la misma entrada primero o el disco falló:
+            # la entrada sigue disponible en memoria
+            pass
+        finally:
+            shutil.rmtree(ruta_tmp, ignore_errors=True)
@@ -0,0 +1,161 @@
+import itertools
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from .instrumentacion import etapa
+from .memoria import abrir_entrada, ruta_en_disco
+from .periodos import FILAS_BUSQUEDA_PERIODOS, columnas_mismo_patron, detectar_fila_periodos, indice_periodos
+
+# =============================================================================
+# CARGA SELECTIVA DEL ANEXO
+# =============================================================================
+
+# Mismos textos que pandas interpreta como vacío al leer con read_excel
+VALORES_NA = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+    'n/a', 'nan', 'null'
+])
+
+
+def _limpiar_valor(val):
+    """Convierte celdas vacías o de error en NaN, como lo hace read_excel"""
+    if val is None:
+        return np.nan
+    if isinstance(val, str) and val in VALORES_NA:
+        return np.nan
+    return val
+
+
+def _columnas_objetivo(fila, num_periodos=None):
+    """
+    Elige las columnas a leer a partir de la fila de períodos:
+    columna A + columnas con el mismo patrón que el último período
+    """
+    columnas, _, _ = columnas_mismo_patron(indice_periodos(_limpiar_valor(v) for v in fila))
+    columnas = sorted(columnas)
+
+    if not columnas:
+        return []
+
+    if num_periodos:
+        columnas = columnas[-num_periodos:]
+
+    return [0] + columnas
+
+
+def _leer_hoja(ws, fila_periodos, num_periodos=None):
+    """
+    Lee de una hoja en modo streaming solo las columnas del patrón de períodos.
+    Las filas hasta la de períodos se guardan completas; al llegar a ella se
+    eligen las columnas y el resto de la hoja se recorre tomando solo esas.
+    Con `fila_periodos` None la fila se detecta entre las primeras
+    FILAS_BUSQUEDA_PERIODOS filas.
+    """
+    ws.reset_dimensions()
+
+    limite = fila_periodos if fila_periodos is not None else FILAS_BUSQUEDA_PERIODOS - 1
+    filas = ws.iter_rows(values_only=True)
+    iniciales = []
+    for row in filas:
+        iniciales.append(row)
+        if len(iniciales) > limite:
+            break
+
+    if fila_periodos is None:
+        fila_periodos = detectar_fila_periodos(iniciales)
+
+    if fila_periodos is not None and len(iniciales) > fila_periodos:
+        # Sin patrón de períodos se conserva solo la columna A
+        columnas = _columnas_objetivo(iniciales[fila_periodos], num_periodos) or [0]
+    else:
+        columnas = [0]
+
+    datos = []
+    ultima_fila_con_datos = -1
+
+    for row in itertools.chain(iniciales, filas):
+        ancho = len(row)
+        valores = [_limpiar_valor(row[c]) if c < ancho else np.nan for c in columnas]
+        if not all(v is np.nan for v in valores):
+            ultima_fila_con_datos = len(datos)
+        datos.append(valores)
+
+    # Igual que read_excel: se descartan las filas vacías del final
+    datos = datos[:ultima_fila_con_datos + 1]
+
+    return pd.DataFrame(datos, columns=range(len(columnas)))
+
+
+def nombres_hojas(archivo):
+    """Nombres de las hojas del libro, leyendo solo xl/workbook.xml (sin abrir las hojas)"""
+    with abrir_entrada(archivo) as entrada, zipfile.ZipFile(entrada) as zf:
+        raiz = ElementTree.fromstring(zf.read('xl/workbook.xml'))
+    if hasattr(archivo, 'seek'):
+        archivo.seek(0)
+    ns = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    return [hoja.get('name') for hoja in raiz.iterfind('m:sheets/m:sheet', ns)]
+
+
+def _cargar_parte(ruta, hojas, num_periodos):
+    """Carga un subconjunto de hojas en un proceso del pool"""
+    return cargar_hojas_anexo(ruta, hojas, num_periodos)
+
+
+def _cargar_en_procesos(archivo, hojas, num_periodos, procesos):
+    """
+    Reparte las hojas entre `procesos` procesos; cada uno abre el libro desde
+    disco (un anexo en memoria se vuelca una vez a un temporal), así el
+    contenido no se copia a cada proceso.
+    Conviene con muchas hojas (anexos regionales): el parseo del XML no se
+    paraleliza con hilos.
+    """
+    items = list(hojas.items())
+    partes = [dict(items[i::procesos]) for i in range(procesos) if items[i::procesos]]
+
+    cargadas = {}
+    with etapa('cargar_en_procesos', procesos=len(partes), hojas=len(hojas)), ruta_en_disco(archivo) as ruta:
+        with ProcessPoolExecutor(max_workers=len(partes)) as executor:
+            for resultado in executor.map(_cargar_parte, [ruta] * len(partes), partes, [num_periodos] * len(partes)):
+                cargadas.update(resultado)
+
+    return {hoja_nombre: cargadas[hoja_nombre] for hoja_nombre in hojas if hoja_nombre in cargadas}
+
+
+def cargar_hojas_anexo(archivo, hojas, num_periodos=None, procesos=None):
+    """
+    Abre el anexo en modo de solo lectura y carga únicamente las hojas configuradas.
+
+    De cada hoja se lee primero la fila de períodos para decidir qué columnas
+    conservar (columna A + columnas con el mismo patrón del último período,
+    o solo las últimas `num_periodos`) y después se recorren las filas
+    tomando solo esas columnas. Si la hoja no tiene 'fila_periodos' (None)
+    se detecta.
+
+    Con `procesos` > 1 las hojas se reparten entre varios procesos.
+    Un anexo en memoria (BytesIO, archivo subido) se lee sin copiarlo.
+
+    Retorna {nombre_hoja: DataFrame} con el mismo formato de read_excel(header=None).
+    Las hojas que no existen en el archivo no aparecen en el resultado.
+    """
+    if procesos and procesos > 1 and len(hojas) > 1:
+        return _cargar_en_procesos(archivo, hojas, num_periodos, min(procesos, len(hojas)))
+
+    with abrir_entrada(archivo) as entrada:
+        with etapa('abrir_libro'):
+            wb = load_workbook(entrada, read_only=True, data_only=True, keep_links=False)
+        try:
+            resultado = {}
+            for hoja_nombre, config in hojas.items():
+                if hoja_nombre not in wb.sheetnames:
+                    continue
+                with etapa('leer_hoja', hoja=hoja_nombre):
+                    resultado[hoja_nombre] = _leer_hoja(wb[hoja_nombre], config.get('fila_periodos'), num_periodos)
+            return resultado
+        finally:
+            wb.close()
@@ -0,0 +1,182 @@
+import json
+import os
+import re
+
+# =============================================================================
+# CATÁLOGO DE HOJAS (YAML / JSON)
+# =============================================================================
+#
+# Un catálogo declara qué hojas del anexo se filtran y qué hojas de salida
+# genera cada una, sin tocar el código. Ejemplo (YAML):
+#
+#     hojas:
+#       - hoja: "Ocu * _Rama"          # nombre exacto o patrón (* = región)
+#         nombre_corto: "{region}_Rama"
+#         fila_periodos: auto          # o el índice de la fila (0 = fila 1)
+#         descripcion: Ocupados por rama de actividad
+#         salidas:
+#           - nombre: "{region}_Rama"
+#             periodos: tabla          # 'grafico', 'tabla' o un número fijo
+#
+# Plantillas disponibles en nombre_corto y nombre: {hoja} (nombre de la hoja),
+# {region} (lo que cubre el * del patrón) y {n} (posición de la coincidencia).
+# Las hojas de Rama / Posocu se reconocen porque su nombre_corto contiene
+# "Rama" / "Posocu" (llevan columnas de % y "otras" categorías).
+#
+# resolver_catalogo lo convierte en los dos diccionarios que usa el pipeline:
+# hojas (formato de HOJAS_TOTAL_NACIONAL) y salidas (de SALIDAS_TOTAL_NACIONAL).
+
+PERIODOS_SALIDA = ['grafico', 'tabla']
+
+# Excel no admite nombres de hoja de más de 31 caracteres
+LARGO_MAXIMO_HOJA = 31
+
+
+def _leer_yaml(texto):
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("Para leer catálogos YAML se necesita PyYAML (pip install pyyaml); use JSON si no está disponible")
+    return yaml.safe_load(texto)
+
+
+def cargar_catalogo(origen, nombre=None):
+    """
+    Lee un catálogo YAML o JSON desde una ruta o un archivo (p. ej. subido en la app).
+    El formato se elige por la extensión de `nombre` (o de la ruta); sin extensión
+    conocida se intenta JSON y luego YAML.
+    Lanza ValueError si el catálogo no es válido.
+    """
+    if isinstance(origen, (str, os.PathLike)):
+        nombre = nombre or str(origen)
+        with open(origen, 'rb') as f:
+            contenido = f.read()
+    else:
+        nombre = nombre or getattr(origen, 'name', '')
+        contenido = origen.getvalue() if hasattr(origen, 'getvalue') else origen.read()
+    texto = contenido.decode('utf-8-sig') if isinstance(contenido, bytes) else contenido
+
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension == '.json':
+        catalogo = json.loads(texto)
+    elif extension in ('.yaml', '.yml'):
+        catalogo = _leer_yaml(texto)
+    else:
+        try:
+            catalogo = json.loads(texto)
+        except json.JSONDecodeError:
+            catalogo = _leer_yaml(texto)
+
+    validar_catalogo(catalogo)
+    return catalogo
+
+
+def validar_catalogo(catalogo):
+    """Lanza ValueError con el primer problema encontrado en el catálogo"""
+    if not isinstance(catalogo, dict) or not isinstance(catalogo.get('hojas'), list) or not catalogo['hojas']:
+        raise ValueError("El catálogo debe tener una lista 'hojas' no vacía")
+
+    for i, entrada in enumerate(catalogo['hojas'], start=1):
+        if not isinstance(entrada, dict) or not entrada.get('hoja'):
+            raise ValueError(f"Entrada {i} del catálogo: falta 'hoja'")
+        donde = f"Entrada {i} del catálogo ('{entrada['hoja']}')"
+
+        fila = entrada.get('fila_periodos', 'auto')
+        if fila != 'auto' and fila is not None and (not isinstance(fila, int) or isinstance(fila, bool) or fila < 0):
+            raise ValueError(f"{donde}: 'fila_periodos' debe ser 'auto' o un entero >= 0")
+
+        salidas = entrada.get('salidas')
+        if not isinstance(salidas, list) or not salidas:
+            raise ValueError(f"{donde}: debe tener una lista 'salidas' no vacía")
+        for salida in salidas:
+            if not isinstance(salida, dict) or not salida.get('nombre'):
+                raise ValueError(f"{donde}: cada salida necesita 'nombre'")
+            periodos = salida.get('periodos', 'tabla')
+            if periodos not in PERIODOS_SALIDA and (not isinstance(periodos, int) or isinstance(periodos, bool) or periodos < 1):
+                raise ValueError(f"{donde}: 'periodos' debe ser 'grafico', 'tabla' o un entero >= 1")
+
+
+def _patron_hoja(hoja):
+    """Regex de un nombre de hoja con comodines (* y ?); cada * captura la región"""
+    if '*' not in hoja and '?' not in hoja:
+        return None
+    partes = re.split(r'([*?])', hoja)
+    return re.compile(''.join(
+        '(.+?)' if parte == '*' else '.' if parte == '?' else re.escape(parte)
+        for parte in partes
+    ) + r'\Z')
+
+
+def _coincidencias(entrada, nombres_hojas):
+    """[(nombre_hoja, region)] de las hojas del libro que cubre la entrada"""
+    patron = _patron_hoja(entrada['hoja'])
+    if patron is None:
+        return [(entrada['hoja'], '')] if entrada['hoja'] in nombres_hojas else []
+    coincidencias = []
+    for nombre in nombres_hojas:
+        encontrado = patron.match(nombre)
+        if encontrado:
+            coincidencias.append((nombre, ' '.join(g.strip() for g in encontrado.groups()).strip()))
+    return coincidencias
+
+
+def _unico(nombre, usados, largo=None):
+    """`nombre` (recortado a `largo`) sin repetir los ya usados: nombre, nombre_2, ..."""
+    base = nombre[:largo] if largo else nombre
+    candidato, k = base, 2
+    while candidato in usados:
+        sufijo = f'_{k}'
+        candidato = (base[:largo - len(sufijo)] if largo else base) + sufijo
+        k += 1
+    usados.add(candidato)
+    return candidato
+
+
+def resolver_catalogo(catalogo, nombres_hojas):
+    """
+    Cruza el catálogo con las hojas del libro (ver carga.nombres_hojas).
+
+    Retorna (hojas, salidas, sin_coincidencia):
+      hojas: {nombre_hoja: {'nombre_corto', 'fila_periodos', 'descripcion'}}
+             con fila_periodos None cuando se debe detectar
+      salidas: {nombre_corto: [{'clave', 'nombre', 'periodos', ...}]}
+      sin_coincidencia: entradas del catálogo que no cubren ninguna hoja
+    """
+    hojas = {}
+    salidas = {}
+    sin_coincidencia = []
+    cortos_usados = set()
+    nombres_usados = set()
+    claves_usadas = set()
+
+    for entrada in catalogo['hojas']:
+        coincidencias = [c for c in _coincidencias(entrada, nombres_hojas) if c[0] not in hojas]
+        if not coincidencias:
+            sin_coincidencia.append(entrada['hoja'])
+            continue
+
+        fila = entrada.get('fila_periodos', 'auto')
+        for n, (hoja_nombre, region) in enumerate(coincidencias, start=1):
+            valores = {'hoja': hoja_nombre, 'region': region or hoja_nombre, 'n': n}
+            nombre_corto = _unico(entrada.get('nombre_corto', '{hoja}').format(**valores), cortos_usados)
+            hojas[hoja_nombre] = {
+                'nombre_corto': nombre_corto,
+                'fila_periodos': None if fila == 'auto' else fila,
+                'descripcion': entrada.get('descripcion', hoja_nombre).format(**valores)
+            }
+
+            salidas[nombre_corto] = []
+            for salida in entrada['salidas']:
+                resuelta = dict(salida)
+                resuelta['clave'] = _unico(nombre_corto, claves_usadas)
+                resuelta['nombre'] = _unico(salida['nombre'].format(**valores), nombres_usados, LARGO_MAXIMO_HOJA)
+                resuelta['periodos'] = salida.get('periodos', 'tabla')
+                salidas[nombre_corto].append(resuelta)
+
+    return hojas, salidas, sin_coincidencia
+
+
+def catalogo_de_entorno():
+    """Catálogo de la variable GEIH_CATALOGO (ruta), o None si no está definida"""
+    ruta = os.environ.get('GEIH_CATALOGO')
+    return cargar_catalogo(ruta) if ruta else None
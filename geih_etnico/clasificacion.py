@@ -0,0 +1,124 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .config import OTRAS_POSICIONES, OTRAS_RAMAS
+
+# =============================================================================
+# CLASIFICACIÓN DE FILAS POR CONCEPTO
+# =============================================================================
+#
+# Cada fila de una hoja filtrada recibe una sola etiqueta:
+#   vacio            sin concepto
+#   encabezado       "Concepto", "Serie ...", "Gran Encuesta ..."
+#   nota             "Nota ...", "Fuente ..."
+#   grupo            inicio de grupo: Total Nacional / Población étnica / no étnica
+#   total            "Población Ocupada" (total del grupo en Rama/Posocu)
+#   sin_informacion  "No informa"
+#   otra             va en "Otras ramas" / "Otras posiciones"
+#   tasa             tasas y porcentajes (solo hojas generales)
+#   regular          el resto
+#
+# La etiqueta la usan el cálculo de %, los colores del Excel y la vista previa.
+
+CATEGORIAS = [
+    'vacio', 'encabezado', 'nota', 'grupo', 'total',
+    'sin_informacion', 'otra', 'tasa', 'regular'
+]
+
+# Distinguen mayúsculas
+PATRON_GRUPO = re.compile('Total Nacional|Población étnic|Población no étnic')
+PATRON_TOTAL = re.compile('Población Ocupada')
+
+# Se buscan sobre el texto en minúsculas
+PATRON_ENCABEZADO = re.compile('concepto|serie|gran encuesta')
+PATRON_NOTA = re.compile('nota|fuente')
+PATRON_SIN_INFORMACION = re.compile('no informa')
+PATRON_TASA = re.compile('tasa|%|porcentaje')
+
+# En hojas generales la tasa va primero (es lo único que se colorea);
+# en Rama/Posocu manda la estructura de grupos y totales, y una nota o un
+# encabezado que mencione "otros" sigue siendo nota/encabezado (sin %)
+PRIORIDAD_GENERAL = ['tasa', 'grupo', 'total', 'encabezado', 'nota', 'sin_informacion']
+PRIORIDAD_RAMA_POSOCU = ['grupo', 'total', 'encabezado', 'nota', 'sin_informacion', 'otra']
+
+# Filas que reciben % de participación en Rama/Posocu
+CATEGORIAS_CON_PORCENTAJE = ['grupo', 'otra', 'regular']
+
+
+def inicio_de_grupo(categorias):
+    """
+    Grupo de cada fila: posición de la última fila 'grupo' hasta ella inclusive
+    (array float, NaN en las filas anteriores al primer grupo)
+    """
+    es_inicio = (pd.Series(categorias) == 'grupo').to_numpy()
+    return pd.Series(np.where(es_inicio, np.arange(len(es_inicio)), np.nan)).ffill().to_numpy()
+
+
+def otras_de_hoja(nombre):
+    """Lista de "otras" según el nombre de la hoja (None para hojas generales)"""
+    if 'Rama' in nombre:
+        return OTRAS_RAMAS
+    if 'Posocu' in nombre:
+        return OTRAS_POSICIONES
+    return None
+
+
+@lru_cache(maxsize=None)
+def _patron_otras(otras):
+    """Una sola alternancia precompilada con todas las categorías "otras" """
+    if not otras:
+        return None
+    return re.compile('|'.join(re.escape(otra) for otra in otras))
+
+
+def coincide_otras(conceptos, otras):
+    """
+    Marca las filas cuyo concepto está en `otras` (OTRAS_RAMAS / OTRAS_POSICIONES),
+    sea cual sea su etiqueta: el amarillo del Excel se aplica a todas ellas.
+    Retorna un array booleano alineado con `conceptos`.
+    """
+    patron_otras = _patron_otras(tuple(otras or ()))
+    if patron_otras is None:
+        return np.zeros(len(conceptos), dtype=bool)
+    minusculas = conceptos.where(conceptos.notna(), '').astype(str).str.lower()
+    return minusculas.str.contains(patron_otras).to_numpy(dtype=bool)
+
+
+def clasificar_conceptos(conceptos, otras=None):
+    """
+    Etiqueta cada concepto una sola vez (ver CATEGORIAS).
+
+    `otras` es OTRAS_RAMAS / OTRAS_POSICIONES para hojas de Rama/Posocu
+    (una lista vacía también las trata como Rama/Posocu) o None para hojas
+    generales. Retorna una Serie categórica alineada con `conceptos`.
+    """
+    tiene_concepto = conceptos.notna()
+    texto = conceptos.where(tiene_concepto, '').astype(str)
+    minusculas = texto.str.lower()
+
+    condiciones = {
+        'grupo': texto.str.contains(PATRON_GRUPO),
+        'total': texto.str.contains(PATRON_TOTAL),
+        'encabezado': minusculas.str.contains(PATRON_ENCABEZADO),
+        'nota': minusculas.str.contains(PATRON_NOTA),
+        'sin_informacion': minusculas.str.contains(PATRON_SIN_INFORMACION),
+    }
+
+    if otras is None:
+        prioridad = PRIORIDAD_GENERAL
+        condiciones['tasa'] = minusculas.str.contains(PATRON_TASA)
+    else:
+        prioridad = PRIORIDAD_RAMA_POSOCU
+        condiciones['otra'] = pd.Series(coincide_otras(conceptos, otras), index=conceptos.index)
+
+    vacio = (~tiene_concepto | (texto == '')).to_numpy()
+    etiquetas = np.select(
+        [vacio] + [condiciones[categoria].to_numpy(dtype=bool) for categoria in prioridad],
+        ['vacio'] + prioridad,
+        default='regular'
+    )
+
+    return pd.Series(pd.Categorical(etiquetas, categories=CATEGORIAS), index=conceptos.index)
@@ -0,0 +1,245 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .catalogo import cargar_catalogo
+from .consistencia import revisar_consistencia
+from .excel import escribir_excel
+from .exportacion import exportar_arrow, exportar_parquet, tabla_larga
+from .filtrado import preparar_hojas
+from .incremental import cargar_indice, comparar_publicaciones, guardar_indice, indice_anexo
+from .instrumentacion import medir
+from .pipeline import hojas_del_catalogo, hojas_validas, leer_anexo
+from .servidor import COLA_DEFECTO, MAX_MB_DEFECTO, servir
+from .trabajos import TRABAJOS_DEFECTO, TTL_DEFECTO
+from .validacion import TOLERANCIA, cargar_boletin, validar_hojas
+
+# =============================================================================
+# LÍNEA DE COMANDOS
+# =============================================================================
+
+NOMBRE_SALIDA = 'anexo_filtrado.xlsx'
+
+
+def buscar_anexos(directorio):
+    """Archivos .xlsx del directorio (sin subdirectorios ni temporales de Excel '~$')"""
+    anexos = []
+    for nombre in sorted(os.listdir(directorio)):
+        ruta = os.path.join(directorio, nombre)
+        if nombre.startswith('~$') or not nombre.lower().endswith('.xlsx'):
+            continue
+        if os.path.isfile(ruta):
+            anexos.append(ruta)
+    return anexos
+
+
+def _procesar(ruta, dir_salida, periodos_grafico, periodos_tabla, formatos, boletin, tolerancia, catalogo,
+              consistencia):
+    """Pasos de procesar_archivo; retorna la ruta del Excel escrito"""
+    hojas_anexo, salidas = hojas_del_catalogo(ruta, cargar_catalogo(catalogo) if catalogo else None)
+    datos_hojas = hojas_validas(leer_anexo(ruta, hojas_anexo), hojas_anexo)
+    if not datos_hojas:
+        raise ValueError("No se encontraron hojas válidas para filtrar")
+
+    hojas = preparar_hojas(datos_hojas, periodos_grafico=periodos_grafico, periodos_tabla=periodos_tabla,
+                           salidas=salidas)
+    hojas_excel = hojas
+    if boletin:
+        hojas_excel, _ = validar_hojas(hojas, cargar_boletin(boletin), tolerancia)
+    if consistencia:
+        hoja_consistencia, _ = revisar_consistencia(datos_hojas)
+        hojas_excel = hojas_excel + [hoja_consistencia]
+
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    os.makedirs(os.path.join(dir_salida, nombre), exist_ok=True)
+    ruta_salida = os.path.join(dir_salida, nombre, NOMBRE_SALIDA)
+    with open(ruta_salida, 'wb') as f:
+        escribir_excel(hojas_excel, salida=f)
+
+    if formatos:
+        tabla = tabla_larga(hojas)
+        base = os.path.splitext(ruta_salida)[0]
+        if 'parquet' in formatos:
+            exportar_parquet(tabla, f'{base}.parquet')
+        if 'arrow' in formatos:
+            with open(f'{base}.arrow', 'wb') as f:
+                exportar_arrow(tabla, f)
+
+    return ruta_salida
+
+
+def procesar_archivo(ruta, dir_salida, periodos_grafico, periodos_tabla, formatos=(), boletin=None,
+                     tolerancia=TOLERANCIA, tiempos=False, catalogo=None, consistencia=False):
+    """
+    Procesa un anexo y escribe <dir_salida>/<nombre>/anexo_filtrado.xlsx
+    (y .parquet / .arrow si se piden en `formatos`).
+    Con `boletin` (ruta CSV/JSON) las celdas se validan contra sus cifras.
+    Con `catalogo` (ruta YAML/JSON) las hojas salen del catálogo y no de la
+    configuración de Total Nacional.
+    Con `consistencia` se agrega la hoja Consistencia_Series (ver
+    geih_etnico.consistencia).
+    Con `tiempos` deja al lado tiempos.trace.json (formato Chrome trace).
+    Retorna (ruta, segundos, ruta_salida, error); nunca lanza excepción
+    para que un archivo con problemas no detenga el lote.
+    """
+    inicio = time.perf_counter()
+    try:
+        with medir() as registro:
+            ruta_salida = _procesar(
+                ruta, dir_salida, periodos_grafico, periodos_tabla, formatos, boletin, tolerancia, catalogo,
+                consistencia
+            )
+
+        if tiempos:
+            with open(os.path.join(os.path.dirname(ruta_salida), 'tiempos.trace.json'), 'wb') as f:
+                f.write(registro.exportar('chrome'))
+
+        return ruta, time.perf_counter() - inicio, ruta_salida, None
+    except Exception as e:
+        return ruta, time.perf_counter() - inicio, None, f"{type(e).__name__}: {e}"
+
+
+def comando_batch(args):
+    dir_salida = args.salida or os.path.join(args.directorio, 'filtrados')
+    anexos = buscar_anexos(args.directorio)
+
+    if not anexos:
+        print(f"❌ No hay archivos .xlsx en {args.directorio}")
+        return 1
+
+    print(f"📂 {len(anexos)} anexos → {dir_salida}")
+    inicio = time.perf_counter()
+    errores = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futuros = [
+            executor.submit(
+                procesar_archivo, ruta, dir_salida, args.periodos_grafico, args.periodos_tabla,
+                args.formato, args.boletin, args.tolerancia, args.tiempos, args.catalogo, args.consistencia
+            )
+            for ruta in anexos
+        ]
+        for futuro in as_completed(futuros):
+            ruta, segundos, ruta_salida, error = futuro.result()
+            nombre = os.path.basename(ruta)
+            if error:
+                errores += 1
+                print(f"  ❌ {nombre} ({segundos:.2f} s) - {error}")
+            else:
+                print(f"  ✅ {nombre} ({segundos:.2f} s) → {ruta_salida}")
+
+    total = time.perf_counter() - inicio
+    print(f"Listo: {len(anexos) - errores} correctos, {errores} con error, {total:.2f} s en total")
+    return 1 if errores else 0
+
+
+def indice_de(ruta, anterior=None, catalogo=None):
+    """Índice de una publicación: se lee de un .parquet guardado o se calcula desde el .xlsx"""
+    if ruta.lower().endswith('.parquet'):
+        return cargar_indice(ruta), {}
+    hojas, _ = hojas_del_catalogo(ruta, catalogo)
+    return indice_anexo(hojas_validas(leer_anexo(ruta, hojas), hojas), anterior)
+
+
+def comando_diff(args):
+    inicio = time.perf_counter()
+    catalogo = cargar_catalogo(args.catalogo) if args.catalogo else None
+    anterior, _ = indice_de(args.anterior, catalogo=catalogo)
+    nuevo, recalculados = indice_de(args.nuevo, anterior, catalogo)
+
+    for hoja, periodos in recalculados.items():
+        if periodos:
+            print(f"  🔄 {hoja}: % recalculados para {', '.join(periodos)}")
+
+    reporte = comparar_publicaciones(anterior, nuevo, args.tolerancia)
+    conteo = reporte['estado'].value_counts()
+    resumen = ", ".join(f"{estado}={conteo[estado]}" for estado in conteo.index if conteo[estado])
+    print(f"Cambios: {resumen}" if resumen else "Sin cambios")
+
+    if args.salida:
+        if args.salida.lower().endswith('.csv'):
+            reporte.to_csv(args.salida, index=False)
+        else:
+            reporte.to_excel(args.salida, index=False, sheet_name='Diferencias')
+        print(f"📄 Reporte → {args.salida}")
+
+    if args.guardar_indice:
+        guardar_indice(nuevo, args.guardar_indice)
+        print(f"💾 Índice → {args.guardar_indice}")
+
+    print(f"Listo en {time.perf_counter() - inicio:.2f} s")
+    return 0
+
+
+def comando_servir(args):
+    return servir(
+        args.host, args.puerto, trabajos=args.trabajos, max_cola=args.cola, max_mb=args.max_mb,
+        ttl=args.ttl_min * 60, directorio=args.directorio
+    )
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m geih_etnico',
+        description='Filtrado del anexo GEIH étnico sin la interfaz Streamlit'
+    )
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    batch = subparsers.add_parser('batch', help='Procesa todos los anexos .xlsx de un directorio')
+    batch.add_argument('directorio', help='Directorio con los anexos')
+    batch.add_argument('--periodos-grafico', type=int, default=4,
+                       help='Períodos para la hoja del gráfico (por defecto 4)')
+    batch.add_argument('--periodos-tabla', type=int, default=2,
+                       help='Períodos para las hojas de tablas (por defecto 2)')
+    batch.add_argument('--salida', help='Directorio de salida (por defecto <directorio>/filtrados)')
+    batch.add_argument('--formato', action='append', choices=['parquet', 'arrow'], default=[],
+                       help='Exportar además la tabla larga en este formato (se puede repetir)')
+    batch.add_argument('--workers', type=int, default=None,
+                       help='Procesos en paralelo (por defecto, uno por núcleo)')
+    batch.add_argument('--boletin', help='Cifras del boletín (CSV o JSON) para marcar verde/rojo automáticamente')
+    batch.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                       help=f'Diferencia absoluta admitida frente al boletín (por defecto {TOLERANCIA})')
+    batch.add_argument('--tiempos', action='store_true',
+                       help='Guarda tiempos.trace.json (Chrome trace) junto a cada salida; '
+                            'GEIH_PERFIL=cprofile,tracemalloc agrega perfilado')
+    batch.add_argument('--catalogo', help='Catálogo de hojas (YAML o JSON); por defecto Total Nacional')
+    batch.add_argument('--consistencia', action='store_true',
+                       help='Agrega la hoja Consistencia_Series (rangos, suma de %% y saltos en toda la serie)')
+    batch.set_defaults(funcion=comando_batch)
+
+    diff = subparsers.add_parser('diff', help='Compara dos publicaciones del anexo (revisiones de valores)')
+    diff.add_argument('anterior', help='Anexo anterior (.xlsx) o su índice guardado (.parquet)')
+    diff.add_argument('nuevo', help='Anexo nuevo (.xlsx) o su índice guardado (.parquet)')
+    diff.add_argument('--salida', help='Reporte de diferencias (.xlsx o .csv)')
+    diff.add_argument('--tolerancia', type=float, default=0.0,
+                      help='Diferencia absoluta mínima para considerar un valor revisado (por defecto 0)')
+    diff.add_argument('--guardar-indice', help='Guarda el índice del anexo nuevo (.parquet) para el próximo mes')
+    diff.add_argument('--catalogo', help='Catálogo de hojas (YAML o JSON); por defecto Total Nacional')
+    diff.set_defaults(funcion=comando_diff)
+
+    servidor = subparsers.add_parser('servir', help='API HTTP local para filtrar anexos desde otros servicios')
+    servidor.add_argument('--host', default='127.0.0.1', help='Dirección (por defecto 127.0.0.1)')
+    servidor.add_argument('--puerto', type=int, default=8000, help='Puerto (por defecto 8000)')
+    servidor.add_argument('--trabajos', type=int, default=TRABAJOS_DEFECTO,
+                          help=f'Anexos procesados a la vez (por defecto {TRABAJOS_DEFECTO})')
+    servidor.add_argument('--cola', type=int, default=COLA_DEFECTO,
+                          help=f'Pedidos pendientes antes de responder 503 (por defecto {COLA_DEFECTO})')
+    servidor.add_argument('--max-mb', type=float, default=MAX_MB_DEFECTO,
+                          help=f'Tamaño máximo del anexo subido (por defecto {MAX_MB_DEFECTO} MB)')
+    servidor.add_argument('--ttl-min', type=float, default=TTL_DEFECTO / 60,
+                          help=f'Minutos que se conservan los resultados sin pedirse (por defecto {TTL_DEFECTO // 60})')
+    servidor.add_argument('--directorio', help='Directorio de los resultados (por defecto, temporal)')
+    servidor.set_defaults(funcion=comando_servir)
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
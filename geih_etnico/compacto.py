@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from .clasificacion import clasificar_conceptos, inicio_de_grupo, otras_de_hoja
+
+# =============================================================================
+# HOJA COMPACTA
+# =============================================================================
+#
+# La hoja leída (columna A + columnas del patrón de períodos) llega como un
+# DataFrame de tipo object que mezcla textos y números. Se convierte una sola
+# vez, justo después de la carga, en arreglos contiguos:
+#
+#   conceptos   Categorical con la columna A (NaN en celdas vacías)
+#   categorias  Categorical con la clase de cada fila (ver clasificar_conceptos)
+#   valores     matriz float64 filas x períodos, NaN donde la celda no es un número
+#   textos      {(fila, j): valor} celdas de período que no son números ni vacías
+#               (títulos, encabezados, notas); son pocas, se guardan dispersas
+#   periodos    Index con el encabezado de cada columna de `valores`
+#
+# El resto del pipeline (filtrado, %, índice, tabla larga, Excel) trabaja
+# sobre estos arreglos sin volver a revisar el tipo de cada celda.
+# float64 y no float32: el Excel escribe round(valor, 1) y float32 cambia
+# el redondeo de cifras como 12345.65.
+
+
+def _es_numero(valor):
+    """Mismo criterio que el escritor del Excel: int/float (NaN cuenta como vacío)"""
+    return isinstance(valor, (int, float)) and valor == valor
+
+
+class HojaCompacta:
+    """Hoja del anexo en arreglos tipados (ver el comentario del módulo)"""
+
+    __slots__ = ['tipo', 'conceptos', 'categorias', 'valores', 'textos', 'periodos', 'fila_periodos']
+
+    def __init__(self, tipo, conceptos, categorias, valores, textos, periodos, fila_periodos=None):
+        self.tipo = tipo
+        self.conceptos = conceptos
+        self.categorias = categorias
+        self.valores = valores
+        self.textos = textos
+        self.periodos = periodos
+        self.fila_periodos = fila_periodos
+
+    def __len__(self):
+        return len(self.conceptos)
+
+    @property
+    def nbytes(self):
+        """Memoria aproximada de la hoja (bytes)"""
+        return int(
+            self.conceptos.memory_usage(deep=True) + self.categorias.memory_usage(deep=True)
+            + self.valores.nbytes + self.periodos.memory_usage(deep=True)
+            + sum(64 + (len(v) if isinstance(v, str) else 8) for v in self.textos.values())
+        )
+
+    def ultimos(self, num_periodos):
+        """Misma hoja con solo los últimos `num_periodos` períodos"""
+        inicio = max(len(self.periodos) - num_periodos, 0)
+        return self.columnas(range(inicio, len(self.periodos)))
+
+    def columnas(self, posiciones):
+        """Misma hoja con solo los períodos en `posiciones` (en ese orden)"""
+        posiciones = list(posiciones)
+        nuevas = {j: k for k, j in enumerate(posiciones)}
+        return HojaCompacta(
+            self.tipo, self.conceptos, self.categorias,
+            np.ascontiguousarray(self.valores[:, posiciones]),
+            {(i, nuevas[j]): valor for (i, j), valor in self.textos.items() if j in nuevas},
+            self.periodos[posiciones],
+            self.fila_periodos
+        )
+
+    def conceptos_y_grupos(self, categorias=None):
+        """
+        (conceptos, grupos) como Series alineadas con las filas: el concepto sin
+        espacios al inicio/fin (None si la celda está vacía) y el concepto de la
+        fila de inicio de grupo de cada fila (NaN antes del primer grupo).
+        `categorias` reemplaza a las de la hoja si la salida se clasificó con otro tipo.
+        """
+        categorias = self.categorias if categorias is None else categorias
+        # El strip se hace una vez por concepto distinto, no por fila
+        limpios = {c: str(c).strip() for c in self.conceptos.cat.categories}
+        conceptos = self.conceptos.astype(object).map(limpios)
+        conceptos = conceptos.where(conceptos.notna(), None)
+
+        inicio = inicio_de_grupo(categorias)
+        con_grupo = ~np.isnan(inicio)
+        grupos = np.full(len(inicio), np.nan, dtype=object)
+        grupos[con_grupo] = conceptos.to_numpy()[inicio[con_grupo].astype(int)]
+        return conceptos, pd.Series(grupos, index=conceptos.index)
+
+    def celda(self, i, j):
+        """Valor original de la celda (fila i, período j): número, texto o NaN"""
+        valor = self.valores[i, j]
+        if valor == valor:
+            return valor
+        return self.textos.get((i, j), np.nan)
+
+    def a_dataframe(self):
+        """DataFrame con el formato de la carga: columna 0 = concepto, 1..n = períodos"""
+        columnas = {0: pd.Series(np.asarray(self.conceptos, dtype=object))}
+        for j in range(len(self.periodos)):
+            columnas[j + 1] = pd.Series(self.valores[:, j], dtype=object)
+        df = pd.DataFrame(columnas, columns=range(len(self.periodos) + 1))
+        for (i, j), valor in self.textos.items():
+            df.iat[i, j + 1] = valor
+        return df
+
+
+def compactar_hoja(df, periodos_hoja, tipo, fila_periodos=None):
+    """
+    Convierte una hoja leída (ver carga.cargar_hojas_anexo) a HojaCompacta.
+    `periodos_hoja` es (columnas, mes_inicio, mes_fin) de
+    encontrar_columnas_mismo_patron; `tipo` el nombre corto de la hoja
+    (decide la clasificación de filas de Rama/Posocu).
+    """
+    columnas = periodos_hoja[0] if periodos_hoja else {}
+    posiciones = sorted(columnas)
+
+    codigos, unicos = pd.factorize(df.iloc[:, 0], use_na_sentinel=True)
+    conceptos = pd.Series(pd.Categorical.from_codes(codigos, pd.Index(unicos, dtype=object)))
+
+    valores = np.full((len(df), len(posiciones)), np.nan)
+    textos = {}
+    for j, columna in enumerate(posiciones):
+        celdas = df.iloc[:, columna].tolist()
+        numeros = [valor if _es_numero(valor) else np.nan for valor in celdas]
+        valores[:, j] = numeros
+        for i, valor in enumerate(celdas):
+            if valor == valor and not _es_numero(valor):
+                textos[(i, j)] = valor
+
+    return HojaCompacta(
+        tipo,
+        conceptos,
+        clasificar_conceptos(conceptos.astype(object), otras_de_hoja(tipo)),
+        valores,
+        textos,
+        pd.Index([columnas[c] for c in posiciones], dtype=object),
+        fila_periodos
+    )
@@ -0,0 +1,66 @@
+# =============================================================================
+# CONFIGURACIÓN DE HOJAS A FILTRAR
+# =============================================================================
+
+HOJAS_TOTAL_NACIONAL = {
+    'Total Nacional_Grupos étnicos': {
+        'nombre_corto': 'TN_Grupos',
+        'fila_periodos': 13,
+        'descripcion': 'Indicadores por grupo étnico'
+    },
+    'TN_Grupos étnicos_sexo': {
+        'nombre_corto': 'TN_Sexo',
+        'fila_periodos': 13,
+        'descripcion': 'Indicadores por grupo étnico y sexo'
+    },
+    'Ocu TN_Rama': {
+        'nombre_corto': 'TN_Rama',
+        'fila_periodos': 12,
+        'descripcion': 'Ocupados por rama de actividad'
+    },
+    'Ocu TN_Posocu': {
+        'nombre_corto': 'TN_Posocu',
+        'fila_periodos': 12,
+        'descripcion': 'Ocupados por posición ocupacional'
+    }
+}
+
+# Hojas de salida de cada hoja del anexo (en este orden en el Excel).
+# 'periodos' es 'grafico' o 'tabla' (lo que se elige en la app) o un número fijo.
+# Rama/Posocu se reconocen por el nombre de la salida (llevan columnas de %).
+COLOR_TITULO = '375623'  # Verde oscuro
+
+SALIDAS_TOTAL_NACIONAL = {
+    'TN_Grupos': [
+        {'clave': 'TN_Grupos', 'nombre': 'H1_Grafico_4años', 'periodos': 'grafico'},
+        {'clave': 'TN_Grupos_2', 'nombre': 'H3_Tabla_2años', 'periodos': 'tabla'}
+    ],
+    'TN_Sexo': [
+        {'clave': 'TN_Sexo', 'nombre': 'H3_Sexo', 'periodos': 'tabla'}
+    ],
+    'TN_Rama': [
+        {'clave': 'TN_Rama', 'nombre': 'H4_Rama', 'periodos': 'tabla'}
+    ],
+    'TN_Posocu': [
+        {'clave': 'TN_Posocu', 'nombre': 'H5_Posocu', 'periodos': 'tabla'}
+    ]
+}
+
+# Categorías que van en "Otras ramas"
+OTRAS_RAMAS = [
+    'actividades financieras',
+    'actividades inmobiliarias',
+    'explotación de minas',
+    'suministro de electricidad',
+    'información y comunicaciones'
+]
+
+# Categorías que van en "Otras posiciones"
+OTRAS_POSICIONES = [
+    'empleado doméstico',
+    'obrero, empleado del gobierno',
+    'jornalero',
+    'trabajador familiar sin remuneración',
+    'patrón',
+    'otro'
+]
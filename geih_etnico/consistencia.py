@@ -0,0 +1,244 @@
+import numpy as np
+import pandas as pd
+
+from .clasificacion import inicio_de_grupo, otras_de_hoja
+from .excel import AMARILLO, GRIS, ROJO, VERDE
+from .filtrado import calcular_porcentajes_rama_posocu
+from .instrumentacion import etapa
+from .periodos import indice_periodos
+
+# =============================================================================
+# CONSISTENCIA DE LAS SERIES (TODOS LOS PERÍODOS DEL PATRÓN)
+# =============================================================================
+#
+# El filtrado deja 2-4 períodos, pero la HojaCompacta conserva toda la
+# historia del mismo patrón (ej. todos los Oct-Sep) como matriz numérica.
+# Sobre esa matriz se revisa, por indicador (fila) y período:
+#   fuera_de_rango     tasas fuera de 0-100 o niveles negativos
+#   suma_porcentajes   en Rama/Posocu, los % de participación de un grupo
+#                      (ramas/posiciones + No informa) no suman ~100
+#   salto              variación anual (puntos para tasas, % para niveles)
+#                      que se aleja de las variaciones habituales de la fila
+# Las variaciones se calculan solo entre años consecutivos del patrón.
+# Un salto se mide con desviaciones robustas (mediana y MAD de la fila),
+# así un año atípico no esconde a los demás.
+# La hoja Consistencia_Series lista el conteo por hoja y los hallazgos.
+
+REGLAS = ['fuera_de_rango', 'suma_porcentajes', 'salto']
+COLORES_REGLA = {'fuera_de_rango': ROJO, 'suma_porcentajes': ROJO, 'salto': AMARILLO}
+
+NOMBRE_CONSISTENCIA = 'Consistencia_Series'
+
+LIMITES_TASA = (0.0, 100.0)
+# Los % van redondeados a un decimal: con ~15 filas la suma se puede correr ~0.75
+TOLERANCIA_SUMA = 1.0  # puntos porcentuales
+UMBRAL_SALTO = 4.0     # desviaciones robustas
+# Desviación mínima: evita marcar cambios pequeños en filas muy estables
+PISO_TASA = 0.5        # puntos porcentuales
+PISO_NIVEL = 2.0       # % de variación
+MIN_VARIACIONES = 4    # variaciones anuales necesarias para revisar saltos
+
+# Filas del detalle en la hoja de Excel (los conteos incluyen todos)
+MAX_DETALLE = 2000
+
+COLUMNAS = ['hoja', 'fila', 'grupo', 'concepto', 'periodo', 'regla', 'valor', 'referencia']
+
+
+def _anios_fin(periodos):
+    """Año final de cada período ("Oct 24 - Sep 25" -> 2025), NaN si no se reconoce"""
+    indice = indice_periodos([None] + list(periodos))
+    anios = indice['anio_fin'].reindex(range(1, len(periodos) + 1))
+    return anios.astype('Float64').to_numpy(dtype=float, na_value=np.nan)
+
+
+def variaciones_anuales(hoja):
+    """
+    Variación frente al año anterior del patrón: matriz filas x períodos
+    (la primera columna y los años no consecutivos quedan en NaN).
+    Tasas en puntos porcentuales; el resto, en % sobre el valor anterior.
+    """
+    valores = hoja.valores
+    es_tasa = (hoja.categorias == 'tasa').to_numpy()
+    variaciones = np.full(valores.shape, np.nan)
+    if valores.shape[1] < 2:
+        return variaciones
+
+    previo, actual = valores[:, :-1], valores[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relativa = np.where(previo > 0, (actual / previo - 1) * 100, np.nan)
+    variaciones[:, 1:] = np.where(es_tasa[:, None], actual - previo, relativa)
+
+    consecutivos = np.diff(_anios_fin(hoja.periodos)) == 1
+    variaciones[:, 1:][:, ~consecutivos] = np.nan
+    return variaciones
+
+
+def _saltos(variaciones, es_tasa):
+    """(marcas, mediana por fila): variaciones a más de UMBRAL_SALTO desviaciones robustas"""
+    con_dato = ~np.isnan(variaciones)
+    suficientes = con_dato.sum(axis=1) >= MIN_VARIACIONES
+    marcas = np.zeros(variaciones.shape, dtype=bool)
+    mediana = np.full(len(variaciones), np.nan)
+    if not suficientes.any():
+        return marcas, mediana
+
+    filas = variaciones[suficientes]
+    mediana[suficientes] = np.nanmedian(filas, axis=1)
+    desviacion = 1.4826 * np.nanmedian(np.abs(filas - mediana[suficientes, None]), axis=1)
+    escala = np.maximum(desviacion, np.where(es_tasa[suficientes], PISO_TASA, PISO_NIVEL))
+
+    with np.errstate(invalid='ignore'):
+        marcas[suficientes] = np.abs(filas - mediana[suficientes, None]) > UMBRAL_SALTO * escala[:, None]
+    return marcas, mediana
+
+
+def sumas_porcentajes(hoja):
+    """
+    Suma de los % de participación de cada grupo de Rama/Posocu por período.
+    Retorna un DataFrame indexado por la fila de inicio de grupo (columnas =
+    posición del período), NaN donde el grupo no tiene total.
+    """
+    # No informa también es parte del total: se le calcula su % como a una rama más
+    categorias = hoja.categorias.astype(object).replace('sin_informacion', 'regular')
+    porcentajes = calcular_porcentajes_rama_posocu(hoja.valores, categorias)
+
+    grupo = inicio_de_grupo(categorias)
+    componentes = categorias.isin(['otra', 'regular']).to_numpy() & ~np.isnan(grupo)
+
+    return pd.DataFrame(porcentajes[componentes]).groupby(grupo[componentes].astype(int)).sum(min_count=1)
+
+
+def _hallazgos(nombre_corto, hoja, grupos, conceptos, filas, columnas, regla, valores, referencias):
+    return pd.DataFrame({
+        'hoja': nombre_corto,
+        'fila': filas,
+        'grupo': grupos[filas],
+        'concepto': conceptos[filas],
+        'periodo': hoja.periodos.to_numpy()[columnas],
+        'regla': regla,
+        'valor': valores,
+        'referencia': referencias
+    })
+
+
+def revisar_hoja(nombre_corto, hoja):
+    """Hallazgos (ver COLUMNAS) de una HojaCompacta con toda su historia"""
+    valores = hoja.valores
+    es_tasa = (hoja.categorias == 'tasa').to_numpy()
+
+    conceptos, grupos = hoja.conceptos_y_grupos()
+    conceptos, grupos = conceptos.to_numpy(), grupos.to_numpy()
+
+    partes = []
+
+    # Rango: tasas entre 0 y 100, niveles no negativos
+    minimo, maximo = LIMITES_TASA
+    with np.errstate(invalid='ignore'):
+        fuera_tasa = es_tasa[:, None] & ((valores < minimo) | (valores > maximo))
+        negativo = ~es_tasa[:, None] & (valores < 0)
+    filas, columnas = np.nonzero(fuera_tasa | negativo)
+    if len(filas):
+        celdas = valores[filas, columnas]
+        limite = np.where(es_tasa[filas], np.where(celdas < minimo, minimo, maximo), 0.0)
+        partes.append(_hallazgos(nombre_corto, hoja, grupos, conceptos, filas, columnas,
+                                 'fuera_de_rango', celdas, limite))
+
+    # Suma de % por grupo (solo Rama/Posocu)
+    if otras_de_hoja(hoja.tipo or nombre_corto) is not None:
+        sumas = sumas_porcentajes(hoja)
+        if not sumas.empty:
+            matriz = sumas.to_numpy(dtype=float)
+            with np.errstate(invalid='ignore'):
+                filas_suma, columnas = np.nonzero(np.abs(matriz - 100) > TOLERANCIA_SUMA)
+            filas = sumas.index.to_numpy()[filas_suma]
+            if len(filas):
+                partes.append(_hallazgos(nombre_corto, hoja, grupos, conceptos, filas, columnas,
+                                         'suma_porcentajes', matriz[filas_suma, columnas].round(1), 100.0))
+
+    # Saltos en la variación anual
+    variaciones = variaciones_anuales(hoja)
+    marcas, mediana = _saltos(variaciones, es_tasa)
+    filas, columnas = np.nonzero(marcas)
+    if len(filas):
+        partes.append(_hallazgos(nombre_corto, hoja, grupos, conceptos, filas, columnas,
+                                 'salto', variaciones[filas, columnas].round(2), mediana[filas].round(2)))
+
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS)
+    return pd.concat(partes, ignore_index=True)
+
+
+def revisar_series(datos_hojas):
+    """
+    Revisa todas las hojas de hojas_validas() ({nombre_corto: HojaCompacta}).
+    Retorna los hallazgos ordenados por hoja, regla, fila y período.
+    """
+    partes = []
+    for nombre_corto, hoja in datos_hojas.items():
+        with etapa('revisar_serie', hoja=nombre_corto):
+            partes.append(revisar_hoja(nombre_corto, hoja))
+
+    hallazgos = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS)
+    hallazgos['regla'] = pd.Categorical(hallazgos['regla'], categories=REGLAS)
+    hallazgos['fila'] = hallazgos['fila'].astype('int64')
+    orden = {nombre: i for i, nombre in enumerate(datos_hojas)}
+    hallazgos = hallazgos.assign(_orden=hallazgos['hoja'].map(orden)).sort_values(
+        ['_orden', 'regla', 'fila'], kind='stable'
+    )
+    return hallazgos.drop(columns='_orden').reset_index(drop=True)
+
+
+def hoja_consistencia(hallazgos, datos_hojas):
+    """Hoja preparada (formato de geih_etnico.excel) con el conteo por hoja y los hallazgos"""
+    conteo = (
+        hallazgos.groupby(['hoja', 'regla'], observed=False).size()
+        .unstack(fill_value=0).reindex(index=list(datos_hojas), columns=REGLAS, fill_value=0)
+    )
+
+    encabezados_conteo = ['Hoja', 'Períodos', 'Fuera de rango', 'Suma de %', 'Saltos']
+    filas = [[(texto, GRIS, i > 0, True) for i, texto in enumerate(encabezados_conteo)]]
+    for nombre, fila in conteo.iterrows():
+        hoja = datos_hojas[nombre]
+        celdas = [(nombre, None, False, False), (len(hoja.periodos), None, True, False)]
+        for regla in REGLAS:
+            n = int(fila[regla])
+            celdas.append((n, COLORES_REGLA[regla] if n else VERDE, True, False))
+        filas.append(celdas)
+
+    encabezados = ['Hoja', 'Grupo', 'Concepto', 'Período', 'Regla', 'Valor', 'Referencia']
+    filas.append([])
+    filas.append([(texto, GRIS, i > 3, True) for i, texto in enumerate(encabezados)])
+
+    for registro in hallazgos.head(MAX_DETALLE).itertuples(index=False):
+        color = COLORES_REGLA[registro.regla]
+        filas.append([
+            (registro.hoja, None, False, False),
+            (registro.grupo, None, False, False),
+            (registro.concepto, None, False, False),
+            (registro.periodo, None, False, False),
+            (registro.regla, color, True, False),
+            (float(registro.valor), color, True, False),
+            (None if pd.isna(registro.referencia) else float(registro.referencia), None, True, False)
+        ])
+    if len(hallazgos) > MAX_DETALLE:
+        filas.append([(f"... {len(hallazgos) - MAX_DETALLE} hallazgos más (ver el conteo)", None, False, False)])
+
+    titulo = f"🧪 {NOMBRE_CONSISTENCIA} - {len(hallazgos)} hallazgos en {len(datos_hojas)} hojas"
+    return {
+        'nombre': NOMBRE_CONSISTENCIA,
+        'titulo': titulo,
+        'titulo_color': 'C00000' if (hallazgos['regla'] != 'salto').any() else '375623',
+        'num_cols': len(encabezados),
+        'filas': filas,
+        'anchos': {'A': 16, 'B': 22, 'C': 45, 'D': 18, 'E': 18, 'F': 14, 'G': 14}
+    }
+
+
+def revisar_consistencia(datos_hojas):
+    """
+    Revisa las series completas de las hojas del anexo.
+    Retorna (hoja Consistencia_Series, hallazgos de revisar_series()).
+    """
+    with etapa('revisar_consistencia', hojas=len(datos_hojas)):
+        hallazgos = revisar_series(datos_hojas)
+        return hoja_consistencia(hallazgos, datos_hojas), hallazgos
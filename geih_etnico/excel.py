@@ -0,0 +1,153 @@
+import io
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+
+from .instrumentacion import etapa
+
+# =============================================================================
+# ESCRITURA DEL EXCEL FILTRADO
+# =============================================================================
+#
+# Cada hoja llega ya preparada (ver geih_etnico.filtrado.preparar_hoja) como un dict:
+#   {
+#       'nombre': 'H4_Rama',
+#       'titulo': '📊 H4_Rama - Oct 23 - Sep 24, Oct 24 - Sep 25',
+#       'titulo_color': '375623',
+#       'num_cols': 5,
+#       'filas': [[(valor, relleno, centrado, negrita), ...], ...],  # desde la fila 2
+#       'anchos': {'A': 50, 'B': 12, ...}
+#   }
+# `relleno` es un color hex (VERDE, AMARILLO, ...) o None; `valor` None deja la
+# celda vacía. Todas las celdas de `filas` llevan borde. Los escritores solo
+# deciden cómo se materializa eso en el archivo (e ignoran otras claves del dict).
+
+# Colores - Simple: Verde = bien, Rojo = mal, Amarillo = otras ramas/posiciones
+VERDE = 'C6EFCE'
+ROJO = 'FFC7CE'
+AMARILLO = 'FFEB9C'
+GRIS = 'D9D9D9'
+
+borde = Border(
+    left=Side(style='thin'), right=Side(style='thin'),
+    top=Side(style='thin'), bottom=Side(style='thin')
+)
+
+
+def _relleno(color):
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+def escribir_referencia(hojas, salida=None):
+    """
+    Escritor de referencia: modelo de objetos de openpyxl, con Font/Alignment
+    nuevos por celda (el camino original). Se conserva para comparar.
+    """
+    wb = Workbook()
+    primera_hoja = True
+
+    for hoja in hojas:
+        if primera_hoja:
+            ws = wb.active
+            ws.title = hoja['nombre'][:31]
+            primera_hoja = False
+        else:
+            ws = wb.create_sheet(hoja['nombre'][:31])
+
+        with etapa('escribir_hoja', hoja=hoja['nombre'], escritor='referencia'):
+            ws.merge_cells(f"A1:{get_column_letter(hoja['num_cols'])}1")
+            ws['A1'] = hoja['titulo']
+            ws['A1'].font = Font(bold=True, size=11, color='FFFFFF')
+            ws['A1'].fill = _relleno(hoja['titulo_color'])
+
+            for row_idx, fila in enumerate(hoja['filas'], 2):
+                for col_idx, (valor, relleno, centrado, negrita) in enumerate(fila, 1):
+                    cell = ws.cell(row=row_idx, column=col_idx)
+                    if valor is not None:
+                        cell.value = valor
+                    if negrita:
+                        cell.font = Font(bold=True)
+                    if relleno:
+                        cell.fill = _relleno(relleno)
+                    cell.border = borde
+                    if centrado:
+                        cell.alignment = Alignment(horizontal='center')
+
+            for letra, ancho in hoja['anchos'].items():
+                ws.column_dimensions[letra].width = ancho
+
+    salida = salida if salida is not None else io.BytesIO()
+    with etapa('guardar_libro', escritor='referencia'):
+        wb.save(salida)
+    salida.seek(0)
+    return salida
+
+
+def escribir_streaming(hojas, salida=None):
+    """
+    Escritor por defecto: openpyxl en modo write-only (memoria constante,
+    las filas se escriben en orden) con un objeto de estilo compartido
+    por cada combinación (relleno, centrado, negrita).
+    """
+    wb = Workbook(write_only=True)
+    fuente_negrita = Font(bold=True)
+    centro = Alignment(horizontal='center')
+    rellenos = {}
+
+    def relleno_cacheado(color):
+        if color not in rellenos:
+            rellenos[color] = _relleno(color)
+        return rellenos[color]
+
+    for hoja in hojas:
+        ws = wb.create_sheet(hoja['nombre'][:31])
+
+        # En modo write-only las filas se serializan al archivo temporal en cada append
+        with etapa('escribir_hoja', hoja=hoja['nombre'], escritor='streaming'):
+            for letra, ancho in hoja['anchos'].items():
+                ws.column_dimensions[letra].width = ancho
+            ws.merged_cells.add(f"A1:{get_column_letter(hoja['num_cols'])}1")
+
+            titulo = WriteOnlyCell(ws, value=hoja['titulo'])
+            titulo.font = Font(bold=True, size=11, color='FFFFFF')
+            titulo.fill = relleno_cacheado(hoja['titulo_color'])
+            ws.append([titulo])
+
+            for fila in hoja['filas']:
+                celdas = []
+                for valor, relleno, centrado, negrita in fila:
+                    cell = WriteOnlyCell(ws, value=valor)
+                    if negrita:
+                        cell.font = fuente_negrita
+                    if relleno:
+                        cell.fill = relleno_cacheado(relleno)
+                    cell.border = borde
+                    if centrado:
+                        cell.alignment = centro
+                    celdas.append(cell)
+                ws.append(celdas)
+
+    # Un libro sin hojas no es un xlsx válido
+    if not hojas:
+        wb.create_sheet('Sheet')
+
+    salida = salida if salida is not None else io.BytesIO()
+    with etapa('guardar_libro', escritor='streaming'):
+        wb.save(salida)
+    salida.seek(0)
+    return salida
+
+
+ESCRITORES = {
+    'streaming': escribir_streaming,
+    'referencia': escribir_referencia,
+}
+
+
+def escribir_excel(hojas, escritor='streaming', salida=None):
+    """Escribe las hojas preparadas con el escritor indicado y retorna la salida (BytesIO por defecto)"""
+    if escritor not in ESCRITORES:
+        raise ValueError(f"Escritor desconocido: {escritor} (opciones: {', '.join(ESCRITORES)})")
+    return ESCRITORES[escritor](hojas, salida)
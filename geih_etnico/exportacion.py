@@ -0,0 +1,129 @@
+import io
+import os
+import shutil
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from .clasificacion import CATEGORIAS
+from .instrumentacion import etapa
+from .memoria import TAMANO_BLOQUE, abrir_entrada, salida_temporal
+
+# =============================================================================
+# EXPORTACIÓN COLUMNAR (PARQUET / ARROW)
+# =============================================================================
+#
+# Las hojas preparadas (ver filtrado.preparar_hojas) se aplanan en una tabla
+# larga con una fila por (hoja, concepto, período):
+#   sheet      nombre de la hoja de salida (H1_Grafico_4años, H4_Rama, ...)
+#   fila       posición de la fila dentro de la hoja filtrada
+#   grupo      Total Nacional / Población étnica / ... al que pertenece la fila
+#   concepto   texto de la columna A
+#   periodo    encabezado del período ("Oct 24 - Sep 25")
+#   valor      valor del anexo sin redondear (float64)
+#   pct        % de participación redondeado como en el Excel (solo Rama/Posocu)
+#   categoria  clasificación de la fila (ver clasificacion.CATEGORIAS)
+# Parquet y Arrow requieren pyarrow.
+
+COLUMNAS = ['sheet', 'fila', 'grupo', 'concepto', 'periodo', 'valor', 'pct', 'categoria']
+
+
+def _tabla_hoja(hoja):
+    compacta = hoja['compacta']
+    periodos = hoja['periodos']
+    num_filas, num_periodos = compacta.valores.shape
+
+    valores = compacta.valores
+    if hoja['porcentajes'] is not None:
+        porcentajes = hoja['porcentajes']
+    else:
+        porcentajes = np.full(valores.shape, np.nan)
+
+    # Grupo de cada fila: texto de la última fila de inicio de grupo
+    conceptos, grupos = compacta.conceptos_y_grupos(hoja['categorias'])
+
+    # Una fila por (fila, período), recorriendo la hoja por filas
+    filas = np.repeat(np.arange(num_filas), num_periodos)
+    largo = pd.DataFrame({
+        'sheet': hoja['nombre'],
+        'fila': filas,
+        'grupo': grupos.to_numpy()[filas],
+        'concepto': conceptos.to_numpy()[filas],
+        'periodo': np.tile(np.array(periodos, dtype=object), num_filas),
+        'valor': valores.ravel(),
+        'pct': porcentajes.ravel(),
+        'categoria': hoja['categorias'].to_numpy()[filas]
+    })
+
+    # Solo celdas con dato (los encabezados y filas vacías no aportan)
+    return largo[largo['valor'].notna()]
+
+
+def tabla_larga(hojas):
+    """Tabla larga (ver COLUMNAS) con todas las hojas preparadas"""
+    tablas = [_tabla_hoja(hoja) for hoja in hojas]
+    if not tablas:
+        return pd.DataFrame(columns=COLUMNAS)
+
+    tabla = pd.concat(tablas, ignore_index=True)[COLUMNAS]
+    tabla['sheet'] = pd.Categorical(tabla['sheet'], categories=[hoja['nombre'] for hoja in hojas])
+    tabla['fila'] = tabla['fila'].astype('int32')
+    for columna in ['grupo', 'concepto']:
+        tabla[columna] = tabla[columna].map(lambda c: str(c).strip() if pd.notna(c) else None).astype('string')
+    tabla['periodo'] = tabla['periodo'].astype('string')
+    tabla['valor'] = tabla['valor'].astype('float64')
+    tabla['pct'] = tabla['pct'].astype('float64')
+    tabla['categoria'] = pd.Categorical(tabla['categoria'], categories=CATEGORIAS)
+    return tabla
+
+
+def exportar_parquet(tabla, destino=None):
+    """Escribe la tabla en Parquet (ruta o archivo); sin destino retorna un BytesIO"""
+    salida = destino if destino is not None else io.BytesIO()
+    tabla.to_parquet(salida, index=False)
+    if destino is None:
+        salida.seek(0)
+    return salida
+
+
+def exportar_arrow(tabla, destino=None):
+    """
+    Escribe la tabla en formato Arrow IPC sin compresión, para que los scripts
+    de validación la abran con pyarrow.memory_map sin copiar los datos.
+    Sin destino retorna un BytesIO.
+    """
+    import pyarrow as pa
+
+    salida = destino if destino is not None else io.BytesIO()
+    tabla_arrow = pa.Table.from_pandas(tabla, preserve_index=False)
+    with pa.ipc.new_file(salida, tabla_arrow.schema) as writer:
+        writer.write_table(tabla_arrow)
+    if destino is None:
+        salida.seek(0)
+    return salida
+
+
+def crear_paquete(excel_output, hojas, nombre='anexo_filtrado', salida=None):
+    """
+    Zip con el Excel filtrado y la tabla larga en Parquet y Arrow.
+    `excel_output` puede ser una ruta, un archivo o bytes; cada parte se
+    escribe directo en el zip, sin copias intermedias. Sin `salida` el zip
+    va a un archivo temporal (en disco si es grande) listo para leer.
+    """
+    paquete = salida if salida is not None else salida_temporal()
+    with etapa('crear_paquete'):
+        tabla = tabla_larga(hojas)
+        with zipfile.ZipFile(paquete, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            if isinstance(excel_output, (str, os.PathLike)):
+                zf.write(excel_output, f'{nombre}.xlsx')
+            else:
+                with zf.open(f'{nombre}.xlsx', 'w') as destino, abrir_entrada(excel_output) as origen:
+                    origen.seek(0)
+                    shutil.copyfileobj(origen, destino, TAMANO_BLOQUE)
+            with zf.open(f'{nombre}.parquet', 'w') as destino:
+                exportar_parquet(tabla, destino)
+            with zf.open(f'{nombre}.arrow', 'w') as destino:
+                exportar_arrow(tabla, destino)
+    paquete.seek(0)
+    return paquete
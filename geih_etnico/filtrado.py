@@ -0,0 +1,287 @@
+import contextvars
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from .clasificacion import CATEGORIAS_CON_PORCENTAJE, clasificar_conceptos, coincide_otras, inicio_de_grupo, otras_de_hoja
+from .compacto import compactar_hoja
+from .config import COLOR_TITULO, SALIDAS_TOTAL_NACIONAL
+from .excel import AMARILLO, GRIS, VERDE, escribir_excel
+from .instrumentacion import etapa
+from .periodos import encontrar_columnas_mismo_patron
+
+# Color de la fila según su categoría (el resto de filas no se colorea)
+# En Rama/Posocu: amarillo para "otras ramas/posiciones", verde para el resto
+COLORES_RAMA_POSOCU = {
+    'otra': AMARILLO,
+    'grupo': VERDE,
+    'total': VERDE,
+    'sin_informacion': VERDE,
+    'regular': VERDE
+}
+# En otras hojas: solo colorear tasas
+COLORES_GENERAL = {'tasa': VERDE}
+# En Rama/Posocu solo quedan sin verde los conceptos con estas palabras: los
+# encabezados "Gran Encuesta ..." también van en verde
+PATRON_SIN_VERDE = re.compile('concepto|serie|nota|fuente')
+
+# =============================================================================
+# FILTRADO Y PREPARACIÓN DE HOJAS
+# =============================================================================
+
+
+def filtrar_hoja(df, fila_periodos, num_periodos=4, periodos=None):
+    """
+    Filtra una hoja dejando solo:
+    - Columna A (conceptos)
+    - Últimas N columnas del MISMO patrón de período
+    `periodos` es el resultado ya calculado de encontrar_columnas_mismo_patron
+    (si no se pasa, se detecta de nuevo)
+    Se mantiene por compatibilidad: el pipeline usa HojaCompacta.ultimos
+    """
+    if periodos is None:
+        periodos = encontrar_columnas_mismo_patron(df, fila_periodos)
+    columnas, mes_inicio, mes_fin = periodos
+
+    if not columnas:
+        return None, [], None
+
+    filtrada = compactar_hoja(df, periodos, '', fila_periodos).ultimos(num_periodos)
+    patron = f"{mes_inicio}-{mes_fin}" if mes_inicio else None
+
+    return filtrada.a_dataframe(), list(filtrada.periodos), patron
+
+
+def calcular_porcentajes_rama_posocu(valores, categorias):
+    """
+    Calcula los % de participación para cada rama/posición
+    Busca "Población Ocupada" como total y calcula % para cada categoría
+    `valores` es la matriz filas x períodos (float, NaN si no hay número) y
+    `categorias` la clasificación de filas (ver clasificar_conceptos).
+    Retorna una matriz del mismo tamaño con NaN donde no hay porcentaje
+    """
+    categorias = pd.Series(categorias)
+
+    # Cada fila queda asociada a la última fila de inicio de grupo anterior a ella
+    grupo = inicio_de_grupo(categorias)
+    # Fila de total (Población Ocupada)
+    es_total = (categorias == 'total').to_numpy()
+
+    # Totales por grupo: si un grupo tiene varias filas de total, manda la última
+    filas_total = np.flatnonzero(es_total & ~np.isnan(grupo))
+    grupos_total = pd.Series(filas_total, index=grupo[filas_total])
+    grupos_total = grupos_total[~grupos_total.index.duplicated(keep='last')]
+
+    # Total de cada fila según su grupo (NaN si el grupo no tiene total)
+    total = np.full(valores.shape, np.nan)
+    con_total = pd.Index(grupos_total.index).get_indexer(grupo)
+    tiene_total = con_total >= 0
+    total[tiene_total] = valores[grupos_total.to_numpy()[con_total[tiene_total]]]
+
+    filas_pct = tiene_total & categorias.isin(CATEGORIAS_CON_PORCENTAJE).to_numpy()
+    calcular = filas_pct[:, None] & ~np.isnan(valores) & (np.nan_to_num(total) > 0)
+
+    porcentajes = np.full(valores.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = (valores / total) * 100
+    # round() de Python para que el redondeo sea idéntico al de los valores del anexo
+    porcentajes[calcular] = [round(p, 1) for p in pct[calcular].tolist()]
+
+    return porcentajes
+
+
+def preparar_hoja(hoja, hoja_config, porcentajes=None):
+    """
+    Decide valores, colores y anchos de una hoja de salida
+    (el formato lo describe geih_etnico.excel)
+    `hoja` es la HojaCompacta ya filtrada a los períodos de la salida
+    `porcentajes` permite pasar los % de Rama/Posocu ya calculados (matriz filas x períodos)
+    El tipo de hoja (Rama/Posocu/general) sale de hoja_config['tipo'] (nombre
+    corto de la hoja del anexo) o, si no viene, del nombre de la salida
+    """
+    tipo = hoja_config.get('tipo', hoja_config['nombre'])
+    es_rama = 'Rama' in tipo
+    es_posocu = 'Posocu' in tipo
+    periodos = list(hoja.periodos)
+
+    # La clasificación de filas viene de la carga, salvo que el tipo de la salida sea otro
+    categorias = hoja.categorias
+    if otras_de_hoja(tipo) != otras_de_hoja(hoja.tipo or tipo):
+        categorias = clasificar_conceptos(hoja.conceptos.astype(object), otras_de_hoja(tipo))
+
+    # Para Rama y Posocu, agregar columnas de %
+    if es_rama or es_posocu:
+        num_cols = len(periodos) * 2 + 1  # Concepto + (valor + %) por cada período
+        if porcentajes is None:
+            with etapa('calcular_porcentajes', hoja=hoja_config['nombre']):
+                porcentajes = calcular_porcentajes_rama_posocu(hoja.valores, categorias)
+    else:
+        num_cols = len(periodos) + 1
+        porcentajes = None
+
+    # Encabezados de período en fila 2
+    encabezados = [('Concepto', GRIS, False, True)]
+    for periodo in periodos:
+        encabezados.append((periodo, GRIS, True, True))
+        if es_rama or es_posocu:
+            # Encabezados: Valor1, %1, Valor2, %2, etc.
+            encabezados.append(('%', GRIS, True, True))
+    filas = [encabezados]
+
+    # Datos - Colorear según tipo de hoja
+    colores = COLORES_RAMA_POSOCU if es_rama or es_posocu else COLORES_GENERAL
+    colores_fila = categorias.map(colores).astype(object)
+    if es_rama or es_posocu:
+        conceptos_objeto = hoja.conceptos.astype(object)
+        minusculas = conceptos_objeto.where(conceptos_objeto.notna(), '').astype(str).str.lower()
+        encabezado_verde = (categorias == 'encabezado').to_numpy() & ~minusculas.str.contains(PATRON_SIN_VERDE).to_numpy()
+        colores_fila[encabezado_verde] = VERDE
+        # Amarillo también para notas/encabezados que mencionan "otras" (sin %)
+        colores_fila[coincide_otras(conceptos_objeto, otras_de_hoja(tipo))] = AMARILLO
+    colores_fila = colores_fila.where(colores_fila.notna(), None).tolist()
+
+    # Listas de Python: una sola conversión por hoja en vez de un acceso por celda
+    conceptos = hoja.conceptos.astype(object).tolist()
+    valores = hoja.valores.tolist()
+    pcts = porcentajes.tolist() if porcentajes is not None else None
+    textos = hoja.textos
+
+    for row_idx, fila_valores in enumerate(valores):
+        concepto = conceptos[row_idx]
+        color_fila = colores_fila[row_idx]
+
+        # Concepto
+        fila = [(concepto if pd.notna(concepto) else '', None, False, False)]
+
+        if es_rama or es_posocu:
+            # Valor y % para cada período (los textos no se copian)
+            for valor, pct in zip(fila_valores, pcts[row_idx]):
+                if valor == valor:
+                    fila.append((round(valor, 1), color_fila, True, False))
+                else:
+                    fila.append((None, None, True, False))
+
+                if pct == pct:
+                    fila.append((pct, color_fila, True, False))
+                else:
+                    fila.append((None, None, True, False))
+        else:
+            # Hojas normales sin %
+            for col_idx, valor in enumerate(fila_valores):
+                if valor == valor:
+                    fila.append((round(valor, 1), color_fila, True, False))
+                elif (row_idx, col_idx) in textos:
+                    fila.append((textos[row_idx, col_idx], None, False, False))
+                else:
+                    fila.append((None, None, False, False))
+
+        filas.append(fila)
+
+    # Ajustar anchos
+    anchos = {'A': 50}
+    if es_rama or es_posocu:
+        for i in range(len(periodos) * 2):
+            anchos[get_column_letter(i + 2)] = 12
+    else:
+        for i in range(len(periodos)):
+            anchos[get_column_letter(i + 2)] = 16
+
+    return {
+        'compacta': hoja,
+        'periodos': periodos,
+        'categorias': categorias,
+        'porcentajes': porcentajes,
+        'nombre': hoja_config['nombre'],
+        'titulo': f"📊 {hoja_config['nombre']} - {', '.join(periodos)}",
+        'titulo_color': hoja_config['titulo_color'],
+        'num_cols': num_cols,
+        'filas': filas,
+        'anchos': anchos
+    }
+
+
+def _preparar_salida(hoja_key, hoja_config, hoja, porcentajes_previos=None):
+    """Filtra y prepara una hoja de salida (se ejecuta en un hilo del pool)"""
+    if not len(hoja.periodos):
+        return None
+    with etapa('filtrar_hoja', hoja=hoja_config['nombre']):
+        filtrada = hoja.ultimos(hoja_config['periodos'])
+
+    porcentajes = None
+    if porcentajes_previos is not None and otras_de_hoja(hoja_config.get('tipo', hoja_config['nombre'])) is not None:
+        # % ya calculados (fila x período) -> alineados con la hoja filtrada
+        porcentajes = porcentajes_previos.reindex(
+            index=range(len(filtrada)), columns=filtrada.periodos
+        ).to_numpy(dtype=float)
+
+    with etapa('preparar_hoja', hoja=hoja_config['nombre']):
+        preparada = preparar_hoja(filtrada, hoja_config, porcentajes)
+    preparada['clave'] = hoja_key
+    return preparada
+
+
+def periodos_de_salida(periodos, periodos_grafico, periodos_tabla):
+    """Número de períodos de una salida: 'grafico' / 'tabla' o un número fijo"""
+    if periodos == 'grafico':
+        return periodos_grafico
+    if periodos == 'tabla':
+        return periodos_tabla
+    return int(periodos)
+
+
+def preparar_hojas(datos_hojas, periodos_grafico=4, periodos_tabla=2, max_workers=None, porcentajes_previos=None,
+                   salidas=None):
+    """
+    Filtra y prepara en paralelo (un hilo por hoja) todas las hojas de salida.
+    Retorna la lista de hojas preparadas en el orden de la configuración;
+    cada una trae además 'clave', 'compacta', 'periodos', 'categorias'
+    y 'porcentajes' para reutilizarlos sin recalcular.
+    `porcentajes_previos` ({nombre_corto: DataFrame fila x periodo}, ver
+    incremental.porcentajes_por_hoja) evita recalcular los % de Rama/Posocu.
+    `salidas` ({nombre_corto: [salida, ...]}, ver config.SALIDAS_TOTAL_NACIONAL
+    y catalogo.resolver_catalogo) define las hojas de salida.
+    `datos_hojas` es {nombre_corto: HojaCompacta} (ver pipeline.hojas_validas).
+    """
+    salidas = SALIDAS_TOTAL_NACIONAL if salidas is None else salidas
+
+    tareas = []
+    for hoja_datos, salidas_hoja in salidas.items():
+        if hoja_datos not in datos_hojas:
+            continue
+
+        previos = (porcentajes_previos or {}).get(hoja_datos)
+        for salida in salidas_hoja:
+            hoja_config = {
+                'nombre': salida['nombre'],
+                'tipo': hoja_datos,
+                'periodos': periodos_de_salida(salida['periodos'], periodos_grafico, periodos_tabla),
+                'titulo_color': salida.get('titulo_color', COLOR_TITULO)
+            }
+            tareas.append((salida['clave'], hoja_config, datos_hojas[hoja_datos], previos))
+
+    if not tareas:
+        return []
+
+    # Cada hilo corre con una copia del contexto (registro de instrumentación activo)
+    contextos = [contextvars.copy_context() for _ in tareas]
+
+    # map conserva el orden de la configuración aunque las hojas terminen en otro orden
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(tareas), os.cpu_count() or 1)) as executor:
+        hojas = list(executor.map(lambda contexto, tarea: contexto.run(_preparar_salida, *tarea), contextos, tareas))
+
+    return [hoja for hoja in hojas if hoja is not None]
+
+
+def crear_excel_filtrado_simple(datos_hojas, periodos_grafico=4, periodos_tabla=2, escritor='streaming', max_workers=None):
+    """
+    Crea Excel con las hojas filtradas del anexo
+    Todos los datos en VERDE (luego el usuario marca en rojo los errores)
+    `escritor` elige el backend de geih_etnico.excel ('streaming' o 'referencia')
+    Las hojas se preparan en paralelo y se escriben en una sola etapa al final
+    """
+    hojas = preparar_hojas(datos_hojas, periodos_grafico, periodos_tabla, max_workers)
+    return escribir_excel(hojas, escritor)
@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+from .clasificacion import otras_de_hoja
+from .filtrado import calcular_porcentajes_rama_posocu
+from .instrumentacion import etapa
+
+# =============================================================================
+# PROCESAMIENTO INCREMENTAL ENTRE PUBLICACIONES DEL ANEXO
+# =============================================================================
+#
+# El índice de una publicación guarda, para cada hoja y cada período del
+# patrón, una fila por concepto:
+#   hoja, fila, grupo, concepto, ocurrencia, periodo, valor, pct
+# `ocurrencia` distingue conceptos repetidos dentro de un mismo grupo.
+# Con el índice del mes anterior solo se recalculan los % de los períodos
+# nuevos o con valores distintos, y se puede reportar qué cambió.
+
+CLAVE_FILA = ['hoja', 'grupo', 'concepto', 'ocurrencia']
+
+ESTADOS = ['nuevo_periodo', 'nueva_fila', 'revisado', 'eliminada', 'periodo_retirado']
+
+
+def _iguales(a, b):
+    """Compara dos columnas de valores tratando NaN == NaN"""
+    return a.shape == b.shape and bool(np.all((a == b) | (np.isnan(a) & np.isnan(b))))
+
+
+def _reutilizar_porcentajes(anterior, conceptos, con_valor, periodos, valores, porcentajes):
+    """
+    Copia en `porcentajes` los % del índice anterior para los períodos cuya
+    columna completa (incluidos los totales) no cambió, siempre que la hoja
+    tenga los mismos conceptos en las mismas filas.
+    Retorna las posiciones de los períodos que hay que recalcular.
+    """
+    todos = list(range(len(periodos)))
+
+    conceptos_previos = anterior.drop_duplicates('fila').set_index('fila')['concepto']
+    actuales = conceptos[con_valor]
+    if (list(conceptos_previos.index) != list(actuales.index)
+            or list(conceptos_previos.fillna('')) != list(actuales.fillna(''))):
+        return todos
+
+    filas = range(len(conceptos))
+    previo = anterior.pivot(index='fila', columns='periodo', values='valor').reindex(filas)
+    previo_pct = anterior.pivot(index='fila', columns='periodo', values='pct').reindex(filas)
+
+    recalcular = []
+    for j in todos:
+        periodo = periodos[j]
+        if periodo in previo.columns and _iguales(previo[periodo].to_numpy(dtype=float), valores[:, j]):
+            porcentajes[:, j] = previo_pct[periodo].to_numpy(dtype=float)
+        else:
+            recalcular.append(j)
+    return recalcular
+
+
+def _indice_hoja(nombre_corto, hoja, anterior=None):
+    """
+    Índice de una hoja (HojaCompacta) con todos los períodos del patrón.
+    Retorna (indice, periodos_recalculados).
+    """
+    if not len(hoja.periodos):
+        return None, []
+
+    periodos = list(hoja.periodos)
+    es_rama_posocu = otras_de_hoja(nombre_corto) is not None
+    categorias = hoja.categorias
+
+    conceptos, grupos = hoja.conceptos_y_grupos()
+    ocurrencia = pd.DataFrame({'g': grupos, 'c': conceptos}).fillna('').groupby(['g', 'c']).cumcount()
+
+    valores = hoja.valores
+    # Las filas sin ningún valor numérico (títulos, notas) no entran al índice
+    con_valor = np.isfinite(valores).any(axis=1)
+
+    porcentajes = np.full(valores.shape, np.nan)
+    recalcular = []
+
+    if es_rama_posocu:
+        recalcular = list(range(len(periodos)))
+        if anterior is not None:
+            recalcular = _reutilizar_porcentajes(anterior, conceptos, con_valor, periodos, valores, porcentajes)
+
+        if recalcular:
+            porcentajes[:, recalcular] = calcular_porcentajes_rama_posocu(valores[:, recalcular], categorias)
+
+    num_filas, num_periodos = valores.shape
+    filas = np.repeat(np.arange(num_filas), num_periodos)
+    indice = pd.DataFrame({
+        'hoja': nombre_corto,
+        'fila': filas,
+        'grupo': grupos.to_numpy()[filas],
+        'concepto': conceptos.to_numpy()[filas],
+        'ocurrencia': ocurrencia.to_numpy()[filas],
+        'periodo': np.tile(np.array(periodos, dtype=object), num_filas),
+        'valor': valores.ravel(),
+        'pct': porcentajes.ravel()
+    })
+
+    return indice[con_valor[filas]], [periodos[j] for j in recalcular]
+
+
+def indice_anexo(datos_hojas, anterior=None):
+    """
+    Índice de una publicación a partir de hojas_validas():
+    {nombre_corto: HojaCompacta}.
+
+    Si se pasa el índice `anterior`, los % de Rama/Posocu de los períodos
+    que no cambiaron se copian en lugar de recalcularse.
+    Retorna (indice, {nombre_corto: [períodos recalculados]}).
+    """
+    indices = []
+    recalculados = {}
+    for nombre_corto, hoja in datos_hojas.items():
+        anterior_hoja = None
+        if anterior is not None:
+            anterior_hoja = anterior[anterior['hoja'] == nombre_corto]
+            anterior_hoja = anterior_hoja if not anterior_hoja.empty else None
+
+        with etapa('indice_hoja', hoja=nombre_corto):
+            indice, recalculados[nombre_corto] = _indice_hoja(nombre_corto, hoja, anterior_hoja)
+        if indice is not None:
+            indices.append(indice)
+
+    if not indices:
+        return pd.DataFrame(columns=['hoja', 'fila'] + CLAVE_FILA[1:] + ['periodo', 'valor', 'pct']), recalculados
+
+    return pd.concat(indices, ignore_index=True), recalculados
+
+
+def porcentajes_por_hoja(indice):
+    """
+    % de participación del índice como {nombre_corto: DataFrame fila x periodo},
+    en el formato que acepta preparar_hojas(porcentajes_previos=...)
+    """
+    return {
+        hoja: grupo.pivot(index='fila', columns='periodo', values='pct')
+        for hoja, grupo in indice.groupby('hoja', sort=False)
+    }
+
+
+def guardar_indice(indice, destino):
+    """Guarda el índice en Parquet (ruta o archivo)"""
+    indice.to_parquet(destino, index=False)
+
+
+def cargar_indice(origen):
+    return pd.read_parquet(origen)
+
+
+def comparar_publicaciones(anterior, nuevo, tolerancia=0.0):
+    """
+    Reporte de diferencias entre dos índices. Una fila por celda que cambió:
+    hoja, grupo, concepto, ocurrencia, periodo, valor_anterior, valor_nuevo,
+    diferencia, diferencia_pct, estado (ver ESTADOS).
+    `tolerancia` es la diferencia absoluta a partir de la cual un valor se
+    considera revisado.
+    """
+    clave = CLAVE_FILA + ['periodo']
+    unidos = anterior[clave + ['valor']].merge(
+        nuevo[clave + ['valor']], on=clave, how='outer',
+        suffixes=('_anterior', '_nuevo'), indicator=True
+    )
+
+    hoja_periodo = pd.MultiIndex.from_arrays([unidos['hoja'], unidos['periodo']])
+    periodo_existia = hoja_periodo.isin(pd.MultiIndex.from_arrays([anterior['hoja'], anterior['periodo']]))
+    periodo_existe = hoja_periodo.isin(pd.MultiIndex.from_arrays([nuevo['hoja'], nuevo['periodo']]))
+
+    solo_nuevo = (unidos['_merge'] == 'right_only').to_numpy()
+    solo_anterior = (unidos['_merge'] == 'left_only').to_numpy()
+
+    diferencia = unidos['valor_nuevo'] - unidos['valor_anterior']
+    cambio_nan = unidos['valor_nuevo'].isna() != unidos['valor_anterior'].isna()
+    revisado = (unidos['_merge'] == 'both') & ((diferencia.abs() > tolerancia) | cambio_nan)
+
+    estado = np.select(
+        [solo_nuevo & ~periodo_existia, solo_nuevo, revisado.to_numpy(), solo_anterior & periodo_existe, solo_anterior],
+        ['nuevo_periodo', 'nueva_fila', 'revisado', 'eliminada', 'periodo_retirado'],
+        default=''
+    )
+
+    unidos['diferencia'] = diferencia
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unidos['diferencia_pct'] = (diferencia / unidos['valor_anterior'].abs() * 100).round(2)
+    unidos['estado'] = pd.Categorical(estado, categories=ESTADOS)
+
+    reporte = unidos[estado != ''].drop(columns='_merge')
+    return reporte.sort_values(['estado'] + clave, kind='stable').reset_index(drop=True)
@@ -0,0 +1,245 @@
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# =============================================================================
+# INSTRUMENTACIÓN DEL PIPELINE
+# =============================================================================
+#
+# Cada etapa del pipeline (abrir libro, leer hoja, detectar períodos, filtrar,
+# calcular %, escribir hoja, guardar libro, ...) se envuelve en:
+#
+#     with etapa('leer_hoja', hoja=hoja_nombre):
+#         ...
+#
+# Si no hay un registro activo (ver medir) la etapa no hace nada.
+# El registro activo vive en una ContextVar: cada sesión de Streamlit y cada
+# proceso del batch tiene el suyo; preparar_hojas lo pasa a sus hilos.
+#
+# Perfilado opcional por corrida, sin cambiar código:
+#   GEIH_PERFIL=cprofile            cProfile de la corrida completa
+#   GEIH_PERFIL=tracemalloc         memoria asignada y pico por etapa
+#   GEIH_PERFIL=cprofile,tracemalloc
+# (en la app también con ?perfil=... en la URL)
+#
+# tracemalloc es de todo el proceso: la memoria se mide solo en las etapas del
+# hilo dueño del registro (las de los hilos de preparar_hojas entran en el pico
+# de la etapa que los espera), y con varias sesiones midiendo a la vez los
+# valores son aproximados. El seguimiento se apaga cuando termina el último
+# registro que lo pidió, y solo si lo encendió un registro.
+
+PERFILES = ['cprofile', 'tracemalloc']
+
+_registro_actual = contextvars.ContextVar('registro_geih', default=None)
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_usuarios = 0
+_tracemalloc_propio = False
+
+
+def perfil_solicitado(valor=None):
+    """Perfiles pedidos en `valor` o en la variable GEIH_PERFIL (lista separada por comas)"""
+    valor = valor if valor is not None else os.environ.get('GEIH_PERFIL', '')
+    pedidos = {p.strip().lower() for p in valor.split(',') if p.strip()}
+    return [p for p in PERFILES if p in pedidos]
+
+
+def _activar_tracemalloc():
+    """Registra un usuario de tracemalloc (lo enciende si nadie lo había hecho)"""
+    global _tracemalloc_usuarios, _tracemalloc_propio
+    with _tracemalloc_lock:
+        if _tracemalloc_usuarios == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_propio = True
+        _tracemalloc_usuarios += 1
+
+
+def _liberar_tracemalloc():
+    """Quita un usuario; el último apaga tracemalloc si lo encendió un registro"""
+    global _tracemalloc_usuarios, _tracemalloc_propio
+    with _tracemalloc_lock:
+        _tracemalloc_usuarios -= 1
+        if _tracemalloc_usuarios == 0 and _tracemalloc_propio:
+            tracemalloc.stop()
+            _tracemalloc_propio = False
+
+
+def _rss_mb():
+    """Pico de memoria residente del proceso (MB), si el sistema lo informa"""
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB, macOS bytes
+    return round(maximo / 1024 ** (2 if os.uname().sysname == 'Darwin' else 1), 1)
+
+
+class Registro:
+    """Etapas medidas de una corrida (y el perfil de cProfile si se pidió)"""
+
+    def __init__(self, perfil=()):
+        self.perfil = list(perfil)
+        self.etapas = []
+        self.inicio = time.perf_counter()
+        self.duracion = None
+        self.estadisticas = None
+        self._lock = threading.Lock()
+        self._pila = threading.local()
+        self._profiler = None
+        # La memoria se mide solo en el hilo que crea el registro
+        self._hilo = threading.get_ident()
+        self._tracemalloc = 'tracemalloc' in self.perfil
+
+        if self._tracemalloc:
+            _activar_tracemalloc()
+        if 'cprofile' in self.perfil:
+            # cProfile solo perfila el hilo que lo activa
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    @contextmanager
+    def etapa(self, nombre, detalle):
+        memoria = self._tracemalloc and threading.get_ident() == self._hilo and tracemalloc.is_tracing()
+        pila = self._pila.__dict__.setdefault('etapas', [])
+        marco = {'pico_hijos': 0}
+
+        if memoria:
+            actual, pico = tracemalloc.get_traced_memory()
+            if pila:
+                pila[-1]['pico_hijos'] = max(pila[-1]['pico_hijos'], pico)
+            tracemalloc.reset_peak()
+            marco['memoria_inicio'] = actual
+
+        pila.append(marco)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            fin = time.perf_counter()
+            pila.pop()
+            evento = {
+                'etapa': nombre,
+                'inicio': inicio - self.inicio,
+                'duracion': fin - inicio,
+                'hilo': threading.current_thread().name,
+                'hilo_id': threading.get_ident(),
+                'nivel': len(pila),
+                'detalle': detalle
+            }
+            if memoria:
+                actual, pico = tracemalloc.get_traced_memory()
+                pico = max(pico, marco['pico_hijos'])
+                evento['memoria_mb'] = round((actual - marco['memoria_inicio']) / 1024 ** 2, 3)
+                evento['pico_mb'] = round((pico - marco['memoria_inicio']) / 1024 ** 2, 3)
+                if pila:
+                    pila[-1]['pico_hijos'] = max(pila[-1]['pico_hijos'], pico)
+            with self._lock:
+                self.etapas.append(evento)
+
+    def detener(self):
+        """Cierra el registro y los perfiladores (se puede llamar varias veces)"""
+        if self.duracion is not None:
+            return self
+        self.duracion = time.perf_counter() - self.inicio
+        if self._profiler is not None:
+            self._profiler.disable()
+            salida = io.StringIO()
+            pstats.Stats(self._profiler, stream=salida).sort_stats('cumulative').print_stats(40)
+            self.estadisticas = salida.getvalue()
+            self._profiler = None
+        if self._tracemalloc:
+            _liberar_tracemalloc()
+            self._tracemalloc = False
+        return self
+
+    def tabla(self):
+        """Etapas en orden de inicio como DataFrame (segundos y MB)"""
+        columnas = ['etapa', 'detalle', 'inicio', 'duracion', 'hilo', 'nivel', 'memoria_mb', 'pico_mb']
+        if not self.etapas:
+            return pd.DataFrame(columns=columnas)
+        tabla = pd.DataFrame(self.etapas).sort_values('inicio', kind='stable').reset_index(drop=True)
+        tabla['detalle'] = tabla['detalle'].map(lambda d: ', '.join(f'{k}={v}' for k, v in d.items()))
+        return tabla.reindex(columns=columnas)
+
+    def resumen(self):
+        """Tiempo total y número de llamadas por etapa, de mayor a menor"""
+        tabla = self.tabla()
+        return (
+            tabla.groupby('etapa', sort=False)['duracion']
+            .agg(total='sum', llamadas='count', maximo='max')
+            .sort_values('total', ascending=False)
+        )
+
+    def a_json(self):
+        """Registro completo como dict serializable a JSON"""
+        return {
+            'duracion': self.duracion if self.duracion is not None else time.perf_counter() - self.inicio,
+            'rss_max_mb': _rss_mb(),
+            'perfil': self.perfil,
+            'etapas': sorted(self.etapas, key=lambda e: e['inicio']),
+            'cprofile': self.estadisticas
+        }
+
+    def a_chrome_trace(self):
+        """Formato Trace Event (chrome://tracing, Perfetto)"""
+        pid = os.getpid()
+        # tid debe ser numérico; el nombre del hilo va en un evento de metadatos
+        hilos = {evento['hilo_id']: evento['hilo'] for evento in self.etapas}
+        eventos = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': nombre}}
+            for tid, nombre in hilos.items()
+        ]
+        for evento in self.etapas:
+            args = dict(evento['detalle'])
+            for clave in ['memoria_mb', 'pico_mb']:
+                if clave in evento:
+                    args[clave] = evento[clave]
+            eventos.append({
+                'name': evento['etapa'],
+                'cat': 'geih',
+                'ph': 'X',
+                'ts': round(evento['inicio'] * 1e6, 1),
+                'dur': round(evento['duracion'] * 1e6, 1),
+                'pid': pid,
+                'tid': evento['hilo_id'],
+                'args': args
+            })
+        return {'traceEvents': eventos, 'displayTimeUnit': 'ms'}
+
+    def exportar(self, formato='json'):
+        """Registro serializado ('json' o 'chrome') como bytes UTF-8"""
+        datos = self.a_chrome_trace() if formato == 'chrome' else self.a_json()
+        return json.dumps(datos, ensure_ascii=False, indent=1, default=str).encode('utf-8')
+
+
+@contextmanager
+def medir(perfil=None):
+    """Activa un registro durante el bloque y lo detiene al salir"""
+    registro = Registro(perfil_solicitado() if perfil is None else perfil)
+    token = _registro_actual.set(registro)
+    try:
+        yield registro
+    finally:
+        _registro_actual.reset(token)
+        registro.detener()
+
+
+def etapa(nombre, **detalle):
+    """Mide el bloque en el registro activo (sin registro no hace nada)"""
+    registro = _registro_actual.get()
+    if registro is None or registro.duracion is not None:
+        return nullcontext()
+    return registro.etapa(nombre, detalle)
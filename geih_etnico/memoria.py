@@ -0,0 +1,123 @@
+import io
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# =============================================================================
+# ENTRADA Y SALIDA SIN COPIAS EN MEMORIA
+# =============================================================================
+#
+# Un anexo subido ya vive en memoria (UploadedFile es un BytesIO). En vez de
+# copiarlo con getvalue() / BytesIO(bytes) para cada lector, se lee a través
+# de una vista (memoryview) del mismo buffer: cada lector tiene su propia
+# posición y ninguno copia el archivo completo.
+#
+# Las salidas grandes (Excel, zip) se escriben en archivos temporales
+# (SpooledTemporaryFile: en memoria hasta UMBRAL_SPOOL, después en disco)
+# o directamente en el almacén de la app, y la descarga las lee al hacer clic.
+
+UMBRAL_SPOOL = 16 * 1024 ** 2  # bytes
+TAMANO_BLOQUE = 1024 ** 2      # bytes por escritura al volcar a disco
+
+
+class LectorMemoria(io.RawIOBase):
+    """Archivo de solo lectura sobre un buffer (bytes, memoryview, mmap) sin copiarlo"""
+
+    def __init__(self, buffer):
+        self._vista = memoryview(buffer).cast('B')
+        self._posicion = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, destino):
+        fin = min(self._posicion + len(destino), len(self._vista))
+        n = fin - self._posicion
+        destino[:n] = self._vista[self._posicion:fin]
+        self._posicion = fin
+        return n
+
+    def seek(self, desplazamiento, desde=io.SEEK_SET):
+        if desde == io.SEEK_CUR:
+            desplazamiento += self._posicion
+        elif desde == io.SEEK_END:
+            desplazamiento += len(self._vista)
+        if desplazamiento < 0:
+            raise ValueError("Posición negativa")
+        self._posicion = desplazamiento
+        return self._posicion
+
+    def tell(self):
+        return self._posicion
+
+    def __len__(self):
+        return len(self._vista)
+
+    def close(self):
+        if not self.closed:
+            # Libera el buffer (un BytesIO no se puede modificar mientras haya vistas)
+            self._vista.release()
+        super().close()
+
+
+def buffer_de(archivo):
+    """
+    Buffer del archivo sin copiarlo: getbuffer() de un BytesIO / UploadedFile,
+    o el propio bytes / memoryview. None para rutas y archivos en disco.
+    """
+    if isinstance(archivo, (bytes, bytearray, memoryview)):
+        return archivo
+    if hasattr(archivo, 'getbuffer'):
+        return archivo.getbuffer()
+    return None
+
+
+@contextmanager
+def abrir_entrada(archivo):
+    """
+    Archivo listo para load_workbook / zipfile sin copiar el contenido:
+    las rutas y archivos en disco se pasan tal cual; los buffers en memoria
+    se leen a través de un LectorMemoria con su propia posición.
+    """
+    buffer = buffer_de(archivo)
+    if buffer is None:
+        yield archivo
+        return
+
+    lector = LectorMemoria(buffer)
+    try:
+        yield lector
+    finally:
+        lector.close()
+        if isinstance(buffer, memoryview) and buffer is not archivo:
+            buffer.release()
+
+
+@contextmanager
+def ruta_en_disco(archivo, directorio=None):
+    """
+    Ruta del archivo en disco (p. ej. para abrirlo desde otros procesos sin
+    enviarles el contenido). Un buffer en memoria se vuelca por bloques a un
+    temporal que se borra al salir.
+    """
+    if isinstance(archivo, (str, os.PathLike)):
+        yield archivo
+        return
+
+    fd, ruta = tempfile.mkstemp(suffix='.xlsx', dir=directorio)
+    try:
+        with os.fdopen(fd, 'wb') as destino, abrir_entrada(archivo) as origen:
+            origen.seek(0)
+            shutil.copyfileobj(origen, destino, TAMANO_BLOQUE)
+        yield ruta
+    finally:
+        os.remove(ruta)
+
+
+def salida_temporal(directorio=None, umbral=UMBRAL_SPOOL):
+    """Archivo temporal para una salida: en memoria hasta `umbral` bytes y después en disco"""
+    return tempfile.SpooledTemporaryFile(max_size=umbral, mode='w+b', dir=directorio)
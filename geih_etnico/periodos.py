@@ -0,0 +1,108 @@
+import re
+
+import pandas as pd
+
+# =============================================================================
+# DETECCIÓN DE PERÍODOS
+# =============================================================================
+
+# "Oct 24 - Sep 25" -> ('Oct', '24', 'Sep', '25')
+PATRON_PERIODO = re.compile(r'^([A-Za-z]+)\s*(\d+).*-\s*([A-Za-z]+)\s*(\d+)')
+
+# Abreviaturas de mes en español e inglés -> número de mes
+MESES = {
+    'ene': 1, 'jan': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'apr': 4, 'may': 5,
+    'jun': 6, 'jul': 7, 'ago': 8, 'aug': 8, 'sep': 9, 'set': 9, 'oct': 10,
+    'nov': 11, 'dic': 12, 'dec': 12
+}
+
+
+# Filas del inicio de la hoja en las que se busca la fila de períodos
+FILAS_BUSQUEDA_PERIODOS = 40
+
+
+def _numero_mes(meses):
+    return meses.str[:3].str.lower().map(MESES).astype('Int64')
+
+
+def _anio_completo(anios):
+    anios = pd.to_numeric(anios, errors='coerce').astype('Int64')
+    return anios.where(anios >= 100, anios + 2000)
+
+
+def indice_periodos(fila):
+    """
+    Índice de la fila de períodos en una sola pasada.
+
+    Retorna un DataFrame indexado por la posición de la columna (desde la B,
+    solo celdas con texto) con: texto, patron ("Oct-Sep"), mes_inicio,
+    anio_inicio, mes_fin, anio_fin. Las celdas que no tienen forma de
+    período quedan con patron y meses vacíos.
+    """
+    serie = pd.Series(list(fila), dtype=object).iloc[1:]
+    textos = serie[serie.notna()].astype(str).str.strip()
+    textos = textos[textos != '']
+
+    partes = textos.str.extract(PATRON_PERIODO)
+
+    indice = pd.DataFrame({'texto': textos}, index=textos.index)
+    indice['patron'] = partes[0] + '-' + partes[2]
+    indice['mes_inicio'] = _numero_mes(partes[0])
+    indice['anio_inicio'] = _anio_completo(partes[1])
+    indice['mes_fin'] = _numero_mes(partes[2])
+    indice['anio_fin'] = _anio_completo(partes[3])
+    return indice
+
+
+def columnas_mismo_patron(indice):
+    """
+    A partir del índice de períodos, detecta el patrón del último período
+    (ej: Oct-Sep) y retorna ({col: texto}, mes_inicio, mes_fin)
+    con todas las columnas del mismo patrón
+    """
+    if indice.empty:
+        return {}, None, None
+
+    ultimo = indice.iloc[-1]
+    if pd.isna(ultimo['patron']):
+        return {}, None, None
+
+    mes_inicio, mes_fin = ultimo['patron'].split('-')
+
+    if pd.notna(ultimo['mes_inicio']) and pd.notna(ultimo['mes_fin']):
+        mismo = (indice['mes_inicio'] == ultimo['mes_inicio']) & (indice['mes_fin'] == ultimo['mes_fin'])
+    else:
+        mismo = indice['patron'] == ultimo['patron']
+
+    columnas = indice.loc[mismo.fillna(False).astype(bool), 'texto']
+    return {int(col): texto for col, texto in columnas.items()}, mes_inicio, mes_fin
+
+
+def detectar_fila_periodos(filas):
+    """
+    Posición de la fila con más celdas con forma de período ("Oct 24 - Sep 25")
+    desde la columna B. `filas` es un iterable de filas (tuplas de valores).
+    Retorna None si ninguna fila tiene períodos.
+    """
+    mejor, mejor_cuenta = None, 0
+    for i, fila in enumerate(filas):
+        cuenta = sum(
+            1 for valor in list(fila)[1:]
+            if isinstance(valor, str) and PATRON_PERIODO.match(valor.strip())
+        )
+        if cuenta > mejor_cuenta:
+            mejor, mejor_cuenta = i, cuenta
+    return mejor
+
+
+def detectar_fila_periodos_df(df):
+    """detectar_fila_periodos sobre las primeras filas de un DataFrame ya cargado"""
+    return detectar_fila_periodos(df.head(FILAS_BUSQUEDA_PERIODOS).itertuples(index=False, name=None))
+
+
+def encontrar_columnas_mismo_patron(df, fila_periodos):
+    """
+    Detecta el patrón del último período (ej: Oct-Sep, Dic-Nov)
+    y encuentra todas las columnas con el mismo patrón
+    """
+    return columnas_mismo_patron(indice_periodos(df.iloc[fila_periodos]))
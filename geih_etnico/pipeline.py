@@ -0,0 +1,83 @@
+from .carga import cargar_hojas_anexo, nombres_hojas
+from .catalogo import resolver_catalogo
+from .compacto import compactar_hoja
+from .config import HOJAS_TOTAL_NACIONAL, SALIDAS_TOTAL_NACIONAL
+from .excel import escribir_excel
+from .filtrado import preparar_hojas
+from .instrumentacion import etapa
+from .periodos import detectar_fila_periodos_df, encontrar_columnas_mismo_patron
+
+# =============================================================================
+# PIPELINE COMPLETO: CARGA -> FILTRADO -> EXCEL
+# =============================================================================
+
+
+def leer_anexo(archivo, hojas=HOJAS_TOTAL_NACIONAL, procesos=None):
+    """
+    Lee las hojas configuradas, detecta sus columnas de períodos y las
+    convierte a HojaCompacta (ver geih_etnico.compacto).
+    Las hojas sin 'fila_periodos' la detectan (queda en 'filas_periodos').
+    `procesos` reparte la carga de las hojas entre varios procesos.
+    """
+    hojas_leidas = cargar_hojas_anexo(archivo, hojas, procesos=procesos)
+    compactas = {}
+    periodos = {}
+    filas_periodos = {}
+    for hoja_nombre, df in hojas_leidas.items():
+        with etapa('detectar_periodos', hoja=hoja_nombre):
+            fila = hojas[hoja_nombre].get('fila_periodos')
+            if fila is None:
+                fila = detectar_fila_periodos_df(df)
+            filas_periodos[hoja_nombre] = fila
+            periodos[hoja_nombre] = encontrar_columnas_mismo_patron(df, fila) if fila is not None else ({}, None, None)
+        with etapa('compactar_hoja', hoja=hoja_nombre):
+            compactas[hoja_nombre] = compactar_hoja(
+                df, periodos[hoja_nombre], hojas[hoja_nombre]['nombre_corto'], fila
+            )
+    return {'hojas': compactas, 'periodos': periodos, 'filas_periodos': filas_periodos}
+
+
+def hojas_validas(anexo, hojas=HOJAS_TOTAL_NACIONAL):
+    """
+    Hojas del anexo con períodos detectados, en el formato que espera
+    crear_excel_filtrado_simple: {nombre_corto: HojaCompacta}
+    """
+    return {
+        config['nombre_corto']: anexo['hojas'][hoja_nombre]
+        for hoja_nombre, config in hojas.items()
+        if hoja_nombre in anexo['hojas'] and len(anexo['hojas'][hoja_nombre].periodos)
+    }
+
+
+def hojas_del_catalogo(archivo, catalogo=None):
+    """
+    (hojas, salidas) del catálogo cruzado con las hojas del libro.
+    Sin catálogo se usa la configuración de Total Nacional.
+    """
+    if catalogo is None:
+        return HOJAS_TOTAL_NACIONAL, SALIDAS_TOTAL_NACIONAL
+    hojas, salidas, _ = resolver_catalogo(catalogo, nombres_hojas(archivo))
+    return hojas, salidas
+
+
+def preparar_anexo(archivo, periodos_grafico=4, periodos_tabla=2, hojas=HOJAS_TOTAL_NACIONAL, salidas=None,
+                   procesos=None):
+    """
+    Carga y filtra el anexo. Retorna las hojas preparadas (ver preparar_hojas).
+    Lanza ValueError si el anexo no tiene ninguna hoja válida.
+    """
+    datos_hojas = hojas_validas(leer_anexo(archivo, hojas, procesos), hojas)
+    if not datos_hojas:
+        raise ValueError("No se encontraron hojas válidas para filtrar")
+
+    return preparar_hojas(datos_hojas, periodos_grafico=periodos_grafico, periodos_tabla=periodos_tabla,
+                          salidas=salidas)
+
+
+def procesar_anexo(archivo, periodos_grafico=4, periodos_tabla=2, escritor='streaming', hojas=HOJAS_TOTAL_NACIONAL,
+                   salidas=None, procesos=None):
+    """
+    Carga, filtra y escribe el anexo filtrado. Retorna el BytesIO del Excel.
+    Lanza ValueError si el anexo no tiene ninguna hoja válida.
+    """
+    return escribir_excel(preparar_anexo(archivo, periodos_grafico, periodos_tabla, hojas, salidas, procesos), escritor)
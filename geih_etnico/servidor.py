@@ -0,0 +1,372 @@
+import hashlib
+import json
+import math
+import os
+import shutil
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .consistencia import revisar_consistencia
+from .excel import escribir_excel
+from .filtrado import preparar_hojas
+from .memoria import TAMANO_BLOQUE, salida_temporal
+from .pipeline import hojas_validas, leer_anexo
+from .trabajos import TRABAJOS_DEFECTO, TTL_DEFECTO, ColaTrabajos
+
+# =============================================================================
+# API HTTP SIN INTERFAZ
+# =============================================================================
+#
+# Servicio local (solo biblioteca estándar) para que otros procesos filtren
+# anexos sin pasar por Streamlit:
+#
+#   GET  /salud                     estado del servicio (trabajos y cola)
+#   POST /filtrar?periodos_grafico=4&periodos_tabla=2&consistencia=0
+#                                   cuerpo = .xlsx del anexo -> Excel filtrado
+#   POST /hojas?periodos=4          cuerpo = .xlsx del anexo -> JSON con los
+#                                   últimos períodos de cada hoja
+#
+# El cuerpo se lee por bloques (Content-Length o chunked) a un temporal
+# mientras se calcula su SHA-256; la clave del resultado es ese hash más
+# la ruta y los parámetros. Un resultado ya calculado se responde desde el
+# almacén sin volver a procesar (X-Cache: HIT) y dos pedidos iguales en
+# curso comparten el mismo trabajo de la cola. Los trabajos corren en una
+# ColaTrabajos con `trabajos` hilos; con más de `max_cola` pedidos
+# pendientes se responde 503 para que el cliente reintente.
+
+MAX_MB_DEFECTO = 200
+COLA_DEFECTO = 16          # pedidos pendientes antes de responder 503
+ESPERA_DEFECTO = 10 * 60   # segundos máximos esperando un trabajo
+
+TIPOS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'json': 'application/json'
+}
+
+
+class ErrorPedido(Exception):
+    """Error del cliente: se responde con `estado` y el mensaje en JSON"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+def _entero(parametros, nombre, defecto, minimo=1, maximo=200):
+    valor = parametros.get(nombre, [defecto])[0]
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise ErrorPedido(HTTPStatus.BAD_REQUEST, f"'{nombre}' debe ser un entero")
+    if not minimo <= valor <= maximo:
+        raise ErrorPedido(HTTPStatus.BAD_REQUEST, f"'{nombre}' debe estar entre {minimo} y {maximo}")
+    return valor
+
+
+def _booleano(parametros, nombre):
+    return parametros.get(nombre, ['0'])[0].lower() in ('1', 'true', 'si', 'sí')
+
+
+# -----------------------------------------------------------------------------
+# Trabajos (corren en la cola)
+# -----------------------------------------------------------------------------
+
+
+def _datos_hojas(entrada, trabajo):
+    trabajo.avanzar('leer_anexo')
+    datos_hojas = hojas_validas(leer_anexo(entrada))
+    if not datos_hojas:
+        raise ValueError("No se encontraron hojas válidas para filtrar")
+    return datos_hojas
+
+
+def filtrar_excel(entrada, periodos_grafico, periodos_tabla, consistencia, almacen, nombre, trabajo):
+    """Trabajo: Excel filtrado (el mismo de la app) escrito directo en el almacén"""
+    try:
+        datos_hojas = _datos_hojas(entrada, trabajo)
+        trabajo.avanzar('preparar_hojas')
+        hojas = preparar_hojas(datos_hojas, periodos_grafico=periodos_grafico, periodos_tabla=periodos_tabla)
+        if consistencia:
+            trabajo.avanzar('revisar_consistencia')
+            hojas = hojas + [revisar_consistencia(datos_hojas)[0]]
+        trabajo.avanzar('escribir_excel')
+        with almacen.abrir(nombre) as salida:
+            escribir_excel(hojas, salida=salida)
+        return nombre
+    finally:
+        entrada.close()
+
+
+def hojas_json(datos_hojas, periodos):
+    """
+    Últimos `periodos` de cada hoja como dict serializable:
+    {nombre_corto: {'periodos': [...], 'filas': [{'fila', 'concepto', 'categoria', 'valores'}]}}
+    Solo filas con algún valor; las celdas sin número van como null.
+    """
+    resultado = {}
+    for nombre_corto, hoja in datos_hojas.items():
+        filtrada = hoja.ultimos(periodos)
+        conceptos = filtrada.conceptos.astype(object).tolist()
+        categorias = filtrada.categorias.astype(object).tolist()
+        filas = []
+        for i, valores in enumerate(filtrada.valores.tolist()):
+            if all(math.isnan(valor) for valor in valores):
+                continue
+            concepto = conceptos[i]
+            filas.append({
+                'fila': i,
+                'concepto': None if concepto != concepto else str(concepto).strip(),
+                'categoria': categorias[i],
+                'valores': [None if math.isnan(valor) else valor for valor in valores]
+            })
+        resultado[nombre_corto] = {'periodos': list(filtrada.periodos), 'filas': filas}
+    return resultado
+
+
+def filtrar_json(entrada, periodos, almacen, nombre, trabajo):
+    """Trabajo: JSON con los últimos períodos de cada hoja, guardado en el almacén"""
+    try:
+        datos_hojas = _datos_hojas(entrada, trabajo)
+        trabajo.avanzar('filtrar_hojas')
+        resultado = hojas_json(datos_hojas, periodos)
+        with almacen.abrir(nombre) as salida:
+            salida.write(json.dumps(resultado, ensure_ascii=False).encode('utf-8'))
+        return nombre
+    finally:
+        entrada.close()
+
+
+# -----------------------------------------------------------------------------
+# Servidor
+# -----------------------------------------------------------------------------
+
+
+class ManejadorAnexos(BaseHTTPRequestHandler):
+    """Pedidos de la API (ver el comentario del módulo)"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'geih-etnico'
+
+    def log_message(self, formato, *args):
+        if self.server.registrar:
+            super().log_message(formato, *args)
+
+    # Respuestas ---------------------------------------------------------------
+
+    def _responder_json(self, estado, datos, encabezados=None):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', TIPOS['json'])
+        self.send_header('Content-Length', str(len(cuerpo)))
+        for clave, valor in (encabezados or {}).items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _responder_archivo(self, nombre, tipo, cache):
+        """Envía un archivo del almacén por bloques; False si ya venció"""
+        almacen = self.server.cola.almacen
+        try:
+            f = open(almacen.ruta(nombre), 'rb')
+        except FileNotFoundError:
+            return False
+        with f:
+            os.utime(almacen.ruta(nombre))
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', TIPOS[tipo])
+            self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+            self.send_header('ETag', f'"{os.path.splitext(nombre)[0]}"')
+            self.send_header('X-Cache', cache)
+            if tipo == 'xlsx':
+                self.send_header('Content-Disposition', 'attachment; filename="anexo_filtrado.xlsx"')
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile, TAMANO_BLOQUE)
+        return True
+
+    # Cuerpo del pedido --------------------------------------------------------
+
+    def _bloques_cuerpo(self):
+        """Bloques del cuerpo tal como llegan (Content-Length o Transfer-Encoding: chunked)"""
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            while True:
+                linea = self.rfile.readline(65537)
+                try:
+                    tamano = int(linea.split(b';')[0].strip(), 16)
+                except ValueError:
+                    raise ErrorPedido(HTTPStatus.BAD_REQUEST, "Cuerpo chunked mal formado")
+                if tamano == 0:
+                    # Trailers opcionales hasta la línea vacía
+                    while self.rfile.readline(65537) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return
+                while tamano:
+                    bloque = self.rfile.read(min(tamano, TAMANO_BLOQUE))
+                    if not bloque:
+                        raise ErrorPedido(HTTPStatus.BAD_REQUEST, "Cuerpo incompleto")
+                    tamano -= len(bloque)
+                    yield bloque
+                self.rfile.readline(3)
+            return
+
+        largo = self.headers.get('Content-Length')
+        if largo is None:
+            raise ErrorPedido(HTTPStatus.LENGTH_REQUIRED, "Falta Content-Length (o Transfer-Encoding: chunked)")
+        try:
+            restante = int(largo)
+        except ValueError:
+            raise ErrorPedido(HTTPStatus.BAD_REQUEST, "Content-Length no es un número")
+        if restante < 0:
+            raise ErrorPedido(HTTPStatus.BAD_REQUEST, "Content-Length negativo")
+        if restante > self.server.max_bytes:
+            raise ErrorPedido(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "El anexo supera el tamaño máximo")
+        while restante:
+            bloque = self.rfile.read(min(restante, TAMANO_BLOQUE))
+            if not bloque:
+                raise ErrorPedido(HTTPStatus.BAD_REQUEST, "Cuerpo incompleto")
+            restante -= len(bloque)
+            yield bloque
+
+    def _recibir_anexo(self, ruta, parametros):
+        """
+        Guarda el cuerpo en un temporal calculando su hash al vuelo.
+        Retorna (archivo, clave); la clave incluye la ruta y los parámetros.
+        """
+        h = hashlib.sha256()
+        entrada = salida_temporal()
+        total = 0
+        try:
+            for bloque in self._bloques_cuerpo():
+                total += len(bloque)
+                if total > self.server.max_bytes:
+                    raise ErrorPedido(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "El anexo supera el tamaño máximo")
+                h.update(bloque)
+                entrada.write(bloque)
+        except BaseException:
+            entrada.close()
+            raise
+        if not total:
+            entrada.close()
+            raise ErrorPedido(HTTPStatus.BAD_REQUEST, "El cuerpo del pedido está vacío (se espera el .xlsx)")
+
+        entrada.seek(0)
+        h.update(json.dumps([ruta, parametros], sort_keys=True).encode('utf-8'))
+        return entrada, h.hexdigest()
+
+    # Rutas --------------------------------------------------------------------
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/salud':
+            self._responder_json(HTTPStatus.NOT_FOUND, {'error': 'Ruta no encontrada'})
+            return
+        cola = self.server.cola
+        self._responder_json(HTTPStatus.OK, {
+            'estado': 'ok',
+            'trabajos': self.server.trabajos,
+            'pendientes': cola.pendientes(),
+            'en_memoria': len(cola)
+        })
+
+    def do_POST(self):
+        partes = urlsplit(self.path)
+        try:
+            if partes.path == '/filtrar':
+                self._filtrar(partes.path, parse_qs(partes.query))
+            elif partes.path == '/hojas':
+                self._hojas(partes.path, parse_qs(partes.query))
+            else:
+                # El cuerpo no se lee: la conexión no se puede reutilizar
+                self.close_connection = True
+                self._responder_json(HTTPStatus.NOT_FOUND, {'error': 'Ruta no encontrada'})
+        except ErrorPedido as e:
+            self.close_connection = True
+            encabezados = {'Retry-After': '5'} if e.estado == HTTPStatus.SERVICE_UNAVAILABLE else None
+            self._responder_json(e.estado, {'error': str(e)}, encabezados)
+
+    def _filtrar(self, ruta, parametros):
+        opciones = {
+            'periodos_grafico': _entero(parametros, 'periodos_grafico', 4),
+            'periodos_tabla': _entero(parametros, 'periodos_tabla', 2),
+            'consistencia': _booleano(parametros, 'consistencia')
+        }
+        etapas = ['leer_anexo', 'preparar_hojas', 'escribir_excel']
+        if opciones['consistencia']:
+            etapas.insert(2, 'revisar_consistencia')
+        self._atender(ruta, opciones, 'xlsx', filtrar_excel, list(opciones.values()), etapas)
+
+    def _hojas(self, ruta, parametros):
+        opciones = {'periodos': _entero(parametros, 'periodos', 4)}
+        self._atender(ruta, opciones, 'json', filtrar_json, [opciones['periodos']], ['leer_anexo', 'filtrar_hojas'])
+
+    def _atender(self, ruta, opciones, tipo, funcion, args, etapas):
+        """
+        Recibe el anexo y responde desde el almacén o con el resultado de
+        funcion(entrada, *args, almacen, nombre) corrida en la cola
+        """
+        servidor = self.server
+        cola = servidor.cola
+
+        entrada, clave = self._recibir_anexo(ruta, opciones)
+        nombre = f'{clave}.{tipo}'
+
+        if self._responder_archivo(nombre, tipo, 'HIT'):
+            entrada.close()
+            return
+
+        id_trabajo = f'api-{clave}'
+        existente = cola.obtener(id_trabajo)
+        if existente is not None and existente.estado == 'error':
+            # Un trabajo con error se vuelve a correr con este anexo (ver ColaTrabajos)
+            existente = None
+        if existente is None and cola.pendientes() >= servidor.max_cola:
+            entrada.close()
+            raise ErrorPedido(HTTPStatus.SERVICE_UNAVAILABLE, "Servidor ocupado, reintentar más tarde")
+
+        trabajo = cola.enviar(funcion, entrada, *args, cola.almacen, nombre, id_trabajo=id_trabajo, etapas=etapas)
+        if trabajo is existente:
+            # El trabajo ya existía: esta copia del anexo no se usa
+            entrada.close()
+        if not trabajo.esperar(servidor.espera):
+            # Un trabajo nuevo sigue en la cola y cierra su entrada al terminar
+            raise ErrorPedido(HTTPStatus.GATEWAY_TIMEOUT, "El anexo sigue en proceso, reintentar más tarde")
+
+        if trabajo.estado == 'error':
+            raise ErrorPedido(HTTPStatus.UNPROCESSABLE_ENTITY, trabajo.error)
+        if not self._responder_archivo(nombre, tipo, 'MISS'):
+            raise ErrorPedido(HTTPStatus.GONE, "El resultado venció, reintentar")
+
+
+class ServidorAnexos(ThreadingHTTPServer):
+    """
+    Servidor HTTP de la API: un hilo por conexión para leer y enviar, y una
+    ColaTrabajos con `trabajos` hilos para procesar los anexos.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, direccion, trabajos=TRABAJOS_DEFECTO, max_cola=COLA_DEFECTO, max_mb=MAX_MB_DEFECTO,
+                 ttl=TTL_DEFECTO, directorio=None, espera=ESPERA_DEFECTO, registrar=True):
+        super().__init__(direccion, ManejadorAnexos)
+        self.trabajos = trabajos
+        self.max_cola = max_cola
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.espera = espera
+        self.registrar = registrar
+        self.cola = ColaTrabajos(max_workers=trabajos, ttl=ttl, directorio=directorio)
+
+    def server_close(self):
+        super().server_close()
+        self.cola.cerrar()
+
+
+def servir(host='127.0.0.1', puerto=8000, **opciones):
+    """Atiende pedidos hasta Ctrl+C (ver ServidorAnexos para las opciones)"""
+    servidor = ServidorAnexos((host, puerto), **opciones)
+    print(f"🌐 API en http://{host}:{servidor.server_address[1]} ({servidor.trabajos} trabajos simultáneos)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
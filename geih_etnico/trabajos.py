@@ -0,0 +1,229 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+# =============================================================================
+# COLA DE TRABAJOS EN SEGUNDO PLANO
+# =============================================================================
+#
+# La app envía la lectura del anexo y la generación del Excel a una cola
+# compartida por todas las sesiones; el script de Streamlit termina enseguida
+# y la página consulta el avance de su trabajo cada segundo. Así un anexo
+# grande no congela la sesión y varios analistas procesan a la vez.
+#
+# Los archivos generados se guardan en un almacén temporal en disco y se
+# borran (junto con el trabajo) cuando pasan `ttl` segundos sin consultarse.
+
+ESTADOS = ['en_cola', 'procesando', 'listo', 'error']
+
+TTL_DEFECTO = 30 * 60  # segundos
+TRABAJOS_DEFECTO = 2   # trabajos simultáneos
+
+
+class Trabajo:
+    """Un trabajo de la cola: estado, etapa en curso, resultado o error"""
+
+    def __init__(self, id_trabajo, etapas=()):
+        self.id = id_trabajo
+        self.etapas = list(etapas)
+        self.estado = 'en_cola'
+        self.etapa = None
+        self.completadas = []
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.fin = None
+        self.usado = self.creado
+        self._terminado = threading.Event()
+
+    def avanzar(self, etapa):
+        """Marca el inicio de `etapa` (la anterior queda completada)"""
+        if self.etapa is not None:
+            self.completadas.append(self.etapa)
+        self.etapa = etapa
+
+    @property
+    def terminado(self):
+        return self.estado in ('listo', 'error')
+
+    @property
+    def progreso(self):
+        """Fracción de etapas completadas (0 a 1)"""
+        if self.estado == 'listo':
+            return 1.0
+        if not self.etapas:
+            return 0.0
+        return min(len(self.completadas) / len(self.etapas), 0.99)
+
+    def esperar(self, timeout=None):
+        """Bloquea hasta que el trabajo termine (o pasen `timeout` segundos); retorna terminado"""
+        self._terminado.wait(timeout)
+        return self.terminado
+
+    @property
+    def segundos(self):
+        return (self.fin or time.time()) - self.creado
+
+
+class AlmacenTemporal:
+    """
+    Archivos generados (Excel, zip, ...) en un directorio temporal.
+    Cada archivo vence `ttl` segundos después de su última lectura.
+    """
+
+    def __init__(self, ttl=TTL_DEFECTO, directorio=None):
+        self.ttl = ttl
+        self.directorio = directorio or tempfile.mkdtemp(prefix='geih-artefactos-')
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, os.path.basename(nombre))
+
+    @contextmanager
+    def abrir(self, nombre):
+        """
+        Archivo para escribir un artefacto directamente en disco (sin armarlo
+        antes en memoria); se publica con su nombre solo si se escribió completo.
+        """
+        fd, ruta_tmp = tempfile.mkstemp(prefix='.tmp-', dir=self.directorio)
+        try:
+            with os.fdopen(fd, 'w+b') as f:
+                yield f
+            os.replace(ruta_tmp, self.ruta(nombre))
+        except BaseException:
+            os.remove(ruta_tmp)
+            raise
+
+    def guardar(self, nombre, datos):
+        """Escribe `datos` (bytes) en el almacén"""
+        with self.abrir(nombre) as f:
+            f.write(datos)
+        return self.ruta(nombre)
+
+    def leer(self, nombre):
+        """Bytes del archivo, o None si no existe o ya venció"""
+        ruta = self.ruta(nombre)
+        try:
+            with open(ruta, 'rb') as f:
+                datos = f.read()
+            os.utime(ruta)
+            return datos
+        except FileNotFoundError:
+            return None
+
+    def existe(self, nombre):
+        return os.path.exists(self.ruta(nombre))
+
+    def purgar(self, ahora=None):
+        """Borra los archivos vencidos; retorna cuántos borró"""
+        ahora = ahora or time.time()
+        borrados = 0
+        for entrada in os.scandir(self.directorio):
+            try:
+                if ahora - entrada.stat().st_mtime > self.ttl:
+                    os.remove(entrada.path)
+                    borrados += 1
+            except FileNotFoundError:
+                pass
+        return borrados
+
+    def limpiar(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+class ColaTrabajos:
+    """
+    Pool de hilos con los trabajos de todas las sesiones.
+
+    `enviar(funcion, *args, id_trabajo=..., etapas=[...])` ejecuta
+    funcion(*args, trabajo=trabajo) en segundo plano; la función informa su
+    avance con trabajo.avanzar(etapa) y puede guardar archivos en
+    cola.almacen. Con un `id_trabajo` que ya está en la cola (p. ej. la
+    clave del anexo) no se repite el trabajo: dos sesiones que suben el
+    mismo archivo esperan la misma lectura. Un trabajo con error no se
+    reutiliza: obtener() lo sigue mostrando, pero el siguiente envío con ese
+    id lo vuelve a correr.
+    """
+
+    def __init__(self, max_workers=TRABAJOS_DEFECTO, ttl=TTL_DEFECTO, directorio=None):
+        self.ttl = ttl
+        self.almacen = AlmacenTemporal(ttl, directorio)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='geih-trabajo')
+        self._trabajos = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._trabajos)
+
+    def enviar(self, funcion, *args, id_trabajo=None, etapas=(), **kwargs):
+        """Encola el trabajo (o retorna el que ya existe con ese id) y retorna el Trabajo"""
+        self.purgar()
+        with self._lock:
+            id_trabajo = id_trabajo or uuid.uuid4().hex
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is not None and trabajo.estado != 'error':
+                trabajo.usado = time.time()
+                return trabajo
+
+            trabajo = Trabajo(id_trabajo, etapas)
+            self._trabajos[id_trabajo] = trabajo
+        futuro = self._executor.submit(self._ejecutar, trabajo, funcion, args, kwargs)
+        futuro.add_done_callback(partial(self._cancelado, trabajo))
+        return trabajo
+
+    def _cancelado(self, trabajo, futuro):
+        """Un trabajo que no llegó a correr (cola cerrada) termina con error"""
+        if futuro.cancelled():
+            trabajo.error = "Cancelado: la cola de trabajos se cerró"
+            trabajo.estado = 'error'
+            trabajo.fin = time.time()
+            trabajo._terminado.set()
+
+    def _ejecutar(self, trabajo, funcion, args, kwargs):
+        trabajo.estado = 'procesando'
+        try:
+            trabajo.resultado = funcion(*args, trabajo=trabajo, **kwargs)
+            trabajo.avanzar(None)
+            trabajo.estado = 'listo'
+        except Exception as e:
+            trabajo.error = f"{type(e).__name__}: {e}"
+            trabajo.estado = 'error'
+        finally:
+            trabajo.fin = time.time()
+            trabajo._terminado.set()
+
+    def obtener(self, id_trabajo):
+        """El trabajo con ese id, o None si no existe o ya venció"""
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is not None:
+                trabajo.usado = time.time()
+            return trabajo
+
+    def pendientes(self):
+        """Trabajos en cola o procesando (de todas las sesiones)"""
+        with self._lock:
+            return sum(1 for trabajo in self._trabajos.values() if not trabajo.terminado)
+
+    def purgar(self):
+        """Descarta los trabajos terminados sin consultar hace más de `ttl` y los archivos vencidos"""
+        ahora = time.time()
+        with self._lock:
+            vencidos = [
+                id_trabajo for id_trabajo, trabajo in self._trabajos.items()
+                if trabajo.terminado and ahora - trabajo.usado > self.ttl
+            ]
+            for id_trabajo in vencidos:
+                del self._trabajos[id_trabajo]
+        self.almacen.purgar(ahora)
+        return len(vencidos)
+
+    def cerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.almacen.limpiar()
@@ -0,0 +1,278 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .excel import AMARILLO, GRIS, ROJO, VERDE
+from .exportacion import tabla_larga
+from .instrumentacion import etapa
+
+# =============================================================================
+# VALIDACIÓN CONTRA LAS CIFRAS DEL BOLETÍN
+# =============================================================================
+#
+# El boletín llega como CSV o JSON (lista de objetos) con las columnas:
+#   concepto   texto del indicador ("Tasa de Ocupación", "Comercio", ...)
+#   periodo    encabezado del período ("Dic 24 - Nov 25")
+#   valor      cifra publicada
+# y opcionalmente:
+#   hoja       hoja de salida (H3_Tabla_2años, H4_Rama, ...)
+#   grupo      Total Nacional / Población étnica / Población no étnica
+#   medida     'valor' (por defecto) o 'pct' (% de participación de Rama/Posocu)
+#
+# Conceptos, períodos, hojas y grupos se comparan normalizados (minúsculas,
+# sin tildes ni espacios repetidos). Una hoja/grupo ausente o en blanco vale
+# para cualquiera: la cifra se compara con todas las celdas de ese concepto y
+# período y se queda con las que coinciden o, si ninguna coincide, con la más
+# cercana (así una cifra correcta sin grupo no pinta de rojo a los otros grupos).
+# Cada celda revisada queda en VERDE si coincide y en ROJO si no; el resto
+# conserva su color. La hoja Resumen_Validacion lista las diferencias.
+
+COLUMNAS_BOLETIN = ['concepto', 'periodo', 'valor']
+COLUMNAS_OPCIONALES = ['hoja', 'grupo']
+MEDIDAS = ['valor', 'pct']
+
+ESTADOS = ['no_coincide', 'sin_dato', 'coincide']
+COLORES_ESTADO = {'coincide': VERDE, 'no_coincide': ROJO, 'sin_dato': AMARILLO}
+
+NOMBRE_RESUMEN = 'Resumen_Validacion'
+
+# Diferencia absoluta admitida (las cifras del Excel van con un decimal)
+TOLERANCIA = 0.05
+
+
+def normalizar_texto(serie):
+    """Minúsculas, sin tildes y con un solo espacio entre palabras"""
+    return (
+        serie.astype('string')
+        .str.normalize('NFKD')
+        .str.encode('ascii', errors='ignore')
+        .str.decode('ascii')
+        .str.lower()
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.strip()
+    )
+
+
+def _a_numero(serie):
+    """Cifras como números; acepta coma decimal ("1.234,5" o "56,3")"""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    texto = serie.astype('string').str.strip()
+    con_coma = texto.str.contains(',', regex=False).fillna(False)
+    texto = texto.where(~con_coma, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    return pd.to_numeric(texto, errors='coerce').astype(float)
+
+
+def cargar_boletin(origen, nombre=None):
+    """
+    Lee las cifras del boletín desde un CSV o JSON (ruta o archivo subido).
+    El formato se deduce de la extensión de `nombre` (o de la ruta).
+    Lanza ValueError si faltan columnas obligatorias.
+    """
+    nombre = nombre or getattr(origen, 'name', None) or (origen if isinstance(origen, str) else '')
+    if os.path.splitext(str(nombre))[1].lower() == '.json':
+        boletin = pd.read_json(origen, orient='records', dtype=False)
+    else:
+        # Separador automático: coma o punto y coma según el archivo
+        boletin = pd.read_csv(origen, sep=None, engine='python', dtype=str)
+
+    boletin.columns = normalizar_texto(pd.Series(boletin.columns)).str.replace(' ', '_').tolist()
+    faltantes = [columna for columna in COLUMNAS_BOLETIN if columna not in boletin.columns]
+    if faltantes:
+        raise ValueError(f"Al boletín le faltan las columnas: {', '.join(faltantes)}")
+
+    boletin['valor'] = _a_numero(boletin['valor'])
+    if 'medida' not in boletin.columns:
+        boletin['medida'] = 'valor'
+    boletin['medida'] = normalizar_texto(boletin['medida'].fillna('valor')).replace({'%': 'pct'})
+    desconocidas = set(boletin['medida'].dropna()) - set(MEDIDAS)
+    if desconocidas:
+        raise ValueError(f"Medida desconocida en el boletín: {', '.join(sorted(desconocidas))}")
+
+    columnas = COLUMNAS_BOLETIN + [c for c in COLUMNAS_OPCIONALES if c in boletin.columns] + ['medida']
+    return boletin[columnas].reset_index(drop=True)
+
+
+def _celdas_anexo(hojas):
+    """
+    Celdas con dato de las hojas preparadas: una fila por (hoja, fila, período, medida)
+    con la posición de la celda en hoja['filas'] y el valor tal como se escribe
+    """
+    tabla = tabla_larga(hojas)
+
+    # Columna de cada período en la fila preparada (en Rama/Posocu va valor, %)
+    posiciones = pd.DataFrame(
+        [
+            (hoja['nombre'], periodo, j, hoja['porcentajes'] is not None)
+            for hoja in hojas for j, periodo in enumerate(hoja['periodos'])
+        ],
+        columns=['sheet', 'periodo', 'j', 'con_pct']
+    )
+    tabla = tabla.astype({'sheet': str, 'periodo': str}).merge(posiciones, on=['sheet', 'periodo'])
+    paso = np.where(tabla['con_pct'], 2, 1)
+
+    # round() de Python, como el valor que escribe preparar_hoja (Series.round da 1.2 para 1.15)
+    cifras = [round(valor, 1) for valor in tabla['valor'].tolist()]
+    valores = tabla.assign(medida='valor', columna=1 + tabla['j'] * paso, cifra=cifras)
+    pcts = tabla[tabla['pct'].notna()]
+    pcts = pcts.assign(medida='pct', columna=2 + pcts['j'] * 2, cifra=pcts['pct'])
+
+    celdas = pd.concat([valores, pcts], ignore_index=True)
+    celdas = celdas.rename(columns={'sheet': 'hoja'})[['hoja', 'fila', 'columna', 'grupo', 'concepto', 'periodo', 'medida', 'cifra']]
+    for columna in ['hoja', 'grupo', 'concepto', 'periodo']:
+        celdas[f'{columna}_norm'] = normalizar_texto(celdas[columna])
+    return celdas
+
+
+def validar(hojas, boletin, tolerancia=TOLERANCIA, tolerancia_relativa=0.0):
+    """
+    Cruza las cifras del boletín con las hojas preparadas (ver preparar_hojas).
+    Una cifra coincide si |anexo - boletín| <= max(tolerancia, tolerancia_relativa * |boletín|).
+    Retorna un DataFrame con una fila por (cifra del boletín, celda elegida):
+    hoja, fila, columna, grupo, concepto, periodo, medida, valor_anexo,
+    valor_boletin, diferencia, estado (ver ESTADOS). Las cifras sin celda
+    en el anexo quedan como 'sin_dato'.
+    """
+    celdas = _celdas_anexo(hojas)
+
+    cifras = boletin.reset_index(drop=True).rename(columns={'valor': 'valor_boletin'})
+    cifras['id_cifra'] = np.arange(len(cifras))
+    opcionales = [c for c in COLUMNAS_OPCIONALES if c in cifras.columns]
+    for columna in ['concepto', 'periodo'] + opcionales:
+        cifras[f'{columna}_norm'] = normalizar_texto(cifras[columna])
+    for columna in opcionales:
+        # Celda en blanco = cualquier hoja/grupo
+        cifras[f'{columna}_norm'] = cifras[f'{columna}_norm'].replace('', pd.NA)
+
+    # Join por hash sobre el texto normalizado
+    cruce = cifras.merge(
+        celdas.drop(columns=['concepto', 'periodo']), on=['concepto_norm', 'periodo_norm', 'medida'],
+        how='left', suffixes=('_boletin', '')
+    )
+
+    # hoja/grupo del boletín filtran las celdas candidatas solo si vienen
+    compatible = pd.Series(True, index=cruce.index)
+    for columna in opcionales:
+        pedido = cruce[f'{columna}_norm_boletin']
+        compatible &= (pedido.isna() | (pedido == cruce[f'{columna}_norm'])).fillna(False).to_numpy(dtype=bool)
+    cruce.loc[~compatible, ['hoja', 'fila', 'columna', 'grupo', 'cifra']] = np.nan
+    for columna in opcionales:
+        cruce[columna] = cruce[columna].fillna(cruce.pop(f'{columna}_boletin'))
+
+    cruce['valor_anexo'] = cruce.pop('cifra')
+    cruce['diferencia'] = cruce['valor_anexo'] - cruce['valor_boletin']
+    limite = np.maximum(tolerancia, tolerancia_relativa * cruce['valor_boletin'].abs())
+    coincide = cruce['diferencia'].abs() <= limite
+
+    # Mejor candidata de cada cifra: las que coinciden o, si ninguna, la más cercana
+    distancia = cruce['diferencia'].abs().where(~coincide, 0.0).fillna(np.inf)
+    mejor = distancia == distancia.groupby(cruce['id_cifra']).transform('min')
+    cruce = cruce[mejor.to_numpy()]
+    coincide = coincide[mejor.to_numpy()]
+    sin_dato = (cruce['valor_anexo'].isna() | cruce['valor_boletin'].isna()).to_numpy()
+    # Cifras sin ninguna celda: una sola fila 'sin_dato'
+    repetida = sin_dato & cruce['id_cifra'].duplicated().to_numpy()
+    cruce, coincide, sin_dato = cruce[~repetida], coincide[~repetida], sin_dato[~repetida]
+
+    estado = np.select([sin_dato, coincide], ['sin_dato', 'coincide'], default='no_coincide')
+    cruce['estado'] = pd.Categorical(estado, categories=ESTADOS)
+
+    columnas = ['hoja', 'fila', 'columna', 'grupo', 'concepto', 'periodo', 'medida',
+                'valor_anexo', 'valor_boletin', 'diferencia', 'estado']
+    resultado = cruce.sort_values(['estado', 'id_cifra'], kind='stable')[columnas]
+    resultado['fila'] = resultado['fila'].astype('Int64')
+    resultado['columna'] = resultado['columna'].astype('Int64')
+    return resultado.reset_index(drop=True)
+
+
+def marcar_hojas(hojas, resultado):
+    """
+    Copia de las hojas preparadas con las celdas revisadas en VERDE (coincide)
+    o ROJO (no coincide). Las hojas originales no se modifican.
+    """
+    revisadas = resultado[resultado['estado'] != 'sin_dato']
+    # Una celda con varias cifras del boletín queda en rojo si alguna no coincide
+    en_rojo = (revisadas['estado'] == 'no_coincide').groupby(
+        [revisadas['hoja'], revisadas['fila'], revisadas['columna']], sort=False
+    ).any()
+
+    por_hoja = {}
+    for (nombre, fila, columna), rojo in en_rojo.items():
+        por_hoja.setdefault(nombre, []).append((int(fila), int(columna), ROJO if rojo else VERDE))
+
+    marcadas = []
+    for hoja in hojas:
+        if hoja['nombre'] not in por_hoja:
+            marcadas.append(hoja)
+            continue
+
+        filas = list(hoja['filas'])
+        for fila, columna, color in por_hoja[hoja['nombre']]:
+            i = fila + 1  # filas[0] son los encabezados
+            if filas[i] is hoja['filas'][i]:
+                filas[i] = list(filas[i])
+            valor, _, centrado, negrita = filas[i][columna]
+            filas[i][columna] = (valor, color, centrado, negrita)
+
+        marcadas.append({**hoja, 'filas': filas})
+    return marcadas
+
+
+def hoja_resumen(resultado):
+    """Hoja preparada (formato de geih_etnico.excel) con el conteo por hoja y las diferencias"""
+    conteo = (
+        resultado.groupby([resultado['hoja'].fillna('(sin hoja)'), 'estado'], observed=False).size()
+        .unstack(fill_value=0).reindex(columns=ESTADOS, fill_value=0)
+    )
+
+    filas = [[(texto, GRIS, centrado, True) for texto, centrado in
+              [('Hoja', False), ('Coinciden', True), ('No coinciden', True), ('Sin dato', True)]]]
+    for nombre, fila in conteo.iterrows():
+        filas.append([
+            (nombre, None, False, False),
+            (int(fila['coincide']), VERDE, True, False),
+            (int(fila['no_coincide']), ROJO if fila['no_coincide'] else None, True, False),
+            (int(fila['sin_dato']), AMARILLO if fila['sin_dato'] else None, True, False)
+        ])
+
+    encabezados = ['Hoja', 'Grupo', 'Concepto', 'Período', 'Medida', 'Anexo', 'Boletín', 'Diferencia', 'Estado']
+    filas.append([])
+    filas.append([(texto, GRIS, i > 3, True) for i, texto in enumerate(encabezados)])
+
+    diferencias = resultado[resultado['estado'] != 'coincide']
+    for registro in diferencias.itertuples(index=False):
+        color = COLORES_ESTADO[registro.estado]
+        filas.append([
+            (None if pd.isna(registro.hoja) else registro.hoja, None, False, False),
+            (None if pd.isna(registro.grupo) else registro.grupo, None, False, False),
+            (registro.concepto, None, False, False),
+            (registro.periodo, None, False, False),
+            (registro.medida, None, True, False),
+            (None if pd.isna(registro.valor_anexo) else float(registro.valor_anexo), color, True, False),
+            (None if pd.isna(registro.valor_boletin) else float(registro.valor_boletin), color, True, False),
+            (None if pd.isna(registro.diferencia) else round(float(registro.diferencia), 2), color, True, False),
+            (registro.estado, color, True, False)
+        ])
+
+    revisadas = int((resultado['estado'] != 'sin_dato').sum())
+    no_coinciden = int((resultado['estado'] == 'no_coincide').sum())
+    return {
+        'nombre': NOMBRE_RESUMEN,
+        'titulo': f"🔎 {NOMBRE_RESUMEN} - {revisadas} cifras revisadas, {no_coinciden} no coinciden",
+        'titulo_color': 'C00000' if no_coinciden else '375623',
+        'num_cols': len(encabezados),
+        'filas': filas,
+        'anchos': {'A': 22, 'B': 22, 'C': 45, 'D': 18, 'E': 10, 'F': 14, 'G': 14, 'H': 12, 'I': 14}
+    }
+
+
+def validar_hojas(hojas, boletin, tolerancia=TOLERANCIA, tolerancia_relativa=0.0):
+    """
+    Valida las hojas preparadas contra el boletín.
+    Retorna (hojas marcadas + hoja Resumen_Validacion, resultado de validar()).
+    """
+    with etapa('validar_boletin', cifras=len(boletin)):
+        resultado = validar(hojas, boletin, tolerancia, tolerancia_relativa)
+        return marcar_hojas(hojas, resultado) + [hoja_resumen(resultado)], resultado
+
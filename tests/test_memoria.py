@@ -0,0 +1,28 @@
+"""
+Techo de memoria del pipeline completo (ver benchmarks/memoria.py): el pico
+de RSS en modo vista crece con el anexo, pero queda por debajo de
+benchmarks.memoria.techo_mb() para su tamaño. Cada medición corre en un
+proceso nuevo.
+
+Uso (desde la raíz del repositorio):
+    python -m pytest tests
+"""
+import os
+
+import pytest
+
+from benchmarks.memoria import _medir_en_proceso, techo_mb
+from benchmarks.sintetico import generar_anexo
+from benchmarks.suite import TAMANOS
+
+
+@pytest.mark.parametrize('tamano', ['pequeno', 'mediano'])
+def test_pico_de_memoria_acotado(tamano, tmp_path):
+    ruta = str(tmp_path / f'anexo_{tamano}.xlsx')
+    generar_anexo(ruta, *TAMANOS[tamano])
+    xlsx_mb = os.path.getsize(ruta) / 1024 ** 2
+
+    medicion = _medir_en_proceso(ruta, 'vista')
+    pico = medicion['pico_mb'] - medicion['base_mb']
+
+    assert pico <= techo_mb(xlsx_mb), f"{tamano}: pico {pico:.1f} MB > techo {techo_mb(xlsx_mb):.1f} MB"
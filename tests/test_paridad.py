@@ -0,0 +1,274 @@
+"""
+Paridad del filtrado y de los % de Rama/Posocu con la app original.
+
+`_columnas_original`, `_filtrar_original` y `_porcentajes_original`
+reproducen, celda a celda, encontrar_columnas_mismo_patron, filtrar_hoja y
+calcular_porcentajes_rama_posocu de la primera versión de app.py (recorrido
+fila por fila sobre el DataFrame leído), así que también la detección de
+períodos se compara con la original. La hoja de
+prueba junta los casos borde: celdas vacías y con texto, totales repetidos,
+grupos sin total o con total en cero, encabezados, notas (también notas que
+mencionan "otros") y redondeo a un decimal.
+
+Uso (desde la raíz del repositorio):
+    python -m pytest tests
+"""
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geih_etnico.compacto import compactar_hoja
+from geih_etnico.config import OTRAS_POSICIONES, OTRAS_RAMAS
+from geih_etnico.excel import AMARILLO, VERDE
+from geih_etnico.filtrado import calcular_porcentajes_rama_posocu, filtrar_hoja, preparar_hoja
+from geih_etnico.periodos import encontrar_columnas_mismo_patron
+
+FILA_PERIODOS = 2
+
+# =============================================================================
+# REFERENCIA (app.py original)
+# =============================================================================
+
+
+def _columnas_original(df, fila_periodos):
+    ultimo_nombre = None
+    for col in range(1, df.shape[1]):
+        val = df.iloc[fila_periodos, col]
+        if pd.notna(val) and str(val).strip():
+            ultimo_nombre = str(val).strip()
+    if not ultimo_nombre:
+        return {}, None, None
+
+    match = re.match(r'([A-Za-z]+)\s*\d+.*-\s*([A-Za-z]+)\s*\d+', ultimo_nombre)
+    if not match:
+        return {}, None, None
+    mes_inicio = match.group(1)
+    mes_fin = match.group(2)
+
+    columnas = {}
+    for col in range(1, df.shape[1]):
+        val = df.iloc[fila_periodos, col]
+        if pd.notna(val):
+            texto = str(val).strip()
+            if mes_inicio in texto and mes_fin in texto:
+                columnas[col] = texto
+    return columnas, mes_inicio, mes_fin
+
+
+def _filtrar_original(df, fila_periodos, num_periodos):
+    columnas, _, _ = _columnas_original(df, fila_periodos)
+    cols_ordenadas = sorted(columnas.keys())[-num_periodos:]
+    df_filtrado = df.iloc[:, [0] + cols_ordenadas].copy()
+    df_filtrado.columns = range(len(cols_ordenadas) + 1)
+    return df_filtrado, [columnas[c] for c in cols_ordenadas]
+
+
+def _porcentajes_original(df_filtrado, num_periodos):
+    totales = {}
+    grupo_actual_fila = None
+    for i in range(len(df_filtrado)):
+        concepto = df_filtrado.iloc[i, 0]
+        if pd.notna(concepto):
+            texto = str(concepto).strip()
+            if 'Total Nacional' in texto or 'Población étnic' in texto or 'Población no étnic' in texto:
+                grupo_actual_fila = i
+            if 'Población Ocupada' in texto and grupo_actual_fila is not None:
+                totales[grupo_actual_fila] = {}
+                for col in range(1, num_periodos + 1):
+                    val = df_filtrado.iloc[i, col]
+                    if pd.notna(val):
+                        totales[grupo_actual_fila][col] = float(val)
+
+    porcentajes = {}
+    grupo_actual_fila = None
+    for i in range(len(df_filtrado)):
+        concepto = df_filtrado.iloc[i, 0]
+        if pd.notna(concepto):
+            texto = str(concepto).strip()
+            if 'Total Nacional' in texto or 'Población étnic' in texto or 'Población no étnic' in texto:
+                grupo_actual_fila = i
+            if grupo_actual_fila in totales and 'Población Ocupada' not in texto:
+                if not any(x in texto.lower() for x in ['concepto', 'serie', 'gran encuesta', 'nota', 'fuente', 'no informa']):
+                    for col in range(1, num_periodos + 1):
+                        val = df_filtrado.iloc[i, col]
+                        total = totales[grupo_actual_fila].get(col, 0)
+                        if pd.notna(val) and total > 0:
+                            porcentajes[(i, col)] = round((float(val) / total) * 100, 1)
+    return porcentajes
+
+
+def _color_original(concepto, tipo):
+    concepto_str = str(concepto).lower() if pd.notna(concepto) else ""
+    otras = OTRAS_RAMAS if 'Rama' in tipo else OTRAS_POSICIONES
+    if any(otra in concepto_str for otra in otras):
+        return AMARILLO
+    if concepto_str and 'concepto' not in concepto_str and 'serie' not in concepto_str and 'nota' not in concepto_str and 'fuente' not in concepto_str:
+        return VERDE
+    return None
+
+
+# =============================================================================
+# HOJA DE PRUEBA
+# =============================================================================
+
+N = np.nan
+
+# Encabezados de período: la columna 3 es de otro patrón y no se toma
+PERIODOS = ['Ene 21 - Dic 21', 'Feb 21 - Ene 22', 'Ene - Mar 22', 'Ene 22 - Dic 22', 'Ene 23 - Dic 23']
+
+FILAS = [
+    ['Gran Encuesta Integrada de Hogares - GEIH', N, N, N, N, N],
+    ['Serie trimestral', 11, 12, 13, 14, 15],
+    ['Concepto'] + PERIODOS,
+    # Fila antes de cualquier grupo: sin %
+    ['Obrero, empleado particular', 5, 5, 5, 5, 5],
+    ['Total Nacional', N, N, N, N, N],
+    ['Población Ocupada', 400, 400, 400, 400, 400],
+    ['Obrero, empleado particular', 49, 1, 7, 33.3, 100],     # 12.25 -> redondeo a un decimal
+    ['Obrero, empleado del gobierno', N, 2.5, N, N, 66.65],
+    ['Otro', 0, 400, 8, 12345.65, 1e-9],
+    ['Nota: incluye otros trabajadores', 236.4, 50.1, 9, 10, 11],
+    ['No informa', 3, 3, 3, 3, 3],
+    ['Otro - no informa', 4, 4, 4, 4, 4],
+    ['Gran encuesta parcial', 6, 6, 6, 6, 6],
+    [N, 7, 7, 7, 7, 7],
+    ['   Empleado doméstico   ', 17, 18, 19, 20, 21],
+    # Totales repetidos: manda el último (con un vacío y un cero)
+    ['Población étnica', 1, 2, 3, 4, 5],
+    ['Población Ocupada', 300, 300, 300, 300, 300],
+    ['Jornalero o peón', 30, 60, 90, 120, 150],
+    ['Población Ocupada', 600, N, 600, 0, 600],
+    ['Patrón o empleador', 30, 60, 90, 120, 150],
+    ['Concepto serie otros', 10, 20, 30, 40, 50],
+    # Grupo sin fila de total
+    ['Población no étnica', 9, 9, 9, 9, 9],
+    ['Jornalero o peón', 1, 2, 3, 4, 5],
+    ['Fuente: DANE, GEIH', 1, 2, 3, 4, 5],
+    # Texto en celdas de período (el original solo lo admite en filas sin %)
+    ['Nota: datos expandidos', N, '-', N, 'n.d.', N],
+]
+
+
+def _hoja_original():
+    return pd.DataFrame(FILAS, dtype=object)
+
+
+def _compacta(df, tipo):
+    return compactar_hoja(df, encontrar_columnas_mismo_patron(df, FILA_PERIODOS), tipo, FILA_PERIODOS)
+
+
+def _mismo_valor(a, b):
+    return (pd.isna(a) and pd.isna(b)) or a == b
+
+
+# =============================================================================
+# PRUEBAS
+# =============================================================================
+
+
+# Filas de períodos (desde la columna B) en las que la detección coincide con la original
+FILAS_PERIODOS = {
+    'estandar': ['Oct 22 - Sep 23', 'Ene - Mar 23', 'Oct 23 - Sep 24', 'Abr - Jun 24', 'Oct 24 - Sep 25'],
+    'espacios': ['  Dic 22 - Nov 23 ', N, 'Dic 23 - Nov 24', '   ', 'Dic 24 - Nov 25  '],
+    'ultimo_no_periodo': ['Ene 22 - Dic 22', 'Ene 23 - Dic 23', 'Variación'],
+    'vacia': [N, N, ''],
+    'numeros': [2022, 'Ene 23 - Dic 23', 2024, 'Ene 24 - Dic 24'],
+    'ultimo_numero': ['Ene 23 - Dic 23', 2024],
+    'sin_espacio': ['Ene22 - Dic22', 'Ene 23-Dic 23', 'Ene 24 - Dic 24'],
+    'mes_largo': ['Sept 23 - Ago 24', 'Sep 24 - Ago 25'],
+}
+
+
+@pytest.mark.parametrize('caso', list(FILAS_PERIODOS))
+def test_deteccion_de_periodos_igual_a_la_original(caso):
+    df = pd.DataFrame([['Concepto'] + FILAS_PERIODOS[caso]], dtype=object)
+    assert encontrar_columnas_mismo_patron(df, 0) == _columnas_original(df, 0)
+
+
+def test_deteccion_de_periodos_diferencias_buscadas():
+    """
+    El patrón se compara por número de mes, no por subcadena: una columna
+    "Dic - Ene" ya no entra en el patrón Ene-Dic y "Jan - Dec" sí.
+    """
+    df = pd.DataFrame([['Concepto', 'Dic 21 - Ene 22', 'Jan 22 - Dec 22', 'Ene 23 - Dic 23']], dtype=object)
+
+    assert _columnas_original(df, 0)[0] == {1: 'Dic 21 - Ene 22', 3: 'Ene 23 - Dic 23'}
+    assert encontrar_columnas_mismo_patron(df, 0)[0] == {2: 'Jan 22 - Dec 22', 3: 'Ene 23 - Dic 23'}
+
+
+@pytest.mark.parametrize('num_periodos', [1, 2, 4, 10])
+def test_filtrado_igual_al_original(num_periodos):
+    df = _hoja_original()
+    esperado, periodos = _filtrar_original(df, FILA_PERIODOS, num_periodos)
+
+    filtrada = _compacta(df, 'TN_Grupos').ultimos(num_periodos)
+
+    assert list(filtrada.periodos) == periodos
+    obtenido = filtrada.a_dataframe()
+    assert obtenido.shape == esperado.shape
+    for i in range(esperado.shape[0]):
+        for j in range(esperado.shape[1]):
+            assert _mismo_valor(obtenido.iat[i, j], esperado.iat[i, j]), (i, j, obtenido.iat[i, j], esperado.iat[i, j])
+
+
+@pytest.mark.parametrize('num_periodos', [1, 4])
+def test_filtrar_hoja_conserva_la_api_original(num_periodos):
+    df = _hoja_original()
+    esperado, periodos = _filtrar_original(df, FILA_PERIODOS, num_periodos)
+
+    obtenido, nombres, patron = filtrar_hoja(df, FILA_PERIODOS, num_periodos)
+
+    assert nombres == periodos
+    assert patron == 'Ene-Dic'
+    assert obtenido.shape == esperado.shape
+    for i in range(esperado.shape[0]):
+        for j in range(esperado.shape[1]):
+            assert _mismo_valor(obtenido.iat[i, j], esperado.iat[i, j]), (i, j, obtenido.iat[i, j], esperado.iat[i, j])
+
+
+@pytest.mark.parametrize('tipo', ['TN_Rama', 'TN_Posocu'])
+@pytest.mark.parametrize('num_periodos', [1, 2, 4, 10])
+def test_porcentajes_iguales_al_original(tipo, num_periodos):
+    df = _hoja_original()
+    esperado_df, periodos = _filtrar_original(df, FILA_PERIODOS, num_periodos)
+    esperado = _porcentajes_original(esperado_df, len(periodos))
+
+    filtrada = _compacta(df, tipo).ultimos(num_periodos)
+    porcentajes = calcular_porcentajes_rama_posocu(filtrada.valores, filtrada.categorias)
+
+    filas, columnas = np.nonzero(~np.isnan(porcentajes))
+    obtenido = {(i, j + 1): porcentajes[i, j] for i, j in zip(filas.tolist(), columnas.tolist())}
+    assert obtenido == esperado
+
+
+@pytest.mark.parametrize('tipo', ['TN_Rama', 'TN_Posocu'])
+def test_hoja_preparada_con_porcentajes_del_original(tipo):
+    """Las celdas de % de la hoja de salida son las del original (vacías donde no hay %)"""
+    df = _hoja_original()
+    esperado_df, periodos = _filtrar_original(df, FILA_PERIODOS, 4)
+    esperado = _porcentajes_original(esperado_df, len(periodos))
+
+    filtrada = _compacta(df, tipo).ultimos(4)
+    preparada = preparar_hoja(filtrada, {'nombre': tipo, 'tipo': tipo, 'titulo_color': None})
+
+    for i, fila in enumerate(preparada['filas'][1:]):
+        for col in range(1, len(periodos) + 1):
+            assert fila[2 * col][0] == esperado.get((i, col)), (i, col)
+
+
+@pytest.mark.parametrize('tipo', ['TN_Rama', 'TN_Posocu'])
+def test_colores_rama_posocu_iguales_al_original(tipo):
+    """Relleno de las celdas con valor: amarillo para "otras", verde para el resto (también "Gran encuesta ...")"""
+    df = _hoja_original()
+    esperado_df, periodos = _filtrar_original(df, FILA_PERIODOS, 4)
+
+    filtrada = _compacta(df, tipo).ultimos(4)
+    preparada = preparar_hoja(filtrada, {'nombre': tipo, 'tipo': tipo, 'titulo_color': None})
+
+    for i, fila in enumerate(preparada['filas'][1:]):
+        color = _color_original(esperado_df.iat[i, 0], tipo)
+        for col in range(1, len(periodos) + 1):
+            if fila[2 * col - 1][0] is not None:
+                assert fila[2 * col - 1][1] == color, (i, col, esperado_df.iat[i, 0])
@@ -0,0 +1,129 @@
+"""
+Cruce de las cifras del boletín con el anexo (geih_etnico.validacion):
+cifras sin grupo (o con hoja/grupo en blanco) contra un concepto que se
+repite en los tres grupos.
+
+Uso (desde la raíz del repositorio):
+    python -m pytest tests
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from geih_etnico.compacto import compactar_hoja
+from geih_etnico.excel import ROJO, VERDE
+from geih_etnico.filtrado import preparar_hojas
+from geih_etnico.periodos import encontrar_columnas_mismo_patron
+from geih_etnico.validacion import cargar_boletin, marcar_hojas, validar
+
+FILA_PERIODOS = 1
+N = np.nan
+
+FILAS = [
+    ['Gran Encuesta Integrada de Hogares - GEIH', N, N],
+    ['Concepto', 'Ene 24 - Dic 24', 'Ene 25 - Dic 25'],
+    ['Total Nacional', N, N],
+    ['% población en edad de trabajar', 78.1, 78.5],
+    ['Tasa de Ocupación', 57.0, 57.4],
+    ['Población étnica', N, N],
+    ['% población en edad de trabajar', 74.0, 74.2],
+    ['Tasa de Ocupación', 55.1, 55.3],
+    ['Población no étnica', N, N],
+    ['% población en edad de trabajar', 79.0, 79.3],
+    ['Tasa de Ocupación', 57.5, 57.9],
+    ['Población en edad de trabajar', 1.15, 0.35],
+]
+
+
+def _hojas():
+    df = pd.DataFrame(FILAS, dtype=object)
+    compacta = compactar_hoja(df, encontrar_columnas_mismo_patron(df, FILA_PERIODOS), 'TN_Grupos', FILA_PERIODOS)
+    return preparar_hojas({'TN_Grupos': compacta}, periodos_grafico=2, periodos_tabla=2)
+
+
+def _boletin(texto):
+    return cargar_boletin(io.StringIO(texto), 'boletin.csv')
+
+
+def _colores(hojas, nombre):
+    """{(fila, columna): color} de las celdas de valores de una hoja"""
+    hoja = next(hoja for hoja in hojas if hoja['nombre'] == nombre)
+    return {
+        (i, j): celda[1]
+        for i, fila in enumerate(hoja['filas'][1:]) for j, celda in enumerate(fila) if j
+    }
+
+
+def test_cifra_sin_grupo_se_cruza_con_la_celda_que_coincide():
+    hojas = _hojas()
+    boletin = _boletin(
+        "concepto,periodo,valor\n"
+        "% población en edad de trabajar,Ene 25 - Dic 25,78.5\n"
+    )
+
+    resultado = validar(hojas, boletin)
+
+    # Una celda por hoja de salida (H1 y H3), ambas del Total Nacional
+    assert list(resultado['estado']) == ['coincide', 'coincide']
+    assert set(resultado['grupo']) == {'Total Nacional'}
+    assert set(resultado['hoja']) == {'H1_Grafico_4años', 'H3_Tabla_2años'}
+
+    colores = _colores(marcar_hojas(hojas, resultado), 'H1_Grafico_4años')
+    assert colores[3, 2] == VERDE
+    # Los otros grupos no se pintan de rojo
+    assert ROJO not in colores.values()
+
+
+def test_cifra_que_no_coincide_marca_solo_la_celda_mas_cercana():
+    hojas = _hojas()
+    boletin = _boletin(
+        "concepto,periodo,valor,hoja\n"
+        "Tasa de Ocupación,Ene 25 - Dic 25,55.0,H3_Tabla_2años\n"
+    )
+
+    resultado = validar(hojas, boletin)
+
+    assert len(resultado) == 1
+    registro = resultado.iloc[0]
+    assert registro['estado'] == 'no_coincide'
+    assert registro['grupo'] == 'Población étnica'
+    assert abs(registro['diferencia'] - 0.3) < 1e-9
+
+
+def test_hoja_y_grupo_en_blanco_valen_para_cualquiera():
+    hojas = _hojas()
+    boletin = _boletin(
+        "concepto,periodo,valor,hoja,grupo\n"
+        "Tasa de Ocupación,Ene 24 - Dic 24,55.1,H3_Tabla_2años,\n"
+        "Tasa de Ocupación,Ene 24 - Dic 24,57.5,, \n"
+        "Tasa de Ocupación,Ene 24 - Dic 24,57.0,,Total Nacional\n"
+        "Tasa de Ocupación,Ene 24 - Dic 24,57.0,,Población étnica\n"
+        "Tasa de Desocupación,Ene 24 - Dic 24,10.0,,\n"
+    )
+
+    resultado = validar(hojas, boletin)
+    por_estado = resultado.groupby('estado', observed=True).size().to_dict()
+
+    # 1 (H3) + 2 (H1 y H3) + 2 (H1 y H3) coinciden; la del grupo étnico con 57.0 no
+    assert por_estado == {'coincide': 5, 'no_coincide': 2, 'sin_dato': 1}
+    assert set(resultado.loc[resultado['estado'] == 'no_coincide', 'grupo']) == {'Población étnica'}
+    sin_dato = resultado[resultado['estado'] == 'sin_dato'].iloc[0]
+    assert sin_dato['concepto'] == 'Tasa de Desocupación'
+
+
+def test_cifras_x_x5_se_comparan_como_se_escriben_en_el_excel():
+    """round() de Python: 1.15 se escribe 1.1 y 0.35 se escribe 0.3"""
+    hojas = _hojas()
+    hoja = next(hoja for hoja in hojas if hoja['nombre'] == 'H3_Tabla_2años')
+    assert [celda[0] for celda in hoja['filas'][-1][1:]] == [1.1, 0.3]
+
+    boletin = _boletin(
+        "concepto,periodo,valor,hoja\n"
+        "Población en edad de trabajar,Ene 24 - Dic 24,1.1,H3_Tabla_2años\n"
+        "Población en edad de trabajar,Ene 25 - Dic 25,0.3,H3_Tabla_2años\n"
+    )
+
+    resultado = validar(hojas, boletin, tolerancia=0.0)
+
+    assert list(resultado['estado']) == ['coincide', 'coincide']